@@ -0,0 +1,50 @@
+"""add normalized product_attributes table
+
+Revision ID: 3e8d5a61c0f7
+Revises: 7c1f4e2a9b3d
+Create Date: 2026-01-19 15:02:37.540912
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.services.attribute_service import ProductAttributeService
+
+
+revision: str = '3e8d5a61c0f7'
+down_revision: Union[str, None] = '7c1f4e2a9b3d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    if not inspector.has_table('products'):
+        return
+
+    if not inspector.has_table('product_attributes'):
+        op.create_table(
+            'product_attributes',
+            sa.Column('product_id', sa.String(), sa.ForeignKey('products.id'), nullable=False),
+            sa.Column('kind', sa.String(), nullable=False),
+            sa.Column('value', sa.String(), nullable=False),
+            sa.PrimaryKeyConstraint('product_id', 'kind', 'value'),
+        )
+        op.create_index(
+            'ix_product_attributes_kind_value',
+            'product_attributes',
+            ['kind', 'value', 'product_id']
+        )
+
+    # 回填已有产品（表可能已由 create_tables 建好但为空）
+    has_rows = bind.execute(sa.text('SELECT 1 FROM product_attributes LIMIT 1')).first()
+    if has_rows is None:
+        ProductAttributeService.backfill(bind)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_product_attributes_kind_value', table_name='product_attributes')
+    op.drop_table('product_attributes')
@@ -0,0 +1,35 @@
+"""add product full-text search index
+
+Revision ID: 7c1f4e2a9b3d
+Revises: 2da3cb600cba
+Create Date: 2026-01-12 10:24:51.118304
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.services.search_service import ProductSearchService
+
+
+revision: str = '7c1f4e2a9b3d'
+down_revision: Union[str, None] = '2da3cb600cba'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name != 'sqlite' or not sa.inspect(bind).has_table('products'):
+        return
+    # 创建 FTS5 索引表和同步触发器，并回填已有产品
+    if ProductSearchService.create_index(bind):
+        ProductSearchService.rebuild_index(bind)
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name != 'sqlite':
+        return
+    ProductSearchService.drop_index(bind)
@@ -0,0 +1,32 @@
+"""add product_images.variants manifest
+
+Revision ID: 9a4b7d2e5f10
+Revises: 3e8d5a61c0f7
+Create Date: 2026-01-26 11:47:05.392184
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = '9a4b7d2e5f10'
+down_revision: Union[str, None] = '3e8d5a61c0f7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table('product_images'):
+        return
+    columns = {c['name'] for c in inspector.get_columns('product_images')}
+    if 'variants' not in columns:
+        # 已有图片保持 NULL，由 backfill_image_variants.py 扫描磁盘回填
+        op.add_column('product_images', sa.Column('variants', sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('product_images') as batch_op:
+        batch_op.drop_column('variants')
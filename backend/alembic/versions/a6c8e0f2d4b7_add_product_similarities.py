@@ -0,0 +1,39 @@
+"""add product_similarities table for precomputed similar products
+
+Revision ID: a6c8e0f2d4b7
+Revises: f3b7d9e1c5a2
+Create Date: 2026-03-03 11:27:40.915362
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = 'a6c8e0f2d4b7'
+down_revision: Union[str, None] = 'f3b7d9e1c5a2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # 只建表；相似度在应用启动时（表为空）或 build_similar_products.py 中计算
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table('products') or inspector.has_table('product_similarities'):
+        return
+
+    op.create_table(
+        'product_similarities',
+        sa.Column('product_id', sa.String(), sa.ForeignKey('products.id'), nullable=False),
+        sa.Column('rank', sa.Integer(), nullable=False),
+        sa.Column('similar_product_id', sa.String(), sa.ForeignKey('products.id'), nullable=False),
+        sa.Column('score', sa.Float(), nullable=False),
+        sa.PrimaryKeyConstraint('product_id', 'rank'),
+    )
+    op.create_index('ix_product_similarities_similar_product_id', 'product_similarities', ['similar_product_id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_product_similarities_similar_product_id', table_name='product_similarities')
+    op.drop_table('product_similarities')
@@ -0,0 +1,53 @@
+"""add nulls-last expression indexes for the newest and popular listing sorts
+
+Revision ID: a8c0e2b4d6f1
+Revises: f7a9c1e3b5d2
+Create Date: 2026-03-20 15:08:33.274190
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = 'a8c0e2b4d6f1'
+down_revision: Union[str, None] = 'f7a9c1e3b5d2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# created_at / popularity_score 可能为 NULL，排序键改为 models.nulls_last 表达式；表达式须与其生成的 SQL 完全一致
+INDEXES = [
+    ('ix_products_created_at_nulls_last_desc', 'products',
+     [sa.text("coalesce(created_at, '0001-01-01 00:00:00.000000')"), 'id']),
+    ('ix_products_popularity_score_nulls_last_desc', 'products',
+     [sa.text('coalesce(popularity_score, -1e+308)'), 'id']),
+]
+
+
+def _index_names(bind, table):
+    # 表达式索引无法通过 inspector 反射，直接查询 sqlite_master
+    return {row[0] for row in bind.execute(
+        sa.text("SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = :table"), {"table": table}
+    )}
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    if not sa.inspect(bind).has_table('products'):
+        return
+    existing = _index_names(bind, 'products')
+    for name, table, columns in INDEXES:
+        if name not in existing:
+            op.create_index(name, table, columns)
+    op.execute('ANALYZE')
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    if not sa.inspect(bind).has_table('products'):
+        return
+    existing = _index_names(bind, 'products')
+    for name, table, _ in reversed(INDEXES):
+        if name in existing:
+            op.drop_index(name, table_name=table)
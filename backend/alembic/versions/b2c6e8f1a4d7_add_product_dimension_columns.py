@@ -0,0 +1,64 @@
+"""promote product dimensions into indexed numeric columns
+
+Revision ID: b2c6e8f1a4d7
+Revises: 9a4b7d2e5f10
+Create Date: 2026-02-03 09:31:44.208516
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.models.models import dimension_columns
+
+
+revision: str = 'b2c6e8f1a4d7'
+down_revision: Union[str, None] = '9a4b7d2e5f10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+COLUMNS = [
+    ('weight', sa.Float()),
+    ('length', sa.Float()),
+    ('width', sa.Float()),
+    ('height', sa.Float()),
+    ('capacity_min', sa.Float()),
+    ('capacity_max', sa.Float()),
+    ('compartments', sa.Integer()),
+]
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    if not inspector.has_table('products'):
+        return
+
+    existing_columns = {c['name'] for c in inspector.get_columns('products')}
+    existing_indexes = {i['name'] for i in inspector.get_indexes('products')}
+    for name, column_type in COLUMNS:
+        if name not in existing_columns:
+            op.add_column('products', sa.Column(name, column_type, nullable=True))
+        if f'ix_products_{name}' not in existing_indexes:
+            op.create_index(f'ix_products_{name}', 'products', [name])
+
+    # 从 dimensions JSON 回填
+    products = sa.table(
+        'products',
+        sa.column('id', sa.String()),
+        sa.column('dimensions', sa.JSON()),
+        *[sa.column(name, column_type) for name, column_type in COLUMNS]
+    )
+    rows = bind.execute(sa.select(products.c.id, products.c.dimensions)).all()
+    for row in rows:
+        bind.execute(
+            products.update().where(products.c.id == row.id).values(**dimension_columns(row.dimensions))
+        )
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('products') as batch_op:
+        for name, _ in COLUMNS:
+            batch_op.drop_index(f'ix_products_{name}')
+            batch_op.drop_column(name)
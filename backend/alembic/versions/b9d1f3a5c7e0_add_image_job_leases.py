@@ -0,0 +1,47 @@
+"""add lease columns to image_jobs so only stale running jobs are reclaimed
+
+Revision ID: b9d1f3a5c7e0
+Revises: a8c0e2b4d6f1
+Create Date: 2026-03-21 11:16:05.640127
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = 'b9d1f3a5c7e0'
+down_revision: Union[str, None] = 'a8c0e2b4d6f1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (列名, 类型, server_default)
+COLUMNS = [
+    ('attempts', sa.Integer(), '0'),
+    ('claimed_at', sa.DateTime(), None),
+    ('heartbeat_at', sa.DateTime(), None),
+]
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table('image_jobs'):
+        return
+    existing = {c['name'] for c in inspector.get_columns('image_jobs')}
+    for name, column_type, default in COLUMNS:
+        if name not in existing:
+            op.add_column('image_jobs', sa.Column(
+                name, column_type, nullable=default is None, server_default=default
+            ))
+
+
+def downgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table('image_jobs'):
+        return
+    existing = {c['name'] for c in inspector.get_columns('image_jobs')}
+    with op.batch_alter_table('image_jobs') as batch_op:
+        for name, _, _ in reversed(COLUMNS):
+            if name in existing:
+                batch_op.drop_column(name)
@@ -0,0 +1,43 @@
+"""add products.popularity_base so recomputed popularity keeps the manual score
+
+Revision ID: c0e2a4b6d8f3
+Revises: b9d1f3a5c7e0
+Create Date: 2026-03-24 09:42:17.318204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = 'c0e2a4b6d8f3'
+down_revision: Union[str, None] = 'b9d1f3a5c7e0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    if not inspector.has_table('products'):
+        return
+    if 'popularity_base' in {c['name'] for c in inspector.get_columns('products')}:
+        return
+    op.add_column('products', sa.Column('popularity_base', sa.Integer(), nullable=False, server_default='0'))
+    # 还没有事件记录时 popularity_score 仍是导入 / 后台设置的值，作为基础热度保留；
+    # 已有事件时旧的重算已经覆盖了这些值，基础热度从 0 开始
+    has_events = inspector.has_table('product_event_counts') and bind.execute(
+        sa.text('SELECT 1 FROM product_event_counts LIMIT 1')
+    ).first() is not None
+    if not has_events:
+        bind.execute(sa.text('UPDATE products SET popularity_base = COALESCE(popularity_score, 0)'))
+
+
+def downgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table('products'):
+        return
+    if 'popularity_base' in {c['name'] for c in inspector.get_columns('products')}:
+        with op.batch_alter_table('products') as batch_op:
+            batch_op.drop_column('popularity_base')
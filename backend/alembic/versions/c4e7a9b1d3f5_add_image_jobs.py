@@ -0,0 +1,55 @@
+"""add image_jobs and image_job_items tables for background image derivation
+
+Revision ID: c4e7a9b1d3f5
+Revises: a6c8e0f2d4b7
+Create Date: 2026-03-10 14:05:12.731904
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = 'c4e7a9b1d3f5'
+down_revision: Union[str, None] = 'a6c8e0f2d4b7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table('products'):
+        return
+
+    if not inspector.has_table('image_jobs'):
+        op.create_table(
+            'image_jobs',
+            sa.Column('id', sa.String(), nullable=False),
+            sa.Column('product_id', sa.String(), sa.ForeignKey('products.id'), nullable=False),
+            sa.Column('status', sa.String(), nullable=False, server_default='pending'),
+            sa.Column('total', sa.Integer(), nullable=False, server_default='0'),
+            sa.Column('processed', sa.Integer(), nullable=False, server_default='0'),
+            sa.Column('failed', sa.Integer(), nullable=False, server_default='0'),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.Column('updated_at', sa.DateTime(), nullable=True),
+            sa.PrimaryKeyConstraint('id'),
+        )
+        op.create_index('ix_image_jobs_status_created_at', 'image_jobs', ['status', 'created_at'])
+
+    if not inspector.has_table('image_job_items'):
+        op.create_table(
+            'image_job_items',
+            sa.Column('job_id', sa.String(), sa.ForeignKey('image_jobs.id'), nullable=False),
+            sa.Column('image_id', sa.String(), sa.ForeignKey('product_images.id'), nullable=False),
+            sa.Column('source', sa.String(), nullable=False),
+            sa.Column('status', sa.String(), nullable=False, server_default='pending'),
+            sa.Column('error', sa.Text(), nullable=True),
+            sa.PrimaryKeyConstraint('job_id', 'image_id'),
+        )
+
+
+def downgrade() -> None:
+    op.drop_table('image_job_items')
+    op.drop_index('ix_image_jobs_status_created_at', table_name='image_jobs')
+    op.drop_table('image_jobs')
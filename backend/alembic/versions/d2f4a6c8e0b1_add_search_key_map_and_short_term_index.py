@@ -0,0 +1,37 @@
+"""key the product search index through an id -> rowid map and add a bigram index for short terms
+
+Revision ID: d2f4a6c8e0b1
+Revises: c0e2a4b6d8f3
+Create Date: 2026-03-26 10:18:43.902716
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.services.search_service import ProductSearchService
+
+
+revision: str = 'd2f4a6c8e0b1'
+down_revision: Union[str, None] = 'c0e2a4b6d8f3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name != 'sqlite' or not sa.inspect(bind).has_table('products'):
+        return
+    # 旧索引表保存不分词的 product_id 列，触发器按该列删除时要扫描整个索引表；
+    # create_index 会删除旧表和触发器，建立 id 映射表和二字组索引后重建
+    if ProductSearchService.create_index(bind):
+        ProductSearchService.rebuild_index(bind)
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name != 'sqlite':
+        return
+    # 旧版本启动时（create_tables）发现索引表不存在会按自己的结构重建
+    ProductSearchService.drop_index(bind)
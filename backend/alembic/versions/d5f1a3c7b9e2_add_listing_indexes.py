@@ -0,0 +1,54 @@
+"""add composite indexes for listing sorts, filters and foreign keys
+
+Revision ID: d5f1a3c7b9e2
+Revises: b2c6e8f1a4d7
+Create Date: 2026-02-10 14:06:12.731904
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = 'd5f1a3c7b9e2'
+down_revision: Union[str, None] = 'b2c6e8f1a4d7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (索引名, 表名, 列 / 表达式)；表达式须与 models.nulls_last 生成的 SQL 完全一致，SQLite 才会使用
+INDEXES = [
+    # 列表排序：排序键 + id（keyset 分页的次级排序）
+    ('ix_products_created_at_id', 'products', ['created_at', 'id']),
+    ('ix_products_popularity_score_id', 'products', ['popularity_score', 'id']),
+    ('ix_products_factory_price_id', 'products', ['factory_price', 'id']),
+    ('ix_products_capacity_min_nulls_last', 'products', [sa.text('coalesce(capacity_min, 1e+308)'), 'id']),
+    ('ix_products_capacity_max_nulls_last_desc', 'products', [sa.text('coalesce(capacity_max, -1e+308)'), 'id']),
+    ('ix_products_compartments_nulls_last', 'products', [sa.text('coalesce(compartments, 1e+308)'), 'id']),
+    ('ix_products_compartments_nulls_last_desc', 'products', [sa.text('coalesce(compartments, -1e+308)'), 'id']),
+    # 首页推荐产品
+    ('ix_products_is_featured_created_at', 'products', ['is_featured', 'created_at']),
+    # 外键与后台列表
+    ('ix_product_images_product_id_sort_order', 'product_images', ['product_id', 'sort_order']),
+    ('ix_featured_products_product_id', 'featured_products', ['product_id']),
+    ('ix_featured_products_is_active_sort_order', 'featured_products', ['is_active', 'sort_order']),
+    ('ix_carousels_is_active_sort_order', 'carousels', ['is_active', 'sort_order']),
+]
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    for name, table, columns in INDEXES:
+        if not inspector.has_table(table):
+            continue
+        if name not in {i['name'] for i in inspector.get_indexes(table)}:
+            op.create_index(name, table, columns)
+    # 让查询规划器拿到新索引的统计信息
+    op.execute('ANALYZE')
+
+
+def downgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    for name, table, _ in reversed(INDEXES):
+        if inspector.has_table(table) and name in {i['name'] for i in inspector.get_indexes(table)}:
+            op.drop_index(name, table_name=table)
@@ -0,0 +1,34 @@
+"""add product_images.url index for content-addressed image reference counts
+
+Revision ID: e1d3f5a7c9b2
+Revises: c4e7a9b1d3f5
+Create Date: 2026-03-17 10:21:48.305716
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = 'e1d3f5a7c9b2'
+down_revision: Union[str, None] = 'c4e7a9b1d3f5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table('product_images'):
+        return
+    # 图片文件按内容哈希命名，多条记录可指向同一个 url；删除图片时按 url 统计剩余引用
+    if 'ix_product_images_url' not in {i['name'] for i in inspector.get_indexes('product_images')}:
+        op.create_index('ix_product_images_url', 'product_images', ['url'])
+
+
+def downgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    if inspector.has_table('product_images') and 'ix_product_images_url' in {
+        i['name'] for i in inspector.get_indexes('product_images')
+    }:
+        op.drop_index('ix_product_images_url', table_name='product_images')
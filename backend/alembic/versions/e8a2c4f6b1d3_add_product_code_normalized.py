@@ -0,0 +1,77 @@
+"""add normalized product code column
+
+Revision ID: e8a2c4f6b1d3
+Revises: d5f1a3c7b9e2
+Create Date: 2026-02-17 10:42:05.318226
+
+"""
+import logging
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.core.product_code import normalize_code
+
+
+revision: str = 'e8a2c4f6b1d3'
+down_revision: Union[str, None] = 'd5f1a3c7b9e2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+logger = logging.getLogger('alembic.runtime.migration')
+
+INDEX_NAME = 'ix_products_code_normalized'
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    if not inspector.has_table('products'):
+        return
+
+    if 'code_normalized' not in {c['name'] for c in inspector.get_columns('products')}:
+        op.add_column('products', sa.Column('code_normalized', sa.String(), nullable=True))
+
+    # 回填：规范化后冲突的历史货号（如同时存在 O1 和 O01）只有最早创建的一个写入 code_normalized，
+    # 其余留空（唯一索引允许多个 NULL）并在迁移结束时逐组列出，需要在后台改为不冲突的货号
+    products = sa.table(
+        'products',
+        sa.column('id', sa.String()),
+        sa.column('code', sa.String()),
+        sa.column('code_normalized', sa.String()),
+        sa.column('created_at', sa.DateTime()),
+    )
+    owners = {}
+    collisions = {}
+    rows = bind.execute(
+        sa.select(products.c.id, products.c.code).order_by(products.c.created_at, products.c.id)
+    ).all()
+    for row in rows:
+        normalized = normalize_code(row.code) if row.code else None
+        if normalized in owners:
+            collisions.setdefault(normalized, []).append(f"{row.code} (id {row.id})")
+            normalized = None
+        elif normalized is not None:
+            owners[normalized] = f"{row.code} (id {row.id})"
+        bind.execute(products.update().where(products.c.id == row.id).values(code_normalized=normalized))
+
+    if collisions:
+        report = "\n".join(
+            f"  {normalized}: kept {owners[normalized]}; no normalized code: {', '.join(codes)}"
+            for normalized, codes in sorted(collisions.items())
+        )
+        logger.warning(
+            f"{sum(len(codes) for codes in collisions.values())} product codes collide after normalization "
+            f"and were left without code_normalized (by-code lookups resolve to the kept product; "
+            f"rename the others in admin):\n{report}"
+        )
+
+    if INDEX_NAME not in {i['name'] for i in inspector.get_indexes('products')}:
+        op.create_index(INDEX_NAME, 'products', ['code_normalized'], unique=True)
+
+
+def downgrade() -> None:
+    # 不用 batch 模式：重建表会丢失 products 上的表达式索引（SQLite 3.35+ 支持直接 DROP COLUMN）
+    op.drop_index(INDEX_NAME, table_name='products')
+    op.drop_column('products', 'code_normalized')
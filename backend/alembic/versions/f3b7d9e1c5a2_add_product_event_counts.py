@@ -0,0 +1,38 @@
+"""add product_event_counts table for popularity tracking
+
+Revision ID: f3b7d9e1c5a2
+Revises: e8a2c4f6b1d3
+Create Date: 2026-02-24 16:18:51.604379
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = 'f3b7d9e1c5a2'
+down_revision: Union[str, None] = 'e8a2c4f6b1d3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table('products') or inspector.has_table('product_event_counts'):
+        return
+
+    op.create_table(
+        'product_event_counts',
+        sa.Column('product_id', sa.String(), sa.ForeignKey('products.id'), nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('views', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('add_to_carts', sa.Integer(), nullable=False, server_default='0'),
+        sa.PrimaryKeyConstraint('product_id', 'day'),
+    )
+    op.create_index('ix_product_event_counts_day', 'product_event_counts', ['day'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_product_event_counts_day', table_name='product_event_counts')
+    op.drop_table('product_event_counts')
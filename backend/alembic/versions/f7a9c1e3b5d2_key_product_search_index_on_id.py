@@ -0,0 +1,33 @@
+"""key the product full-text index on products.id instead of rowid
+
+Revision ID: f7a9c1e3b5d2
+Revises: e1d3f5a7c9b2
+Create Date: 2026-03-20 09:42:17.518604
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.services.search_service import ProductSearchService
+
+
+revision: str = 'f7a9c1e3b5d2'
+down_revision: Union[str, None] = 'e1d3f5a7c9b2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name != 'sqlite' or not sa.inspect(bind).has_table('products'):
+        return
+    # 旧索引表以 rowid 关联，VACUUM 后可能对应到错误的产品；create_index 会删除旧表和触发器后重建
+    if ProductSearchService.create_index(bind):
+        ProductSearchService.rebuild_index(bind)
+
+
+def downgrade() -> None:
+    # 新结构同样适用于之前的版本，保留不动
+    pass
@@ -0,0 +1,61 @@
+"""
+游标（keyset）分页工具
+游标对调用方不透明，内容为 排序方式 + 最后一行的排序键 + id，
+翻页时用 (排序键, id) 的行值比较代替 OFFSET，每页耗时只与 limit 有关
+"""
+
+import base64
+import json
+from datetime import datetime
+from typing import Any, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import tuple_, literal
+from sqlalchemy.orm import Query
+from sqlalchemy.sql.elements import ColumnElement
+
+from app.models.models import Product
+
+
+def encode_cursor(sort: str, key: Any, product_id: str) -> str:
+    """编码下一页游标"""
+    if isinstance(key, datetime):
+        key = {"dt": key.isoformat()}
+    payload = json.dumps({"s": sort, "k": key, "id": product_id}, separators=(",", ":"), ensure_ascii=False)
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: str) -> Tuple[Any, str]:
+    """解码游标，返回 (排序键, id)；游标无效或与当前排序方式不一致时返回 400"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")).decode("utf-8"))
+        key = payload["k"]
+        if isinstance(key, dict):
+            key = datetime.fromisoformat(key["dt"])
+        product_id = str(payload["id"])
+        cursor_sort = payload["s"]
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    if cursor_sort != sort:
+        raise HTTPException(status_code=400, detail="Cursor does not match the requested sort")
+    return key, product_id
+
+
+def apply_keyset_order(query: Query, key: ColumnElement, descending: bool) -> Query:
+    """按 (排序键, id) 排序，id 作为并列时的稳定次级排序"""
+    if descending:
+        return query.order_by(key.desc(), Product.id.desc())
+    return query.order_by(key.asc(), Product.id.asc())
+
+
+def apply_keyset_filter(query: Query, key: ColumnElement, descending: bool,
+                        cursor_key: Any, cursor_id: str) -> Query:
+    """只保留排在游标之后的行"""
+    row = tuple_(key, Product.id)
+    boundary = tuple_(literal(cursor_key, key.type), literal(cursor_id, Product.id.type))
+    if descending:
+        return query.filter(row < boundary)
+    return query.filter(row > boundary)
+
@@ -0,0 +1,41 @@
+"""
+类型化 JSON 快速响应
+路由声明 response_model=ApiResponse（data: Any）时，FastAPI 会先用 pydantic 校验整页数据，
+再经 jsonable_encoder 转换一遍，最后交给标准库 json 序列化。产品接口直接返回 SchemaJSONResponse：
+按 schemas 中的类型化负载（TypedDict）由 pydantic-core 一次性序列化成 bytes，跳过上述步骤。
+response_model 仍保留，用于生成 OpenAPI 文档
+"""
+
+from typing import Any, Dict, List, Mapping, Optional
+
+from pydantic import TypeAdapter
+from starlette.responses import Response
+
+from app.schemas.schemas import (
+    ApiPayload, ProductBatchPayload, ProductListPayload, ProductPayload, ProductSuggestionPayload
+)
+
+PRODUCT_ADAPTER = TypeAdapter(ApiPayload[ProductPayload])
+PRODUCTS_ADAPTER = TypeAdapter(ApiPayload[List[ProductPayload]])
+PRODUCT_LIST_ADAPTER = TypeAdapter(ApiPayload[ProductListPayload])
+PRODUCT_BATCH_ADAPTER = TypeAdapter(ApiPayload[ProductBatchPayload])
+PRODUCT_SUGGEST_ADAPTER = TypeAdapter(ApiPayload[List[ProductSuggestionPayload]])
+
+
+class SchemaJSONResponse(Response):
+    """用 TypeAdapter 在 pydantic-core 中序列化内容，直接写入响应体"""
+    media_type = "application/json"
+
+    def __init__(self, content: Any, adapter: TypeAdapter, status_code: int = 200,
+                 headers: Optional[Mapping[str, str]] = None):
+        self.adapter = adapter
+        super().__init__(content=content, status_code=status_code, headers=headers)
+
+    def render(self, content: Any) -> bytes:
+        return self.adapter.dump_json(content)
+
+
+def api_response(data: Any, message: str, adapter: TypeAdapter) -> SchemaJSONResponse:
+    """与 ApiResponse(data=..., message=...) 输出相同的 JSON"""
+    payload: Dict[str, Any] = {"data": data, "message": message, "success": True}
+    return SchemaJSONResponse(payload, adapter)
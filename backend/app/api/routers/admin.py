@@ -1,26 +1,35 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status, UploadFile, File
 from sqlalchemy.orm import Session
 from sqlalchemy import func
 from typing import List
+import uuid
 
 from app.db.session import get_db
-from app.models.models import Product, ProductImage
+from app.models.models import Product, ProductImage, ProductSimilarity
 from app.schemas.schemas import ProductCreate, ProductUpdate, ApiResponse
 from app.core.security import get_current_active_user, User
-from app.core.file_utils import delete_file, save_product_images_optimized
+from app.core.file_utils import delete_file, stage_product_images
+from app.core.catalog import bump_catalog_version
+from app.core.product_code import normalize_code
 from app.api.utils import convert_product_to_response
+from app.services.attribute_service import ProductAttributeService
+from app.services.similarity_service import refresh_similar_products
+from app.services.image_job_service import ImageJobService, image_job_worker
 
 router = APIRouter()
 
 @router.post("", response_model=ApiResponse)
 async def create_product(
     product_data: ProductCreate,
+    background_tasks: BackgroundTasks,
     current_user: User = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
     """Create a new product (admin only)."""
-    # Check if product code already exists
-    existing_product = db.query(Product).filter(Product.code == product_data.code).first()
+    # Check if product code already exists (O1 and O01 count as the same code)
+    existing_product = db.query(Product).filter(
+        Product.code_normalized == normalize_code(product_data.code)
+    ).first()
     if existing_product:
         raise HTTPException(status_code=400, detail="Product code already exists")
 
@@ -44,8 +53,10 @@ async def create_product(
         box_quantity=product_data.box_quantity,
         in_stock=product_data.in_stock,
         popularity_score=product_data.popularity_score,
+        popularity_base=product_data.popularity_score,
         is_featured=product_data.is_featured
     )
+    ProductAttributeService.sync_product(product)
 
     db.add(product)
     db.commit()
@@ -62,6 +73,8 @@ async def create_product(
         db.add(image)
     
     db.commit()
+    bump_catalog_version(product_ids=[product.id])
+    background_tasks.add_task(refresh_similar_products, [product.id])
     db.refresh(product)
 
     return ApiResponse(
@@ -73,6 +86,7 @@ async def create_product(
 async def update_product(
     product_id: str,
     product_data: ProductUpdate,
+    background_tasks: BackgroundTasks,
     current_user: User = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
@@ -83,12 +97,28 @@ async def update_product(
 
     # Check if new code conflicts with existing products
     if product_data.code and product_data.code != product.code:
-        existing_product = db.query(Product).filter(Product.code == product_data.code).first()
+        existing_product = db.query(Product).filter(
+            Product.code_normalized == normalize_code(product_data.code),
+            Product.id != product_id
+        ).first()
         if existing_product:
-            raise HTTPException(status_code=400, detail="Product code already exists")
+            raise HTTPException(
+                status_code=400,
+                detail=f"Product code {product_data.code} conflicts with existing product code {existing_product.code}"
+            )
 
     # Update fields
     update_data = product_data.model_dump(exclude_unset=True)
+    if update_data.get("code") == product.code:
+        # Re-assigning the same code would re-derive code_normalized; legacy codes that collided
+        # during the normalization backfill have none and would hit the unique index
+        update_data.pop("code")
+    if "popularity_score" in update_data:
+        # The admin value is the manual base; keep the part earned from recent activity
+        base = update_data.pop("popularity_score") or 0
+        earned = (product.popularity_score or 0) - (product.popularity_base or 0)
+        product.popularity_base = base
+        product.popularity_score = base + earned
     for field, value in update_data.items():
         if field == "dimensions" and value:
             setattr(product, field, value.model_dump() if hasattr(value, 'model_dump') else value)
@@ -97,8 +127,11 @@ async def update_product(
             setattr(product, field, ','.join(value) if isinstance(value, list) else value)
         else:
             setattr(product, field, value)
+    ProductAttributeService.sync_product(product)
 
     db.commit()
+    bump_catalog_version(product_ids=[product_id])
+    background_tasks.add_task(refresh_similar_products, [product_id])
     db.refresh(product)
 
     return ApiResponse(
@@ -109,6 +142,7 @@ async def update_product(
 @router.delete("/{product_id}", response_model=ApiResponse)
 async def delete_product(
     product_id: str,
+    background_tasks: BackgroundTasks,
     current_user: User = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
@@ -117,14 +151,19 @@ async def delete_product(
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
 
-    # Delete associated image files
-    for image in product.images:
-        delete_file(image.url)  # type: ignore
+    image_urls = {image.url for image in product.images}
 
-    # Delete product (cascade will handle images)
+    # Delete product (cascade will handle images); lists pointing at it are rebuilt in the background
+    db.query(ProductSimilarity).filter(ProductSimilarity.product_id == product_id).delete(synchronize_session=False)
     db.delete(product)
     db.commit()
 
+    # Delete image files no other image still references
+    for url in image_urls:
+        delete_file(url, db)  # type: ignore
+    bump_catalog_version(product_ids=[product_id])
+    background_tasks.add_task(refresh_similar_products, [product_id])
+
     return ApiResponse(
         data=None,
         message="Product deleted successfully"
@@ -145,38 +184,28 @@ async def upload_product_images(
     if not images:
         raise HTTPException(status_code=400, detail="No images provided")
 
-    # Save and optimize uploaded files
+    # Store the uploaded files; variants are derived by the background image job worker
+    job_id = str(uuid.uuid4())
     try:
-        saved_images_info = await save_product_images_optimized(images, product.code)
+        staged_images = await stage_product_images(images, product.code, job_id)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
+    if not staged_images:
+        raise HTTPException(status_code=400, detail="No images provided")
 
     # Get current max sort_order for this product
     max_sort_order = db.query(func.max(ProductImage.sort_order)).filter(
         ProductImage.product_id == product.id
     ).scalar() or -1
 
-    # Create image records in database
-    created_images = []
-    for i, img_info in enumerate(saved_images_info):
-        image = ProductImage(
-            product_id=product.id,
-            url=img_info["url"],
-            alt=img_info["alt"],
-            type=img_info["type"],
-            sort_order=max_sort_order + i + 1  # Append to end
-        )
-        db.add(image)
-        created_images.append(image)
-
-    db.commit()
-
-    # Refresh to get IDs
-    for image in created_images:
-        db.refresh(image)
+    # Images stay hidden from product responses until their variants are ready
+    job, created_images = ImageJobService.create_job(db, product, staged_images, job_id, max_sort_order + 1)
+    image_job_worker.notify()
 
     return ApiResponse(
         data={
+            "jobId": job.id,
+            "status": job.status,
             "images": [
                 {
                     "id": img.id,
@@ -187,9 +216,22 @@ async def upload_product_images(
                 for img in created_images
             ]
         },
-        message=f"Successfully uploaded and optimized {len(created_images)} images"
+        message=f"Uploaded {len(created_images)} images, optimizing in background"
     )
 
+@router.get("/image-jobs/{job_id}", response_model=ApiResponse)
+async def get_image_job(
+    job_id: str,
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Progress of a background image job started by an upload (admin only)."""
+    job_status = ImageJobService.get_status(db, job_id)
+    if job_status is None:
+        raise HTTPException(status_code=404, detail="Image job not found")
+
+    return ApiResponse(data=job_status, message="Image job retrieved successfully")
+
 @router.delete("/{product_id}/images/{image_id}", response_model=ApiResponse)
 async def delete_product_image(
     product_id: str,
@@ -206,12 +248,12 @@ async def delete_product_image(
     if not image:
         raise HTTPException(status_code=404, detail="Image not found")
 
-    # Delete file
-    delete_file(image.url)  # type: ignore
-
-    # Delete database record
+    # Delete database record, then the files unless another image has the same content
+    url = image.url
     db.delete(image)
     db.commit()
+    delete_file(url, db)  # type: ignore
+    bump_catalog_version(product_ids=[product_id])
 
     return ApiResponse(
         data=None,
@@ -241,6 +283,7 @@ async def reorder_product_images(
             image.sort_order = order_data["sort_order"]
 
     db.commit()
+    bump_catalog_version(product_ids=[product_id])
 
     # Return updated images
     updated_images = db.query(ProductImage).filter(
@@ -7,6 +7,8 @@ from app.models.models import Carousel
 from app.schemas.schemas import ApiResponse
 from app.core.security import get_current_active_user, User
 from app.core.file_utils import delete_file, save_carousel_image
+from app.core.image_pool import ImagePoolBusy
+from app.core.catalog import bump_catalog_version
 
 router = APIRouter()
 
@@ -52,6 +54,8 @@ async def create_carousel(
     # Save uploaded image with carousel-specific optimization
     try:
         image_url = await save_carousel_image(image)
+    except ImagePoolBusy as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Failed to save image: {str(e)}")
 
@@ -66,6 +70,7 @@ async def create_carousel(
 
     db.add(carousel)
     db.commit()
+    bump_catalog_version(product_ids=())
     db.refresh(carousel)
 
     return ApiResponse(
@@ -109,18 +114,21 @@ async def update_carousel(
 
     # Handle image update if provided
     if image and image.filename:
-        # Delete old image
-        if carousel.image_url:
-            delete_file(carousel.image_url)
-
         # Save new image with carousel-specific optimization
         try:
             new_image_url = await save_carousel_image(image)
-            setattr(carousel, 'image_url', new_image_url)
+        except ImagePoolBusy as e:
+            raise HTTPException(status_code=503, detail=str(e))
         except Exception as e:
             raise HTTPException(status_code=400, detail=f"Failed to save image: {str(e)}")
 
+        # Delete old image only once the new one is stored (a busy pool must not leave the carousel without an image)
+        if carousel.image_url:
+            delete_file(carousel.image_url)
+        setattr(carousel, 'image_url', new_image_url)
+
     db.commit()
+    bump_catalog_version(product_ids=())
     db.refresh(carousel)
 
     return ApiResponse(
@@ -155,6 +163,7 @@ async def delete_carousel(
     # Delete carousel
     db.delete(carousel)
     db.commit()
+    bump_catalog_version(product_ids=())
 
     return ApiResponse(
         data=None,
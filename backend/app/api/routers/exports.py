@@ -0,0 +1,26 @@
+from datetime import datetime
+
+from fastapi import APIRouter, Depends, Query, Request
+from fastapi.responses import StreamingResponse
+
+from app.core.security import get_current_active_user, User
+from app.schemas.schemas import ExportFormat
+from app.services.export_service import CatalogExportService, EXPORT_MEDIA_TYPES
+
+router = APIRouter()
+
+@router.get("/{export_format}")
+async def export_products(
+    export_format: ExportFormat,
+    request: Request,
+    include_images: bool = Query(False, description="Add absolute image URLs"),
+    include_variants: bool = Query(False, description="Add the size/format variant manifest of each image (implies include_images)"),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Stream the whole catalog as NDJSON or CSV (admin only), read in primary-key chunks with flat memory use."""
+    filename = f"products-{datetime.utcnow():%Y%m%d-%H%M%S}.{export_format.value}"
+    return StreamingResponse(
+        CatalogExportService.stream(export_format, str(request.base_url), include_images, include_variants),
+        media_type=EXPORT_MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
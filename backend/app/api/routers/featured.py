@@ -5,7 +5,8 @@ from app.db.session import get_db
 from app.models.models import FeaturedProduct, Product
 from app.schemas.schemas import ApiResponse, FeaturedProductCreate, FeaturedProductUpdate
 from app.core.security import get_current_active_user, User
-from app.api.utils import convert_product_to_response
+from app.core.catalog import bump_catalog_version
+from app.api.utils import convert_product_to_response, FEATURED_RESPONSE_OPTIONS
 
 router = APIRouter()
 
@@ -15,7 +16,7 @@ async def get_featured_products_admin(
     db: Session = Depends(get_db)
 ):
     """Get all featured products for admin management."""
-    featured_products = db.query(FeaturedProduct).filter(
+    featured_products = db.query(FeaturedProduct).options(*FEATURED_RESPONSE_OPTIONS).filter(
         FeaturedProduct.is_active == True
     ).order_by(FeaturedProduct.sort_order.asc()).all()
 
@@ -65,6 +66,7 @@ async def create_featured_product(
 
     db.add(featured_product)
     db.commit()
+    bump_catalog_version(product_ids=())
     db.refresh(featured_product)
 
     product_data = convert_product_to_response(featured_product.product)
@@ -100,6 +102,7 @@ async def update_featured_product(
         setattr(featured_product, field, value)
 
     db.commit()
+    bump_catalog_version(product_ids=())
     db.refresh(featured_product)
 
     product_data = convert_product_to_response(featured_product.product)
@@ -131,6 +134,7 @@ async def delete_featured_product(
     # Delete featured product entry
     db.delete(featured_product)
     db.commit()
+    bump_catalog_version(product_ids=())
 
     return ApiResponse(
         data=None,
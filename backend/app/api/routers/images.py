@@ -0,0 +1,61 @@
+import os
+import re
+
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import FileResponse
+
+from app.core.file_utils import IMAGES_DIR, render_image_variant
+from app.core.image_cache import image_variant_cache
+from app.core.image_pool import ImagePoolBusy, image_pool
+from app.schemas.schemas import ImageFormat
+
+router = APIRouter()
+
+# Widths served on demand; anything else is rejected so clients cannot fill the cache with arbitrary sizes
+IMAGE_VARIANT_WIDTHS = tuple(sorted(
+    int(width) for width in os.getenv("IMAGE_VARIANT_WIDTHS", "150,300,500,800,1200").split(",") if width.strip()
+))
+
+IMAGE_MEDIA_TYPES = {
+    ImageFormat.WEBP: "image/webp",
+    ImageFormat.JPG: "image/jpeg",
+}
+
+# Product codes and file stems are single path segments; no hidden entries (.staging, .cache) and no traversal
+_SAFE_SEGMENT = re.compile(r"^[^/\\.][^/\\]*$")
+
+@router.get("/{product_code}/{stem}")
+async def get_image_variant(
+    product_code: str,
+    stem: str,
+    w: int = Query(..., description="Width in pixels, one of IMAGE_VARIANT_WIDTHS"),
+    fmt: ImageFormat = Query(ImageFormat.WEBP),
+):
+    """Resized copy of a stored product image, derived on first request and served from the disk cache after that."""
+    if w not in IMAGE_VARIANT_WIDTHS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported width {w}, allowed: {', '.join(map(str, IMAGE_VARIANT_WIDTHS))}"
+        )
+    if not _SAFE_SEGMENT.match(product_code) or not _SAFE_SEGMENT.match(stem):
+        raise HTTPException(status_code=404, detail="Image not found")
+    source = os.path.join(IMAGES_DIR, product_code, f"{stem}.jpg")
+    if not os.path.isfile(source):
+        raise HTTPException(status_code=404, detail="Image not found")
+
+    key = f"{product_code}/{stem}/w{w}.{fmt.value}"
+    try:
+        path = await image_variant_cache.get_or_create(
+            key, lambda temp_path: image_pool.run(render_image_variant, source, temp_path, w, fmt.value)
+        )
+    except ImagePoolBusy as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=422, detail=f"Failed to render image: {str(e)}")
+
+    # Stems are content hashes of the stored original, so the bytes behind a variant URL never change
+    return FileResponse(
+        path,
+        media_type=IMAGE_MEDIA_TYPES[fmt],
+        headers={"Cache-Control": "public, max-age=31536000, immutable"}
+    )
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Response
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, UploadFile, File, Response
 from sqlalchemy.orm import Session
 from typing import Optional
 import logging
@@ -7,6 +7,8 @@ from app.db.session import get_db
 from app.schemas.schemas import ApiResponse
 from app.core.security import get_current_active_user, User
 from app.services.import_service import BatchImportService
+from app.core.catalog import bump_catalog_version
+from app.services.similarity_service import refresh_similar_products
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -28,6 +30,7 @@ async def get_import_template(
 
 @router.post("", response_model=ApiResponse)
 async def batch_import_products(
+    background_tasks: BackgroundTasks,
     excel_file: UploadFile = File(...),
     zip_file: Optional[UploadFile] = File(None),
     current_user: User = Depends(get_current_active_user),
@@ -51,7 +54,11 @@ async def batch_import_products(
         if not result["success"]:
             # If the process itself failed (not just individual rows)
             raise HTTPException(status_code=400, detail=result["message"])
-            
+
+        bump_catalog_version(product_ids=result["product_ids"])
+        if result["product_ids"]:
+            # Similar-product lists are refreshed after the response is sent
+            background_tasks.add_task(refresh_similar_products, result["product_ids"])
         return ApiResponse(
             data=result,
             message=f"Import completed. Processed: {result['total']}, Success: {result['imported']}, Failed: {result['failed']}"
@@ -1,13 +1,27 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 from sqlalchemy import or_
-from typing import Optional
+from typing import Any, Dict, List, Optional, Tuple
 import logging
 
 from app.db.session import get_db
-from app.models.models import Product, FeaturedProduct
-from app.schemas.schemas import ApiResponse, SortOption
-from app.api.utils import convert_product_to_response, split_category_values, group_categories
+from app.core.product_code import normalize_code
+from app.models.models import Product, FeaturedProduct, ProductSimilarity, nulls_last
+from app.schemas.schemas import ApiResponse, SortOption, ProductView, ProductBatchRequest, ProductEventBatch
+from app.api.utils import serialize_product, product_view_options
+from app.api.pagination import encode_cursor, decode_cursor, apply_keyset_order, apply_keyset_filter
+from app.api.responses import (
+    api_response, PRODUCT_ADAPTER, PRODUCTS_ADAPTER, PRODUCT_LIST_ADAPTER, PRODUCT_BATCH_ADAPTER,
+    PRODUCT_SUGGEST_ADAPTER
+)
+from app.services.search_service import ProductSearchService
+from app.services.attribute_service import ProductAttributeService
+from app.services.filter_options_service import filter_options_cache
+from app.services.facet_service import facet_index_cache, bitmap_from_positions, PRODUCT_ROWID
+from app.services.catalog_engine import catalog_engine_cache, catalog_engine_mode
+from app.services.suggest_service import suggest_index_cache
+from app.services.popularity_service import popularity_tracker
+from app.services.similarity_service import SIMILAR_TOP_K
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -15,101 +29,152 @@ logger = logging.getLogger(__name__)
 @router.get("/featured", response_model=ApiResponse)
 async def get_featured_products(
     limit: int = Query(8, ge=1, le=100),
+    view: ProductView = Query(ProductView.FULL, description="card: id, name, code, main image and price only"),
     db: Session = Depends(get_db)
 ):
-    featured_products = db.query(Product).filter(
+    options = product_view_options(view)
+    featured_products = db.query(Product).options(*options).filter(
         Product.is_featured == True
     ).order_by(Product.created_at.desc()).limit(limit).all()
 
-    products = [convert_product_to_response(p) for p in featured_products]
+    products = [serialize_product(p, view) for p in featured_products]
     if not products:
-        fallback_products = db.query(Product).order_by(Product.created_at.desc()).limit(limit).all()
-        products = [convert_product_to_response(p) for p in fallback_products]
-    return ApiResponse(
-        data=products,
-        message="Featured products retrieved successfully"
-    )
+        fallback_products = db.query(Product).options(*options).order_by(Product.created_at.desc()).limit(limit).all()
+        products = [serialize_product(p, view) for p in fallback_products]
+    return api_response(products, "Featured products retrieved successfully", PRODUCTS_ADAPTER)
 
 @router.get("/filter-options", response_model=ApiResponse)
 async def get_filter_options(db: Session = Depends(get_db)):
-    """Get available filter options with improved grouping."""
-
-    # Get distinct values from database
-    tube_types = db.query(Product.tube_type).filter(Product.tube_type.isnot(None)).distinct().all()
-    box_types = db.query(Product.box_type).filter(Product.box_type.isnot(None)).distinct().all()
-    shapes = db.query(Product.shape).distinct().all()
-    materials = db.query(Product.material).distinct().all()
-    functional_designs_query = db.query(Product.functional_designs).filter(Product.functional_designs.isnot(None)).distinct().all()
-
-    # 展开所有分类值（支持 / 分隔的多值）
-    expanded_tubes = split_category_values(tube_types)
-    expanded_boxes = split_category_values(box_types)
-    expanded_shapes = split_category_values(shapes)
-    expanded_materials = split_category_values(materials)
-    expanded_functions = split_category_values(functional_designs_query)
-
-    # Get capacity range from dimensions JSON
-    capacity_min = 0
-    capacity_max = 100
-    try:
-        products_with_capacity = db.query(Product.dimensions).filter(Product.dimensions.isnot(None)).all()
-        capacities = []
-        for product in products_with_capacity:
-            if product[0] and isinstance(product[0], dict):
-                capacity_data = product[0].get('capacity', {})
-                if isinstance(capacity_data, dict):
-                    if 'min' in capacity_data:
-                        capacities.append(capacity_data['min'])
-                    if 'max' in capacity_data:
-                        capacities.append(capacity_data['max'])
-        if capacities:
-            capacity_min = min(capacities)
-            capacity_max = max(capacities)
-    except Exception as e:
-        logger.warning(f"Error calculating capacity range: {e}")
-
-    # Get compartment range from dimensions JSON
-    compartment_min = 1
-    compartment_max = 10
-    try:
-        products_with_compartments = db.query(Product.dimensions).filter(Product.dimensions.isnot(None)).all()
-        compartments = []
-        for product in products_with_compartments:
-            if product[0] and isinstance(product[0], dict):
-                compartment_count = product[0].get('compartments')
-                if compartment_count:
-                    compartments.append(compartment_count)
-        if compartments:
-            compartment_min = min(compartments)
-            compartment_max = max(compartments)
-    except Exception as e:
-        logger.warning(f"Error calculating compartment range: {e}")
-
-    # Get price range
-    price_min = 0
-    price_max = 0
-    try:
-        prices = [p[0] for p in db.query(Product.factory_price).filter(Product.factory_price.isnot(None)).all()]
-        if prices:
-            price_min = min(prices)
-            price_max = max(prices)
-    except Exception as e:
-        logger.warning(f"Error calculating price range: {e}")
-
+    """Get available filter options (served from an in-memory snapshot rebuilt after catalog writes)."""
     return ApiResponse(
-        data={
-            "tubeTypes": expanded_tubes,
-            "boxTypes": expanded_boxes,
-            "functionalDesigns": expanded_functions,
-            "shapes": expanded_shapes,
-            "materials": expanded_materials,
-            "capacityRange": {"min": capacity_min, "max": capacity_max},
-            "compartmentRange": {"min": compartment_min, "max": compartment_max},
-            "priceRange": {"min": price_min, "max": price_max}
-        },
+        data=filter_options_cache.get(db),
         message="Filter options retrieved successfully"
     )
 
+def _resolve_sort(sort: Optional[SortOption], rank) -> Tuple[Any, bool]:
+    """Return (sort key column, descending) for the requested sort option."""
+    if sort == SortOption.POPULAR:
+        return nulls_last(Product.popularity_score, True), True
+    if sort == SortOption.PRICE_LOW:
+        return Product.factory_price, False
+    if sort == SortOption.PRICE_HIGH:
+        return Product.factory_price, True
+    if sort == SortOption.CAPACITY_LOW:
+        return nulls_last(Product.capacity_min, False), False
+    if sort == SortOption.CAPACITY_HIGH:
+        return nulls_last(Product.capacity_max, True), True
+    if sort == SortOption.COMPARTMENTS_LOW:
+        return nulls_last(Product.compartments, False), False
+    if sort == SortOption.COMPARTMENTS_HIGH:
+        return nulls_last(Product.compartments, True), True
+    if rank is not None and sort in (None, SortOption.RELEVANCE):
+        # bm25: smaller is more relevant
+        return rank, False
+    return nulls_last(Product.created_at, True), True
+
+def _list_products_sql(db: Session, search: Optional[str], sort: Optional[SortOption],
+                       selections: Dict[str, List[str]], ranges: Dict[str, Any], page: int, limit: int,
+                       cursor: Optional[str], include_total: bool, include_facets: bool,
+                       options: tuple) -> Dict[str, Any]:
+    """SQL listing path: returns products, total, nextCursor and the facet base bitmap (None = every product)."""
+    query = db.query(Product).options(*options)
+
+    # Apply search filter (FTS5 index, bm25 rank used for relevance sorting)
+    rank = None
+    if search:
+        query, rank = ProductSearchService.apply_search(query, db, search)
+
+    # Apply numeric range filters on the indexed columns; capacity matches when the ranges overlap
+    if ranges["capacity_min"] is not None:
+        query = query.filter(Product.capacity_max >= ranges["capacity_min"])
+    if ranges["capacity_max"] is not None:
+        query = query.filter(Product.capacity_min <= ranges["capacity_max"])
+    if ranges["compartments_min"] is not None:
+        query = query.filter(Product.compartments >= ranges["compartments_min"])
+    if ranges["compartments_max"] is not None:
+        query = query.filter(Product.compartments <= ranges["compartments_max"])
+    if ranges["price_min"] is not None:
+        query = query.filter(Product.factory_price >= ranges["price_min"])
+    if ranges["price_max"] is not None:
+        query = query.filter(Product.factory_price <= ranges["price_max"])
+
+    # Search and numeric ranges form the base set for facet counts
+    facet_base = None
+    if include_facets and (search or any(value is not None for value in ranges.values())):
+        facet_base = bitmap_from_positions(rowid for (rowid,) in query.with_entities(PRODUCT_ROWID))
+
+    # Apply filters with multi-value support (any selected value matches, via the attribute index)
+    for kind, values in selections.items():
+        query = query.filter(ProductAttributeService.filter_condition(kind, values))
+
+    # Get total count (before ordering, so the count query stays a plain filter)
+    total = query.with_entities(Product.id).count() if include_total else None
+
+    # Apply sorting; every sort key is paired with id so pages are stable
+    sort_key, descending = _resolve_sort(sort, rank)
+    sort_name = (sort or (SortOption.RELEVANCE if rank is not None else SortOption.NEWEST)).value
+    query = apply_keyset_order(query, sort_key, descending)
+    query = query.add_columns(sort_key)
+
+    # Apply pagination: keyset when a cursor is given, offset otherwise
+    if cursor:
+        cursor_key, cursor_id = decode_cursor(cursor, sort_name)
+        query = apply_keyset_filter(query, sort_key, descending, cursor_key, cursor_id)
+    elif cursor is None:
+        query = query.offset((page - 1) * limit)
+    rows = query.limit(limit + 1).all()
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    products = [row[0] for row in rows]
+    next_cursor = encode_cursor(sort_name, rows[-1][1], products[-1].id) if has_more else None
+
+    return {"products": products, "total": total, "next_cursor": next_cursor, "facet_base": facet_base}
+
+def _list_products_memory(db: Session, sort: Optional[SortOption], selections: Dict[str, List[str]],
+                          ranges: Dict[str, Any], page: int, limit: int, cursor: Optional[str],
+                          include_total: bool, include_facets: bool, options: tuple) -> Optional[Dict[str, Any]]:
+    """In-memory listing path (no search); returns None when the request has to fall back to SQL."""
+    engine = catalog_engine_cache.get(db)
+    sort_name = (sort or SortOption.NEWEST).value
+    result = engine.query(sort_name, selections, ranges, page, limit, cursor, include_total)
+    if result is None:
+        return None
+
+    # Only the page itself is read from the database, by primary key
+    products = []
+    if result["ids"]:
+        loaded = db.query(Product).options(*options).filter(Product.id.in_(result["ids"])).all()
+        by_id = {product.id: product for product in loaded}
+        products = [by_id[product_id] for product_id in result["ids"] if product_id in by_id]
+
+    facet_base = None
+    if include_facets and any(value is not None for value in ranges.values()):
+        facet_base = bitmap_from_positions(engine.base_rowids(result["base_mask"]))
+
+    return {"products": products, "total": result["total"], "next_cursor": result["next_cursor"],
+            "facet_base": facet_base}
+
+def _compare_listings(memory_result: Dict[str, Any], sql_result: Dict[str, Any], params: Dict[str, Any]) -> None:
+    """Log a warning when the in-memory engine disagrees with the SQL path."""
+    differences = []
+    memory_ids = [product.id for product in memory_result["products"]]
+    sql_ids = [product.id for product in sql_result["products"]]
+    if memory_ids != sql_ids:
+        differences.append(f"ids {memory_ids[:5]}... != {sql_ids[:5]}...")
+    if memory_result["total"] != sql_result["total"]:
+        differences.append(f"total {memory_result['total']} != {sql_result['total']}")
+    if memory_result["facet_base"] != sql_result["facet_base"]:
+        differences.append("facet base differs")
+    cursors = [result["next_cursor"] for result in (memory_result, sql_result)]
+    if cursors[0] != cursors[1]:
+        sort_name = (params["sort"] or SortOption.NEWEST).value
+        decoded = [decode_cursor(value, sort_name) if value else None for value in cursors]
+        if decoded[0] != decoded[1]:
+            differences.append(f"nextCursor {decoded[0]} != {decoded[1]}")
+    if differences:
+        logger.warning(f"Catalog engine mismatch for {params}: {'; '.join(differences)}")
+
 @router.get("", response_model=ApiResponse)
 async def get_products(
     page: int = Query(1, ge=1),
@@ -122,111 +187,172 @@ async def get_products(
     process_types: Optional[str] = Query(None),
     shapes: Optional[str] = Query(None),
     materials: Optional[str] = Query(None),
+    capacity_min: Optional[float] = Query(None, ge=0),
+    capacity_max: Optional[float] = Query(None, ge=0),
+    compartments_min: Optional[int] = Query(None, ge=0),
+    compartments_max: Optional[int] = Query(None, ge=0),
+    price_min: Optional[float] = Query(None, ge=0),
+    price_max: Optional[float] = Query(None, ge=0),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from a previous page's nextCursor; empty string starts keyset paging"),
+    include_total: bool = Query(True),
+    include_facets: bool = Query(False, description="Also return per-value counts for every category facet"),
+    view: ProductView = Query(ProductView.FULL, description="card: id, name, code, main image and price only"),
     db: Session = Depends(get_db)
 ):
-    """Get products with filtering, sorting, and pagination."""
-    query = db.query(Product)
+    """Get products with filtering, sorting, and pagination (page/offset or keyset cursor)."""
+    attribute_filters = {
+        "tube_type": tube_types,
+        "box_type": box_types,
+        "functional_design": functional_designs,
+        "process_type": process_types,
+        "shape": shapes,
+        "material": materials,
+    }
+    selections = {}
+    for kind, raw_values in attribute_filters.items():
+        if not raw_values:
+            continue
+        values = [v.strip() for v in raw_values.split(",") if v.strip()]
+        if values:
+            selections[kind] = values
 
-    # Apply search filter
-    if search:
-        search_term = f"%{search}%"
-        query = query.filter(
-            or_(
-                Product.name.ilike(search_term),
-                Product.code.ilike(search_term),
-                Product.description.ilike(search_term)
-            )
-        )
-
-    # Apply filters with multi-value support
-    if tube_types:
-        tube_type_list = tube_types.split(",")
-        # Use OR conditions to match any of the selected tube types
-        tube_conditions = []
-        for tube_type in tube_type_list:
-            tube_conditions.append(Product.tube_type.like(f"%{tube_type}%"))
-        if tube_conditions:
-            query = query.filter(or_(*tube_conditions))
-
-    if box_types:
-        box_type_list = box_types.split(",")
-        # Use OR conditions to match any of the selected box types
-        box_conditions = []
-        for box_type in box_type_list:
-            box_conditions.append(Product.box_type.like(f"%{box_type}%"))
-        if box_conditions:
-            query = query.filter(or_(*box_conditions))
-
-    if functional_designs:
-        functional_design_list = functional_designs.split(",")
-        # Use OR conditions to match any of the selected functional designs
-        function_conditions = []
-        for design in functional_design_list:
-            function_conditions.append(Product.functional_designs.like(f"%{design}%"))
-        if function_conditions:
-            query = query.filter(or_(*function_conditions))
-
-    if shapes:
-        shape_list = shapes.split(",")
-        # Use OR conditions to match any of the selected shapes
-        shape_conditions = []
-        for shape in shape_list:
-            shape_conditions.append(Product.shape.like(f"%{shape}%"))
-        if shape_conditions:
-            query = query.filter(or_(*shape_conditions))
-
-    if materials:
-        material_list = materials.split(",")
-        # Use OR conditions to match any of the selected materials
-        material_conditions = []
-        for material in material_list:
-            material_conditions.append(Product.material.like(f"%{material}%"))
-        if material_conditions:
-            query = query.filter(or_(*material_conditions))
-
-    # Apply sorting
-    if sort == SortOption.NEWEST:
-        query = query.order_by(Product.created_at.desc())
-    elif sort == SortOption.POPULAR:
-        query = query.order_by(Product.popularity_score.desc())
-    elif sort == SortOption.PRICE_LOW:
-        query = query.order_by(Product.factory_price.asc())
-    elif sort == SortOption.PRICE_HIGH:
-        query = query.order_by(Product.factory_price.desc())
-    else:
-        query = query.order_by(Product.created_at.desc())
-
-    # Get total count
-    total = query.count()
-
-    # Apply pagination
-    offset = (page - 1) * limit
-    products = query.offset(offset).limit(limit).all()
+    ranges = {
+        "capacity_min": capacity_min,
+        "capacity_max": capacity_max,
+        "compartments_min": compartments_min,
+        "compartments_max": compartments_max,
+        "price_min": price_min,
+        "price_max": price_max,
+    }
+
+    # CATALOG_ENGINE=memory|compare serves filter/sort/paginate/count from the in-memory engine;
+    # full-text search always goes through SQL
+    mode = catalog_engine_mode()
+    options = product_view_options(view)
+    result = None
+    if mode in ("memory", "compare") and not search:
+        result = _list_products_memory(db, sort, selections, ranges, page, limit, cursor, include_total,
+                                       include_facets, options)
+    if result is None or mode == "compare":
+        sql_result = _list_products_sql(db, search, sort, selections, ranges, page, limit, cursor,
+                                        include_total, include_facets, options)
+        if result is not None:
+            _compare_listings(result, sql_result, {"sort": sort, "selections": selections, "ranges": ranges,
+                                                   "page": page, "limit": limit, "cursor": cursor})
+        result = sql_result
+
+    total = result["total"]
 
     # Calculate total pages
-    total_pages = (total + limit - 1) // limit
+    total_pages = (total + limit - 1) // limit if total is not None else None
 
     # Convert to response format
-    product_responses = [convert_product_to_response(product) for product in products]
+    product_responses = [serialize_product(product, view) for product in result["products"]]
 
-    return ApiResponse(
-        data={
-            "products": product_responses,
-            "total": total,
-            "page": page,
-            "totalPages": total_pages
-        },
-        message="Products retrieved successfully"
+    data = {
+        "products": product_responses,
+        "total": total,
+        "page": page,
+        "totalPages": total_pages,
+        "nextCursor": result["next_cursor"]
+    }
+
+    # Facet counts from the in-memory bitmap index
+    if include_facets:
+        facet_index = facet_index_cache.get(db)
+        base = result["facet_base"] if result["facet_base"] is not None else facet_index.universe
+        data["facets"] = facet_index.counts(base, selections)
+
+    return api_response(data, "Products retrieved successfully", PRODUCT_LIST_ADAPTER)
+
+@router.get("/suggest", response_model=ApiResponse)
+async def suggest_products(
+    q: str = Query(..., min_length=1, max_length=50, description="Code or name prefix; O1 also matches O01"),
+    limit: int = Query(10, ge=1, le=50),
+    db: Session = Depends(get_db)
+):
+    """Prefix autocomplete over product codes and names (in-memory index rebuilt after catalog writes)."""
+    suggestions = suggest_index_cache.get(db).suggest(q, limit)
+    return api_response(suggestions, "Suggestions retrieved successfully", PRODUCT_SUGGEST_ADAPTER)
+
+@router.post("/batch", response_model=ApiResponse)
+async def get_products_batch(request: ProductBatchRequest, db: Session = Depends(get_db)):
+    """Get many products by id or code in one query, in the requested order; unknown keys are listed in `missing`."""
+    keys = list(dict.fromkeys(key.strip() for key in request.ids if key.strip()))
+    found = []
+    if keys:
+        found = db.query(Product).options(*product_view_options(request.view)).filter(
+            or_(Product.id.in_(keys), Product.code.in_(keys))
+        ).all()
+
+    # ids take precedence over codes if a key happens to match both
+    by_key = {product.code: product for product in found}
+    by_key.update({product.id: product for product in found})
+
+    products, missing, seen = [], [], set()
+    for key in keys:
+        product = by_key.get(key)
+        if product is None:
+            missing.append(key)
+        elif product.id not in seen:
+            seen.add(product.id)
+            products.append(serialize_product(product, request.view))
+
+    return api_response(
+        {"products": products, "missing": missing},
+        f"Retrieved {len(products)} products",
+        PRODUCT_BATCH_ADAPTER
     )
 
+@router.post("/events", response_model=ApiResponse)
+async def track_product_events(request: ProductEventBatch):
+    """Record product views / add-to-cart events; counted in memory and flushed to the database in batches."""
+    accepted = sum(popularity_tracker.record(event.product_id, event.type) for event in request.events)
+    return ApiResponse(data={"accepted": accepted}, message="Events recorded")
+
+@router.get("/by-code/{code}", response_model=ApiResponse)
+async def get_product_by_code(
+    code: str,
+    view: ProductView = Query(ProductView.FULL, description="card: id, name, code, main image and price only"),
+    db: Session = Depends(get_db)
+):
+    """Get single product by code; leading zeros are ignored (O1, O01 and o001 resolve to the same product)."""
+    product = db.query(Product).options(*product_view_options(view)).filter(
+        Product.code_normalized == normalize_code(code)
+    ).first()
+    if not product:
+        raise HTTPException(status_code=404, detail="Product not found")
+
+    return api_response(serialize_product(product, view), "Product retrieved successfully", PRODUCT_ADAPTER)
+
+@router.get("/{product_id}/similar", response_model=ApiResponse)
+async def get_similar_products(
+    product_id: str,
+    limit: int = Query(8, ge=1, le=SIMILAR_TOP_K),
+    view: ProductView = Query(ProductView.CARD, description="card: id, name, code, main image and price only"),
+    db: Session = Depends(get_db)
+):
+    """Precomputed most similar products (tube/box type, shape, material, designs, size and price), best match first."""
+    similar = db.query(Product).options(*product_view_options(view)).join(
+        ProductSimilarity, ProductSimilarity.similar_product_id == Product.id
+    ).filter(
+        ProductSimilarity.product_id == product_id
+    ).order_by(ProductSimilarity.rank).limit(limit).all()
+    if not similar and not db.query(Product.id).filter(Product.id == product_id).first():
+        raise HTTPException(status_code=404, detail="Product not found")
+
+    products = [serialize_product(p, view) for p in similar]
+    return api_response(products, "Similar products retrieved successfully", PRODUCTS_ADAPTER)
+
 @router.get("/{product_id}", response_model=ApiResponse)
-async def get_product(product_id: str, db: Session = Depends(get_db)):
+async def get_product(
+    product_id: str,
+    view: ProductView = Query(ProductView.FULL, description="card: id, name, code, main image and price only"),
+    db: Session = Depends(get_db)
+):
     """Get single product by ID."""
-    product = db.query(Product).filter(Product.id == product_id).first()
+    product = db.query(Product).options(*product_view_options(view)).filter(Product.id == product_id).first()
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
 
-    return ApiResponse(
-        data=convert_product_to_response(product),
-        message="Product retrieved successfully"
-    )
+    return api_response(serialize_product(product, view), "Product retrieved successfully", PRODUCT_ADAPTER)
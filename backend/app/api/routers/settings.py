@@ -9,6 +9,7 @@ from app.models.models import Settings
 from app.schemas.schemas import ApiResponse
 from app.core.security import get_current_active_user, User
 from app.core.file_utils import save_multiple_files
+from app.core.catalog import bump_catalog_version
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -86,6 +87,7 @@ async def update_settings(
             raise HTTPException(status_code=400, detail="QR code upload failed")
 
     db.commit()
+    bump_catalog_version(product_ids=())
     db.refresh(settings)
 
     return ApiResponse(
@@ -1,4 +1,7 @@
-from app.models.models import Product
+from sqlalchemy.orm import selectinload, load_only
+
+from app.models.models import Product, ProductImage, FeaturedProduct
+from app.schemas.schemas import ProductView
 import os
 from pathlib import Path
 from urllib.parse import urlparse
@@ -6,6 +9,27 @@ from urllib.parse import urlparse
 # 获取实际的图片目录（支持 Docker 环境）
 UPLOAD_DIR = os.getenv("UPLOAD_DIR", "static/images")
 
+# Loader options for every query whose rows are passed to convert_product_to_response,
+# so images are fetched in one batched SELECT instead of one lazy load per product
+PRODUCT_RESPONSE_OPTIONS = (selectinload(Product.images),)
+FEATURED_RESPONSE_OPTIONS = (selectinload(FeaturedProduct.product).selectinload(Product.images),)
+
+# Card view: only the columns convert_product_to_card reads (no description, dimensions or pricing details)
+PRODUCT_CARD_OPTIONS = (
+    load_only(Product.id, Product.name, Product.code, Product.factory_price),
+    selectinload(Product.images).load_only(
+        ProductImage.id, ProductImage.url, ProductImage.alt, ProductImage.type,
+        ProductImage.sort_order, ProductImage.variants
+    ),
+)
+
+def product_view_options(view: ProductView) -> tuple:
+    """Loader options matching the serializer used for the requested view."""
+    return PRODUCT_CARD_OPTIONS if view == ProductView.CARD else PRODUCT_RESPONSE_OPTIONS
+
+def serialize_product(product: Product, view: ProductView) -> dict:
+    return convert_product_to_card(product) if view == ProductView.CARD else convert_product_to_response(product)
+
 def split_category_values(value_list):
     """展开分隔符分割的分类值"""
     expanded_set = set()
@@ -71,11 +95,15 @@ def _to_local_static_path(image_url: str) -> str:
         return os.path.join("static", "images", path.lstrip("/"))
     return os.path.join("static", "images", path)
 
-def _image_has_small_variant(product_code: str, image_url: str) -> bool:
-    """检查图片是否有 small 变体，支持 Docker 环境"""
+def _image_has_small_variant(product_code: str, image_url: str, variants=None) -> bool:
+    """检查图片是否有 small 变体，优先读取入库时记录的变体清单，支持 Docker 环境"""
     if not image_url:
         return False
+
+    if variants is not None:
+        return bool(variants.get("small"))
     
+    # 尚未回填清单的历史图片（见 backfill_image_variants.py），回退到文件系统检查
     # 从 URL 中提取文件名
     p = Path(image_url)
     stem = p.stem
@@ -86,6 +114,33 @@ def _image_has_small_variant(product_code: str, image_url: str) -> bool:
     base_dir = os.path.join(UPLOAD_DIR, product_code, "small")
     return _file_exists(os.path.join(base_dir, f"{stem}.webp")) or _file_exists(os.path.join(base_dir, f"{stem}.jpg"))
 
+def _displayable_images(product: Product):
+    """Images in display order, skipping those without a small variant."""
+    for img in sorted(product.images, key=lambda x: x.sort_order):
+        url = getattr(img, "url", None)
+        if not url or not _image_has_small_variant(product.code, url, getattr(img, "variants", None)):
+            continue
+        yield {
+            "id": img.id,
+            "url": url,
+            "alt": img.alt,
+            "type": img.type,
+            "sort_order": img.sort_order,
+        }
+
+def convert_product_to_card(product: Product) -> dict:
+    """Lightweight card projection: same keys as the full response, main image only."""
+    main_image = next(_displayable_images(product), None)
+    return {
+        "id": product.id,
+        "name": product.name,
+        "code": product.code,
+        "images": [main_image] if main_image else [],
+        "pricing": {
+            "factoryPrice": product.factory_price
+        }
+    }
+
 def convert_product_to_response(product: Product) -> dict:
     """Convert Product model to response format matching frontend expectations."""
     # Convert functional_designs from string to list
@@ -93,20 +148,7 @@ def convert_product_to_response(product: Product) -> dict:
     if product.functional_designs:
         functional_designs = [design.strip() for design in product.functional_designs.split(',') if design.strip()]
 
-    images = []
-    for img in sorted(product.images, key=lambda x: x.sort_order):
-        url = getattr(img, "url", None)
-        if not url or not _image_has_small_variant(product.code, url):
-            continue
-        images.append(
-            {
-                "id": img.id,
-                "url": url,
-                "alt": img.alt,
-                "type": img.type,
-                "sort_order": img.sort_order,
-            }
-        )
+    images = list(_displayable_images(product))
     
     return {
         "id": product.id,
@@ -131,7 +173,8 @@ def convert_product_to_response(product: Product) -> dict:
         },
         "inStock": product.in_stock,
         "popularityScore": product.popularity_score,
+        "popularityBase": product.popularity_base,
         "isFeatured": product.is_featured,
-        "createdAt": product.created_at.isoformat(),
-        "updatedAt": product.updated_at.isoformat()
+        "createdAt": product.created_at.isoformat() if product.created_at else None,
+        "updatedAt": product.updated_at.isoformat() if product.updated_at else None
     }
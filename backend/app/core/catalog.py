@@ -0,0 +1,156 @@
+"""
+目录版本号
+所有会影响公开接口返回内容的管理端写操作（产品、图片、轮播图、推荐、设置、批量导入）
+在提交后调用 bump_catalog_version()。公开 GET 接口的 ETag 由版本号和请求 URL 计算，
+If-None-Match 命中时直接返回 304，无需访问数据库
+
+版本号保存在进程内存中（部署为单进程 uvicorn），进程启动时间作为前缀，重启后旧 ETag 自动失效。
+每次递增同时记录本次变更涉及的产品 id（变更日志），内存索引据此增量更新而不必整体重建
+"""
+
+import hashlib
+import logging
+import re
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Iterable, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_boot_id = format(int(time.time() * 1000), "x")
+_counter = 0
+
+# 最近的变更日志：(版本计数, 变更的产品 id 集合；None 表示范围未知)
+CHANGE_LOG_SIZE = 256
+_changes: deque = deque(maxlen=CHANGE_LOG_SIZE)
+
+# 可缓存的公开 GET 接口
+CACHEABLE_PATHS = {
+    "/api/products",
+    "/api/products/featured",
+    "/api/products/filter-options",
+    "/api/carousels",
+    "/api/settings",
+}
+CACHEABLE_PATTERNS = [
+    re.compile(r"^/api/products/[^/]+$"),  # 产品详情
+    re.compile(r"^/api/products/by-code/[^/]+$"),  # 按货号查询产品
+    re.compile(r"^/api/products/[^/]+/similar$"),  # 相似产品
+]
+
+
+def get_catalog_version() -> str:
+    return f"{_boot_id}.{_counter}"
+
+
+def bump_catalog_version(product_ids: Optional[Iterable[str]] = None) -> str:
+    """
+    目录数据已变更，使所有公开接口的 ETag 失效。
+    product_ids 为本次提交改动的产品 id；空集合表示没有改动产品本身（轮播图、设置等），
+    None 表示改动范围未知，依赖变更日志的缓存会整体重建
+    """
+    global _counter
+    with _lock:
+        _counter += 1
+        _changes.append((_counter, frozenset(product_ids) if product_ids is not None else None))
+        return get_catalog_version()
+
+
+def is_older_catalog_version(version: str, than: str) -> bool:
+    """version 是否是同一进程实例中早于 than 的版本；来自不同进程实例的版本无法比较，返回 False"""
+    boot, _, counter = version.partition(".")
+    than_boot, _, than_counter = than.partition(".")
+    return boot == than_boot and int(counter) < int(than_counter)
+
+
+def product_changes_between(old_version: str, new_version: str) -> Optional[Set[str]]:
+    """
+    返回两个版本之间改动过的产品 id。
+    版本来自不同进程实例、变更日志已被截断或期间有范围未知的变更时返回 None
+    """
+    old_boot, _, old_counter = old_version.partition(".")
+    new_boot, _, new_counter = new_version.partition(".")
+    if old_boot != new_boot or old_boot != _boot_id:
+        return None
+    start, end = int(old_counter), int(new_counter)
+
+    with _lock:
+        entries = [entry for entry in _changes if start < entry[0] <= end]
+    if len(entries) != end - start:
+        return None
+
+    changed: Set[str] = set()
+    for _, product_ids in entries:
+        if product_ids is None:
+            return None
+        changed |= product_ids
+    return changed
+
+
+def is_cacheable_path(path: str) -> bool:
+    if path in CACHEABLE_PATHS:
+        return True
+    return any(pattern.match(path) for pattern in CACHEABLE_PATTERNS)
+
+
+def compute_etag(path: str, query: str, version: Optional[str] = None) -> str:
+    """强 ETag：同一版本下相同 URL 的响应内容完全一致"""
+    version = version or get_catalog_version()
+    digest = hashlib.sha1(f"{path}?{query}".encode("utf-8")).hexdigest()[:16]
+    return f'"{version}-{digest}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    # If-None-Match 使用弱比较，忽略 W/ 前缀
+    return any(tag == etag or tag == f"W/{etag}" for tag in candidates)
+
+
+class CatalogCache:
+    """
+    按目录版本缓存的派生数据（筛选项快照、内存索引等）。
+    版本号变化后第一次读取时调用 builder(db) 重建，其余请求直接返回内存中的结果；
+    提供 updater(db, value, product_ids) 时，若变更日志能给出改动的产品 id，则只增量更新这些产品
+    """
+
+    def __init__(self, name: str, builder: Callable[[Any], Any],
+                 updater: Optional[Callable[[Any, Any, Set[str]], Any]] = None):
+        self.name = name
+        self._builder = builder
+        self._updater = updater
+        self._lock = threading.Lock()
+        self._version: Optional[str] = None
+        self._value: Any = None
+
+    def get(self, db) -> Any:
+        version = get_catalog_version()
+        if self._version == version:
+            return self._value
+        with self._lock:
+            if self._version != version:
+                started = time.perf_counter()
+                changed = None
+                if self._updater is not None and self._version is not None:
+                    changed = product_changes_between(self._version, version)
+                # 先取版本号再构建：构建期间若有写入，下次读取会再次重建
+                if changed is not None:
+                    self._value = self._updater(db, self._value, changed)
+                    action = f"Updated {self.name} ({len(changed)} products)"
+                else:
+                    self._value = self._builder(db)
+                    action = f"Rebuilt {self.name}"
+                self._version = version
+                logger.info(f"{action} for catalog version {version} "
+                            f"in {(time.perf_counter() - started) * 1000:.1f}ms")
+        return self._value
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._version = None
+            self._value = None
@@ -0,0 +1,242 @@
+"""
+响应压缩
+按 Accept-Encoding 协商 br / gzip（brotli 固定在 requirements.txt 中，是必需依赖）：
+- 可缓存的公开接口：压缩结果按 (目录版本, URL) 缓存，同一版本下热门列表只压缩一次
+- 前端构建产物（frontend_dist）：按文件 (路径, mtime, 大小) 缓存压缩结果
+- 其余 JSON / 文本响应：按请求即时压缩
+压缩都在线程池中进行（brotli 11 级压缩前端包、上千条产品的列表都可能耗时数百毫秒），不阻塞事件循环
+"""
+
+import asyncio
+import gzip
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+import brotli
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import StaticFiles
+from starlette.types import Scope
+
+from app.core.catalog import is_older_catalog_version
+
+
+# 小于该字节数的响应不压缩（压缩头部开销大于收益）
+MIN_COMPRESS_SIZE = 500
+
+COMPRESSIBLE_TYPES = (
+    "application/json",
+    "application/javascript",
+    "application/manifest+json",
+    "image/svg+xml",
+    "text/",
+)
+
+# 按服务端偏好排序
+SUPPORTED_ENCODINGS = ("br", "gzip")
+
+# 接口响应每个版本只压缩一次，静态资源每个文件只压缩一次，后者可以用更高的压缩级别
+API_LEVELS = {"br": 5, "gzip": 6}
+STATIC_LEVELS = {"br": 11, "gzip": 9}
+
+
+def is_compressible(media_type: Optional[str]) -> bool:
+    if not media_type:
+        return False
+    media_type = media_type.split(";")[0].strip().lower()
+    return any(media_type.startswith(prefix) for prefix in COMPRESSIBLE_TYPES)
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """根据 Accept-Encoding（含 q 值）选择编码，不接受任何支持的编码时返回 None（不压缩）"""
+    if not accept_encoding:
+        return None
+
+    accepted: Dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+
+    candidates = []
+    for preference, encoding in enumerate(SUPPORTED_ENCODINGS):
+        quality = accepted.get(encoding, accepted.get("*", 0.0))
+        if quality > 0:
+            candidates.append((-quality, preference, encoding))
+    return min(candidates)[2] if candidates else None
+
+
+def compress(body: bytes, encoding: str, levels: Dict[str, int] = API_LEVELS) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=levels["br"])
+    # mtime=0：相同内容得到相同字节，便于缓存和 ETag
+    return gzip.compress(body, compresslevel=levels["gzip"], mtime=0)
+
+
+def weak_etag(etag: str) -> str:
+    """压缩后的表示与原文字节不同，使用弱 ETag（If-None-Match 按弱比较仍能命中）"""
+    return etag if etag.startswith("W/") else f"W/{etag}"
+
+
+class _Entry:
+    __slots__ = ("media_type", "bodies")
+
+    def __init__(self, media_type: str, body: bytes):
+        self.media_type = media_type
+        self.bodies: Dict[Optional[str], bytes] = {None: body}
+
+    @property
+    def size(self) -> int:
+        return sum(len(body) for body in self.bodies.values())
+
+
+class CompressedResponseCache:
+    """
+    公开接口响应缓存：键为 (目录版本, 路径, 查询串)，每个条目按编码保存原文和压缩后的字节。
+    目录版本前进后旧条目全部丢弃，早于当前版本的结果不写入；超过条目数或总字节数上限时按 LRU 淘汰。
+    get / put 可能需要压缩，异步代码中应通过 asyncio.to_thread 调用
+    """
+
+    def __init__(self, max_entries: int = 512, max_bytes: int = 64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Tuple[str, str], _Entry]" = OrderedDict()
+        self._version: Optional[str] = None
+        self._bytes = 0
+
+    def get(self, version: str, path: str, query: str,
+            encoding: Optional[str]) -> Optional[Tuple[bytes, Optional[str], str]]:
+        """返回 (响应体, 实际使用的编码, Content-Type)；缺少该编码时压缩一次并保存"""
+        with self._lock:
+            if version != self._version:
+                return None
+            entry = self._entries.get((path, query))
+            if entry is None:
+                return None
+            self._entries.move_to_end((path, query))
+            body = entry.bodies.get(encoding)
+            if body is not None:
+                return body, encoding, entry.media_type
+            identity = entry.bodies[None]
+        return (*self._add_encoding(version, path, query, identity, encoding), entry.media_type)
+
+    def put(self, version: str, path: str, query: str, body: bytes, media_type: str,
+            encoding: Optional[str]) -> Tuple[bytes, Optional[str]]:
+        """保存原文，返回 (请求编码对应的响应体, 实际使用的编码)"""
+        with self._lock:
+            # 早于当前版本的请求（目录更新前开始、更新后才写入）只返回结果，不回退缓存版本
+            stale = (self._version is not None and version != self._version
+                     and is_older_catalog_version(version, self._version))
+            if not stale:
+                if version != self._version:
+                    self._entries.clear()
+                    self._bytes = 0
+                    self._version = version
+                previous = self._entries.pop((path, query), None)
+                if previous is not None:
+                    self._bytes -= previous.size
+                self._entries[(path, query)] = _Entry(media_type, body)
+                self._bytes += len(body)
+                self._evict()
+        return self._add_encoding(version, path, query, body, encoding)
+
+    def _add_encoding(self, version: str, path: str, query: str, identity: bytes,
+                      encoding: Optional[str]) -> Tuple[bytes, Optional[str]]:
+        if encoding is None or len(identity) < MIN_COMPRESS_SIZE:
+            return identity, None
+        # 压缩在锁外进行，并发的相同请求最多重复压缩一次
+        body = compress(identity, encoding)
+        with self._lock:
+            entry = self._entries.get((path, query))
+            if version == self._version and entry is not None and encoding not in entry.bodies:
+                entry.bodies[encoding] = body
+                self._bytes += len(body)
+                self._evict()
+        return body, encoding
+
+    def _evict(self) -> None:
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            _, entry = self._entries.popitem(last=False)
+            self._bytes -= entry.size
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self._version = None
+
+
+class PrecompressedFiles:
+    """静态文件的压缩结果，按 (路径, mtime, 大小, 编码) 缓存，文件更新后自动失效"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._bodies: Dict[Tuple[str, int, int, str], bytes] = {}
+
+    async def get(self, path: Path, mtime_ns: int, size: int, encoding: str) -> Optional[bytes]:
+        if size < MIN_COMPRESS_SIZE:
+            return None
+        key = (str(path), mtime_ns, size, encoding)
+        body = self._bodies.get(key)
+        if body is None:
+            # 读文件和压缩都放到线程池，首次请求大文件时不阻塞其他请求
+            body = await asyncio.to_thread(lambda: compress(path.read_bytes(), encoding, STATIC_LEVELS))
+            with self._lock:
+                # 同一文件的旧版本不再需要
+                for stale in [k for k in self._bodies if k[0] == key[0] and k[1:3] != key[1:3]]:
+                    del self._bodies[stale]
+                self._bodies[key] = body
+        return body
+
+
+response_cache = CompressedResponseCache()
+precompressed_files = PrecompressedFiles()
+
+
+async def compress_file_response(response: FileResponse, path: Path, stat_result: os.stat_result,
+                                 accept_encoding: Optional[str]) -> Response:
+    """把静态文件响应换成缓存的压缩版本；304、不可压缩类型或客户端不接受压缩时原样返回"""
+    if response.status_code != 200 or not is_compressible(response.media_type):
+        return response
+    response.headers["vary"] = "Accept-Encoding"
+    encoding = negotiate_encoding(accept_encoding)
+    if encoding is None:
+        return response
+    body = await precompressed_files.get(path, stat_result.st_mtime_ns, stat_result.st_size, encoding)
+    if body is None:
+        return response
+
+    headers = {key: value for key, value in response.headers.items() if key != "content-length"}
+    headers["content-encoding"] = encoding
+    if "etag" in headers:
+        headers["etag"] = weak_etag(headers["etag"])
+    return Response(body, status_code=200, headers=headers)
+
+
+async def file_response(path: Path, accept_encoding: Optional[str]) -> Response:
+    """FileResponse 的压缩版本，用于 SPA 入口等单个文件"""
+    stat_result = os.stat(path)
+    return await compress_file_response(FileResponse(path, stat_result=stat_result), path, stat_result,
+                                        accept_encoding)
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    """StaticFiles + 按 Accept-Encoding 返回缓存的压缩版本"""
+
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        # file_response 是同步钩子，压缩需要 await，因此在 get_response 外层替换响应
+        response = await super().get_response(path, scope)
+        if not isinstance(response, FileResponse):
+            return response
+        return await compress_file_response(response, Path(response.path), response.stat_result,
+                                            Headers(scope=scope).get("accept-encoding"))
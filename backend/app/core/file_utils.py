@@ -4,13 +4,21 @@
 提供图片上传、优化、删除等功能
 """
 
+import hashlib
+import io
+import math
 import os
 import shutil
 import uuid
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterator, Optional, Tuple
 from fastapi import UploadFile
 from PIL import Image, ImageOps
 from pathlib import Path
+from sqlalchemy.orm import Session
+
+from app.core.image_cache import image_variant_cache
+from app.core.image_pool import image_pool
+from app.models.models import ProductImage
 
 try:
     import pillow_heif
@@ -23,61 +31,231 @@ UPLOAD_DIR = os.getenv("UPLOAD_DIR", "static/images")
 IMAGES_DIR = UPLOAD_DIR
 STATIC_DIR = os.path.dirname(UPLOAD_DIR) if "/" in UPLOAD_DIR else "static"
 CAROUSEL_DIR = os.path.join(IMAGES_DIR, "carousel")
+# 等待后台生成变体的上传原始文件（按任务分目录，处理完即删除）
+STAGING_DIR = os.path.join(IMAGES_DIR, ".staging")
 QR_CODES_DIR = os.path.join(STATIC_DIR, "qr_codes")
 
+# 产品图片尺寸
+PRODUCT_IMAGE_SIZES = {
+    'thumbnail': (150, 150),
+    'small': (300, 300),
+    'medium': (500, 500),
+    'large': (800, 800)
+}
+# 输出格式：扩展名 -> (Pillow 格式, 原图质量, 缩略图质量)
+PRODUCT_IMAGE_FORMATS = {
+    'jpg': ('JPEG', 90, 85),
+    'webp': ('WebP', 80, 80)
+}
+# 原尺寸 WebP 的编码强度：method 6 在千万像素级原图上比 4 慢约 3.5 倍，文件只小约 4%；缩略尺寸仍用 6
+ORIGINAL_WEBP_METHOD = 4
+# 产品图片以源文件内容哈希（sha256 前若干位）命名：重复上传 / 导入相同字节得到同一个 url，复用已生成的各尺寸文件
+CONTENT_HASH_LENGTH = 32
+
 # 确保目录存在
 os.makedirs(IMAGES_DIR, exist_ok=True)
 os.makedirs(CAROUSEL_DIR, exist_ok=True)
 os.makedirs(QR_CODES_DIR, exist_ok=True)
 
-def optimize_single_image(input_path: str, output_path: str, size=None, quality=85, format='JPEG'):
-    """优化单张图片"""
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()[:CONTENT_HASH_LENGTH]
+
+def file_content_hash(path: str, chunk_size: int = 1024 * 1024) -> str:
+    """分块计算文件内容哈希，不解码图片"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as source:
+        for chunk in iter(lambda: source.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()[:CONTENT_HASH_LENGTH]
+
+def product_image_url(product_code: str, digest: str) -> str:
+    return f"images/{product_code}/{digest}.jpg"
+
+def load_image(input_path: str, draft_size: Optional[Tuple[int, int]] = None) -> Image.Image:
+    """
+    解码图片并完成 EXIF 旋转和颜色模式转换，生成多个版本时每张源图只调用一次。
+    指定 draft_size 时 JPEG 直接按 1/2、1/4、1/8 缩小解码（结果不小于 draft_size），只需要小图时更快
+    """
+    with Image.open(input_path) as img:
+        if draft_size:
+            img.draft('RGB', draft_size)
+        # 自动旋转（处理EXIF信息），返回已解码的新图片
+        img = ImageOps.exif_transpose(img)
+    # 转换为RGB模式（确保 JPEG / WebP 都能编码）
+    if img.mode not in ('RGB', 'L'):
+        img = img.convert('RGB')
+    return img
+
+def fit_size(size: Tuple[int, int], box: Tuple[int, int]) -> Tuple[int, int]:
+    """等比缩放到 box 以内（不放大）后的尺寸，取整方式与 Image.thumbnail 一致"""
+    width, height = size
+    x, y = box
+    if x >= width and y >= height:
+        return size
+    aspect = width / height
+    if x / y >= aspect:
+        x = max(min(math.floor(y * aspect), math.ceil(y * aspect), key=lambda n: abs(aspect - n / y)), 1)
+    else:
+        y = max(min(math.floor(x / aspect), math.ceil(x / aspect),
+                    key=lambda n: 0 if n == 0 else abs(aspect - x / n)), 1)
+    return x, y
+
+def pad_image(img: Image.Image, size: Tuple[int, int]) -> Image.Image:
+    """不足 size 时居中放在白色画布上"""
+    if img.size == size:
+        return img
+    new_img = Image.new('RGB', size, (255, 255, 255))
+    paste_x = (size[0] - img.size[0]) // 2
+    paste_y = (size[1] - img.size[1]) // 2
+    new_img.paste(img, (paste_x, paste_y))
+    return new_img
+
+def derive_sized_images(img: Image.Image, sizes: Dict[str, Tuple[int, int]]) -> Iterator[Tuple[str, Image.Image]]:
+    """
+    按尺寸从大到小级联缩放：只有最大一级从原图缩放（reducing_gap 先按整数倍快速缩小），
+    之后每一级从上一级的结果缩放，返回 (尺寸名, 补白后的图片)
+    """
+    current = img
+    for size_name, size_dims in sorted(sizes.items(), key=lambda item: item[1][0] * item[1][1], reverse=True):
+        target = fit_size(img.size, size_dims)
+        if target[0] > current.size[0] or target[1] > current.size[1]:
+            current = img
+        if target != current.size:
+            current = current.resize(target, Image.Resampling.LANCZOS,
+                                     reducing_gap=2.0 if current is img else None)
+        yield size_name, pad_image(current, size_dims)
+
+def image_save_params(format: str, quality: int, webp_method: int = 6) -> Dict[str, Any]:
+    save_params: Dict[str, Any] = {'format': format}
+    if format == 'JPEG':
+        save_params.update({
+            'quality': quality,
+            'optimize': True,
+            'progressive': True
+        })
+    elif format == 'WebP':
+        save_params.update({
+            'quality': quality,
+            'method': webp_method,
+            'lossless': False
+        })
+    return save_params
+
+def encode_image(img: Image.Image, format: str, quality: int, webp_method: int = 6) -> bytes:
+    """在内存中编码，同一张解码后的图片可以依次编码为多种格式"""
+    buffer = io.BytesIO()
+    img.save(buffer, **image_save_params(format, quality, webp_method))
+    return buffer.getvalue()
+
+def optimize_single_image(input_path: str, output_path: str, size=None, quality=85, format='JPEG') -> Optional[Dict[str, int]]:
+    """优化单张图片，成功时返回输出文件的 {width, height, bytes}，失败返回 None"""
     try:
-        with Image.open(input_path) as img:
-            # 转换为RGB模式（确保兼容性）
-            if img.mode in ('RGBA', 'P'):
-                img = img.convert('RGB')
-            
-            # 自动旋转（处理EXIF信息）
-            img = ImageOps.exif_transpose(img)
-            
-            # 调整尺寸
-            if size:
-                # 保持宽高比
-                img.thumbnail(size, Image.Resampling.LANCZOS)
-                
-                # 如果需要确切的尺寸，在中心创建新图片
-                if img.size != size:
-                    new_img = Image.new('RGB', size, (255, 255, 255))
-                    paste_x = (size[0] - img.size[0]) // 2
-                    paste_y = (size[1] - img.size[1]) // 2
-                    new_img.paste(img, (paste_x, paste_y))
-                    img = new_img
-            
-            # 确保输出目录存在
-            os.makedirs(os.path.dirname(output_path), exist_ok=True)
-            
-            # 保存优化后的图片
-            save_params = {'format': format}
-            if format == 'JPEG':
-                save_params.update({
-                    'quality': quality,
-                    'optimize': True,
-                    'progressive': True
-                })
-            elif format == 'WebP':
-                save_params.update({
-                    'quality': quality,
-                    'method': 6,
-                    'lossless': False
-                })
-            
-            img.save(output_path, **save_params)
-            return True
-            
+        img = load_image(input_path)
+
+        # 调整尺寸：保持宽高比，不足目标尺寸时在中心补白
+        if size:
+            img = next(derive_sized_images(img, {'target': size}))[1]
+
+        # 确保输出目录存在
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+
+        # 保存优化后的图片
+        img.save(output_path, **image_save_params(format, quality))
+        return {
+            "width": img.size[0],
+            "height": img.size[1],
+            "bytes": os.path.getsize(output_path)
+        }
+
     except Exception as e:
         print(f"Error optimizing image {input_path}: {e}")
-        return False
+        return None
+
+def save_product_image_variants(src_path: str, product_code: str, unique_stem: str) -> Dict[str, Dict[str, Any]]:
+    """
+    生成产品图片的原图及各尺寸 JPEG/WebP 版本，返回变体清单：
+    {"original": {"jpg": {"width", "height", "bytes"}, "webp": {...}}, "small": {...}, ...}
+    源图只解码一次，各尺寸级联缩放，每个尺寸的图片同时编码为两种格式；只记录实际写入成功的文件
+    """
+    product_dir = os.path.join(IMAGES_DIR, product_code)
+    manifest: Dict[str, Dict[str, Any]] = {}
+
+    try:
+        source = load_image(src_path)
+    except Exception as e:
+        print(f"Error decoding image {src_path}: {e}")
+        return manifest
+
+    targets = [('original', product_dir, source)]
+    targets += [(size_name, os.path.join(product_dir, size_name), sized)
+                for size_name, sized in derive_sized_images(source, PRODUCT_IMAGE_SIZES)]
+
+    for size_name, target_dir, img in targets:
+        os.makedirs(target_dir, exist_ok=True)
+        is_original = size_name == 'original'
+        for ext, (image_format, original_quality, sized_quality) in PRODUCT_IMAGE_FORMATS.items():
+            output_path = os.path.join(target_dir, f"{unique_stem}.{ext}")
+            # 先写临时文件再替换：同一内容的文件可能正被其他图片记录引用和访问
+            temp_path = f"{output_path}.{uuid.uuid4().hex[:8]}.tmp"
+            try:
+                data = encode_image(
+                    img, image_format,
+                    original_quality if is_original else sized_quality,
+                    ORIGINAL_WEBP_METHOD if is_original else 6
+                )
+                with open(temp_path, "wb") as output:
+                    output.write(data)
+                os.replace(temp_path, output_path)
+            except Exception as e:
+                print(f"Error encoding {output_path}: {e}")
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+                continue
+            manifest.setdefault(size_name, {})[ext] = {
+                "width": img.size[0],
+                "height": img.size[1],
+                "bytes": len(data)
+            }
+
+    return manifest
+
+def render_image_variant(src_path: str, output_path: str, width: int, ext: str) -> Dict[str, int]:
+    """按需生成单个变体：等比缩放到宽度不超过 width（不补白、不放大），编码为 ext 格式写入 output_path"""
+    img = load_image(src_path, draft_size=(width, width))
+    target = fit_size(img.size, (width, img.size[1]))
+    if target != img.size:
+        img = img.resize(target, Image.Resampling.LANCZOS, reducing_gap=2.0)
+    image_format, _, quality = PRODUCT_IMAGE_FORMATS[ext]
+    data = encode_image(img, image_format, quality)
+    with open(output_path, "wb") as output:
+        output.write(data)
+    return {"width": img.size[0], "height": img.size[1], "bytes": len(data)}
+
+def scan_product_image_variants(product_code: str, unique_stem: str) -> Dict[str, Dict[str, Any]]:
+    """扫描磁盘上已有的变体文件生成清单（用于历史图片回填），只读取图片头信息，不解码"""
+    product_dir = os.path.join(IMAGES_DIR, product_code)
+    manifest: Dict[str, Dict[str, Any]] = {}
+
+    targets = [('original', product_dir)]
+    targets += [(size_name, os.path.join(product_dir, size_name)) for size_name in PRODUCT_IMAGE_SIZES]
+
+    for size_name, target_dir in targets:
+        for ext in PRODUCT_IMAGE_FORMATS:
+            path = os.path.join(target_dir, f"{unique_stem}.{ext}")
+            if not os.path.exists(path):
+                continue
+            try:
+                with Image.open(path) as img:
+                    width, height = img.size
+            except Exception:
+                continue
+            manifest.setdefault(size_name, {})[ext] = {
+                "width": width,
+                "height": height,
+                "bytes": os.path.getsize(path)
+            }
+
+    return manifest
 
 async def save_multiple_files(files: List[UploadFile], subfolder: str) -> List[Dict[str, Any]]:
     """保存多个文件到指定子文件夹"""
@@ -129,13 +307,14 @@ async def save_carousel_image(file: UploadFile) -> str:
         with open(temp_path, "wb") as buffer:
             buffer.write(content)
         
-        # 优化图片 - 轮播图需要更大尺寸
-        success = optimize_single_image(
-            temp_path, 
-            final_path, 
-            size=(1920, 1080),  # 轮播图尺寸
-            quality=90, 
-            format='JPEG'
+        # 优化图片 - 轮播图需要更大尺寸（在图片进程池中执行）
+        success = await image_pool.run(
+            optimize_single_image,
+            temp_path,
+            final_path,
+            (1920, 1080),  # 轮播图尺寸
+            90,
+            'JPEG'
         )
         
         if not success:
@@ -149,90 +328,68 @@ async def save_carousel_image(file: UploadFile) -> str:
         if os.path.exists(temp_path):
             os.remove(temp_path)
 
-async def save_product_images_optimized(files: List[UploadFile], product_code: str) -> List[Dict[str, Any]]:
-    """保存并优化产品图片，生成多个尺寸"""
-    if not files:
-        return []
-    
-    # 定义尺寸
-    sizes = {
-        'thumbnail': (150, 150),
-        'small': (300, 300),
-        'medium': (500, 500), 
-        'large': (800, 800)
-    }
-    
-    # 创建产品图片目录
-    product_dir = os.path.join(IMAGES_DIR, product_code)
-    os.makedirs(product_dir, exist_ok=True)
-    
-    # 为每个尺寸创建子目录
-    for size_name in sizes.keys():
-        size_dir = os.path.join(product_dir, size_name)
-        os.makedirs(size_dir, exist_ok=True)
-    
-    saved_images = []
-    
+async def stage_product_images(files: List[UploadFile], product_code: str, job_id: str) -> List[Dict[str, Any]]:
+    """
+    只保存上传的原始文件，不做图片处理，原图及各尺寸由后台任务生成（见 image_job_service）。
+    返回的 url 是变体生成后原图的位置（按内容哈希命名，相同内容的上传指向同一组文件），
+    source 为暂存文件相对 UPLOAD_DIR 的路径
+    """
+    job_dir = os.path.join(STAGING_DIR, job_id)
+    os.makedirs(job_dir, exist_ok=True)
+
+    staged_images = []
     for i, file in enumerate(files):
         if not file.filename:
             continue
-            
-        # 生成唯一文件名
-        file_stem = Path(file.filename).stem
-        file_extension = Path(file.filename).suffix.lower()
-        unique_stem = f"{file_stem}_{uuid.uuid4().hex[:8]}"
-        temp_path = f"/tmp/{uuid.uuid4()}{file_extension}"
-        
-        try:
-            # 先保存临时文件
-            content = await file.read()
-            with open(temp_path, "wb") as buffer:
-                buffer.write(content)
-            
-            # 保存原图（JPEG和WebP格式）
-            original_jpg = os.path.join(product_dir, f"{unique_stem}.jpg")
-            original_webp = os.path.join(product_dir, f"{unique_stem}.webp")
-            
-            optimize_single_image(temp_path, original_jpg, None, quality=90, format='JPEG')
-            optimize_single_image(temp_path, original_webp, None, quality=80, format='WebP')
-            
-            # 生成各种尺寸
-            for size_name, size_dims in sizes.items():
-                # JPEG版本
-                jpg_path = os.path.join(product_dir, size_name, f"{unique_stem}.jpg")
-                optimize_single_image(temp_path, jpg_path, size_dims, quality=85, format='JPEG')
-                
-                # WebP版本
-                webp_path = os.path.join(product_dir, size_name, f"{unique_stem}.webp")
-                optimize_single_image(temp_path, webp_path, size_dims, quality=80, format='WebP')
-            
-            # 返回图片信息
-            relative_path = f"images/{product_code}/{unique_stem}.jpg"
-            image_type = "main" if i == 0 else "gallery"
-            
-            saved_images.append({
-                "url": relative_path,
-                "alt": f"{product_code} - Image {i+1}",
-                "type": image_type,
-                "filename": f"{unique_stem}.jpg",
-                "original_name": file.filename
-            })
-            
-        finally:
-            # 清理临时文件
-            if os.path.exists(temp_path):
-                os.remove(temp_path)
-    
-    return saved_images
 
-def delete_file(file_path: str) -> bool:
-    """删除文件及其所有尺寸版本"""
+        content = await file.read()
+        digest = content_hash(content)
+        # 同一次上传中可能有相同内容的文件，暂存文件名按序号区分
+        staged_name = f"{digest}_{i}{Path(file.filename).suffix.lower()}"
+        with open(os.path.join(job_dir, staged_name), "wb") as buffer:
+            buffer.write(content)
+
+        staged_images.append({
+            "url": product_image_url(product_code, digest),
+            "alt": f"{product_code} - Image {i+1}",
+            "type": "main" if i == 0 else "gallery",
+            "filename": f"{digest}.jpg",
+            "original_name": file.filename,
+            "source": os.path.relpath(os.path.join(job_dir, staged_name), IMAGES_DIR)
+        })
+
+    return staged_images
+
+def existing_image_variants(db: Session, url: str) -> Optional[Dict[str, Dict[str, Any]]]:
+    """相同内容已生成过变体时返回其清单（原图和 small 文件仍在磁盘上），上传 / 导入时据此跳过解码"""
+    parts = url.replace("images/", "", 1).split("/")
+    if not url.startswith("images/") or len(parts) != 2:
+        return None
+    product_dir = os.path.join(IMAGES_DIR, parts[0])
+    stem = Path(parts[1]).stem
+    for (variants,) in db.query(ProductImage.variants).filter(ProductImage.url == url):
+        if not variants or not variants.get("small"):
+            continue
+        small_ext = next(iter(variants["small"]))
+        if (os.path.exists(os.path.join(product_dir, f"{stem}.jpg"))
+                and os.path.exists(os.path.join(product_dir, "small", f"{stem}.{small_ext}"))):
+            return variants
+    return None
+
+def delete_file(file_path: str, db: Optional[Session] = None) -> bool:
+    """
+    删除文件及其所有尺寸版本。
+    产品图片可被多条记录引用（按内容哈希命名）：传入 db 时只在没有 ProductImage 再引用该 url 时才删除，
+    调用方需先删除（或 flush 删除）自己的图片记录
+    """
     if not file_path:
         return True
         
     try:
         # 如果是产品图片，删除所有相关文件
         if file_path.startswith("images/") and "/" in file_path:
+            if db is not None and db.query(ProductImage.id).filter(ProductImage.url == file_path).first():
+                return True
             parts = file_path.replace("images/", "").split("/")
             if len(parts) >= 2:
                 product_code = parts[0]
@@ -248,13 +405,15 @@ def delete_file(file_path: str) -> bool:
                         os.remove(original_file)
                 
                 # 删除各种尺寸版本
-                sizes = ['thumbnail', 'small', 'medium', 'large']
-                for size in sizes:
+                for size in PRODUCT_IMAGE_SIZES:
                     size_dir = os.path.join(product_dir, size)
                     for ext in ['.jpg', '.webp']:
                         size_file = os.path.join(size_dir, f"{file_stem}{ext}")
                         if os.path.exists(size_file):
                             os.remove(size_file)
+
+                # 删除按需生成的变体缓存
+                image_variant_cache.discard(f"{product_code}/{file_stem}")
                 
                 return True
         else:
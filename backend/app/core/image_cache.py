@@ -0,0 +1,165 @@
+"""
+按需生成的图片变体磁盘缓存
+/img/{货号}/{文件名} 接口首次请求某个宽度 / 格式时才从原图生成，结果写入 IMAGE_CACHE_DIR，
+总大小超过 IMAGE_CACHE_MAX_BYTES 时按最近最少使用淘汰。
+同一变体的并发请求共享一次生成（single-flight），不会重复编码；
+命中时更新文件 mtime，服务重启后按 mtime 恢复淘汰顺序。
+FileResponse 在发送时才按路径打开文件，因此刚返回过路径的条目在
+IMAGE_CACHE_SERVE_GRACE_SECONDS 秒内不会被淘汰（期间总大小可以暂时超过上限）
+"""
+
+import asyncio
+import logging
+import os
+import shutil
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_DIR = os.getenv("UPLOAD_DIR", "static/images")
+IMAGE_CACHE_DIR = os.getenv("IMAGE_CACHE_DIR", os.path.join(UPLOAD_DIR, ".cache"))
+IMAGE_CACHE_MAX_BYTES = int(os.getenv("IMAGE_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+IMAGE_CACHE_SERVE_GRACE_SECONDS = float(os.getenv("IMAGE_CACHE_SERVE_GRACE_SECONDS", "10"))
+
+
+class VariantDiskCache:
+
+    def __init__(self, directory: str = IMAGE_CACHE_DIR, max_bytes: int = IMAGE_CACHE_MAX_BYTES,
+                 serve_grace_seconds: float = IMAGE_CACHE_SERVE_GRACE_SECONDS):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.serve_grace_seconds = serve_grace_seconds
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries: Optional["OrderedDict[str, int]"] = None  # key -> 字节数，越靠后越新
+        self._total = 0
+        self._served: "OrderedDict[str, float]" = OrderedDict()  # key -> 最近一次返回路径的时间，越靠后越新
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    def path_for(self, key: str) -> str:
+        return os.path.join(self.directory, key)
+
+    def _load(self) -> "OrderedDict[str, int]":
+        """首次使用时扫描缓存目录（调用方持有锁）"""
+        if self._entries is None:
+            found = []
+            for root, _, files in os.walk(self.directory):
+                for name in files:
+                    if name.endswith(".tmp"):
+                        continue
+                    path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    found.append((stat.st_mtime, os.path.relpath(path, self.directory), stat.st_size))
+            self._entries = OrderedDict((key, size) for _, key, size in sorted(found))
+            self._total = sum(self._entries.values())
+        return self._entries
+
+    def _mark_served(self, key: str, now: float) -> None:
+        """记录 key 的路径刚被返回，并丢弃已过保护期的记录（调用方持有锁）"""
+        self._served[key] = now
+        self._served.move_to_end(key)
+        while self._served and now - next(iter(self._served.values())) >= self.serve_grace_seconds:
+            self._served.popitem(last=False)
+
+    def get(self, key: str) -> Optional[str]:
+        """命中时返回文件路径并标记为最近使用"""
+        path = self.path_for(key)
+        with self._lock:
+            entries = self._load()
+            if key not in entries:
+                return None
+            if not os.path.exists(path):
+                self._total -= entries.pop(key)
+                return None
+            entries.move_to_end(key)
+            self._mark_served(key, time.monotonic())
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return path
+
+    def put(self, key: str, temp_path: str) -> str:
+        """
+        把生成好的临时文件移入缓存，并淘汰最久未使用的条目直到总大小不超过上限；
+        保护期内返回过的条目跳过，避免删除其他请求即将发送的文件
+        """
+        path = self.path_for(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(temp_path, path)
+        size = os.path.getsize(path)
+        evicted = []
+        with self._lock:
+            entries = self._load()
+            self._total += size - entries.pop(key, 0)
+            entries[key] = size
+            now = time.monotonic()
+            self._mark_served(key, now)
+            if self._total > self.max_bytes:
+                for old_key in list(entries):
+                    if self._total <= self.max_bytes:
+                        break
+                    if old_key == key or old_key in self._served:
+                        continue
+                    self._total -= entries.pop(old_key)
+                    evicted.append(old_key)
+        for old_key in evicted:
+            try:
+                os.remove(self.path_for(old_key))
+            except OSError:
+                pass
+        return path
+
+    def discard(self, prefix: str) -> None:
+        """删除 prefix 目录下的全部缓存（原图被删除时调用）"""
+        prefix = prefix.rstrip("/") + "/"
+        with self._lock:
+            entries = self._load()
+            for key in [key for key in entries if key.startswith(prefix)]:
+                self._total -= entries.pop(key)
+        shutil.rmtree(self.path_for(prefix), ignore_errors=True)
+
+    @property
+    def total_bytes(self) -> int:
+        with self._lock:
+            self._load()
+            return self._total
+
+    async def get_or_create(self, key: str, render: Callable[[str], Awaitable[object]]) -> str:
+        """
+        返回缓存文件路径，未命中时调用 render(临时文件路径) 生成。
+        同一 key 的并发请求等待同一次生成；客户端断开只取消自己的等待，不中断生成
+        """
+        path = self.get(key)
+        if path is not None:
+            self.hits += 1
+            return path
+
+        task = self._inflight.get(key)
+        if task is None:
+            self.misses += 1
+            task = asyncio.ensure_future(self._create(key, render))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def _create(self, key: str, render: Callable[[str], Awaitable[object]]) -> str:
+        temp_path = f"{self.path_for(key)}.{uuid.uuid4().hex}.tmp"
+        os.makedirs(os.path.dirname(temp_path), exist_ok=True)
+        try:
+            await render(temp_path)
+            return self.put(key, temp_path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+
+image_variant_cache = VariantDiskCache()
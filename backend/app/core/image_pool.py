@@ -0,0 +1,92 @@
+"""
+图片处理进程池
+Pillow 解码、缩放、编码都是 CPU 密集操作，在 async 接口中直接调用会阻塞事件循环，
+一次上传几十张图片时同一进程的其他请求都要等待。图片任务交给独立的进程池并行执行（多核同时处理），
+接口 await 结果，期间事件循环照常处理其他请求。
+排队（含执行中）的任务数不超过 IMAGE_QUEUE_SIZE，已满时等待空位，等待超过 IMAGE_QUEUE_TIMEOUT 秒则报忙
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from typing import Any, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+# 工作进程数；设为 0 时改用单个后台线程（不额外启动进程，仍不阻塞事件循环）
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", str(os.cpu_count() or 1)))
+IMAGE_QUEUE_SIZE = int(os.getenv("IMAGE_QUEUE_SIZE", str(max(IMAGE_WORKERS, 1) * 4)))
+IMAGE_QUEUE_TIMEOUT = float(os.getenv("IMAGE_QUEUE_TIMEOUT", "60"))
+
+
+class ImagePoolBusy(RuntimeError):
+    """排队任务已满且等待超时"""
+
+
+class ImageProcessPool:
+
+    def __init__(self, workers: int = IMAGE_WORKERS, queue_size: int = IMAGE_QUEUE_SIZE,
+                 queue_timeout: float = IMAGE_QUEUE_TIMEOUT):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self._executor: Optional[Executor] = None
+        self._lock = threading.Lock()
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._slots_loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _get_executor(self) -> Executor:
+        """首次使用时启动；用 spawn 而不是 fork，避免复制服务进程中的线程和数据库连接"""
+        with self._lock:
+            if self._executor is None:
+                if self.workers > 0:
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+                    )
+                else:
+                    self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="image")
+            return self._executor
+
+    def _get_slots(self) -> asyncio.Semaphore:
+        # 信号量绑定事件循环，循环变化（如测试中每个 TestClient 请求）时重新创建
+        loop = asyncio.get_running_loop()
+        if self._slots_loop is not loop:
+            self._slots = asyncio.Semaphore(self.queue_size)
+            self._slots_loop = loop
+        return self._slots
+
+    async def run(self, func: Callable[..., Any], *args: Any) -> Any:
+        """在进程池中执行 func(*args) 并返回结果；func 和参数需可 pickle（模块级函数、路径字符串等）"""
+        slots = self._get_slots()
+        try:
+            await asyncio.wait_for(slots.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            raise ImagePoolBusy("Image processing queue is full, please retry later")
+        try:
+            executor = self._get_executor()
+            try:
+                return await asyncio.get_running_loop().run_in_executor(executor, partial(func, *args))
+            except BrokenProcessPool:
+                # 工作进程异常退出（如内存不足被杀），丢弃进程池，下次调用时重建
+                logger.error("Image worker process died, restarting the pool")
+                with self._lock:
+                    if self._executor is executor:
+                        self._executor = None
+                executor.shutdown(wait=False)
+                raise
+        finally:
+            slots.release()
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+
+image_pool = ImageProcessPool()
@@ -0,0 +1,34 @@
+"""
+货号规范化
+数字部分的前导零不区分：O1 / O01 / O001 视为同一货号（批量导入匹配图片文件夹、联想搜索共用）
+"""
+
+import re
+
+_PREFIXED_CODE = re.compile(r'^([A-Za-z]+)([-_]?)0*(\d+)$')
+_NUMERIC_CODE = re.compile(r'^0*(\d+)$')
+
+
+def normalize_code(code: str) -> str:
+    """
+    规范化货号，移除数字部分的前导零，统一格式。
+    支持多种格式：
+    - O01 -> o1, O001 -> o1, O1 -> o1
+    - F-01 -> f-1, F_01 -> f_1
+    - 01 -> 1 (纯数字)
+    - abc -> abc (纯字母保持不变)
+    """
+    code = code.strip().lower()
+
+    # 模式1: 字母前缀 + 可选分隔符 + 数字 (如 O01, F-01, ABC_001)
+    match = _PREFIXED_CODE.match(code)
+    if match:
+        prefix, sep, num = match.groups()
+        return f"{prefix}{sep}{num}"
+
+    # 模式2: 纯数字带前导零 (如 001 -> 1)
+    match = _NUMERIC_CODE.match(code)
+    if match:
+        return match.group(1)
+
+    return code
@@ -29,4 +29,8 @@ def get_db():
 # Create tables
 def create_tables():
     from app.models.models import Base
+    from app.services.search_service import ProductSearchService
     Base.metadata.create_all(bind=engine)
+    with engine.begin() as connection:
+        if ProductSearchService.create_index(connection):
+            ProductSearchService.rebuild_index(connection)
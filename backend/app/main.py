@@ -1,7 +1,8 @@
 from fastapi import FastAPI, Depends, HTTPException, status, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import JSONResponse, FileResponse
+from fastapi.responses import JSONResponse, FileResponse, Response
+import asyncio
 import os
 import logging
 from datetime import datetime
@@ -10,9 +11,18 @@ from pathlib import Path
 from app.db.session import get_db, create_tables
 from app.core.security import create_admin_user
 from app.schemas.schemas import ErrorResponse
+from app.core.catalog import is_cacheable_path, compute_etag, etag_matches, get_catalog_version
+from app.services.popularity_service import popularity_worker, flush_popularity_counters
+from app.services.similarity_service import build_similar_products_if_empty
+from app.core.image_pool import image_pool
+from app.services.image_job_service import image_job_worker
+from app.core.compression import (
+    negotiate_encoding, is_compressible, compress, weak_etag, response_cache,
+    file_response, PrecompressedStaticFiles, MIN_COMPRESS_SIZE
+)
 
 # Import routers
-from app.api.routers import auth, products, admin, carousels, featured, settings, imports
+from app.api.routers import auth, products, admin, carousels, featured, settings, imports, exports, images
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -27,26 +37,6 @@ app = FastAPI(
     redoc_url="/redoc"
 )
 
-# CORS middleware
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=[
-        "http://localhost:3000",
-        "http://localhost:5173",
-        "http://localhost:8080",
-        "http://localhost:8081",
-        "http://127.0.0.1:3000",
-        "http://127.0.0.1:5173",
-        "http://127.0.0.1:8080",
-        "http://127.0.0.1:8081",
-        "https://frbzhxxscekk.sealoshzh.site",
-        "http://frbzhxxscekk.sealoshzh.site"
-    ],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
 # 静态文件目录配置（支持 PVC 挂载）
 UPLOAD_DIR = os.getenv("UPLOAD_DIR", "static/images")
 STATIC_DIR = os.path.dirname(UPLOAD_DIR) if "/" in UPLOAD_DIR else "static"
@@ -63,6 +53,8 @@ app.mount("/images", StaticFiles(directory=UPLOAD_DIR), name="images")
 # 自动运行数据库迁移
 def run_migrations():
     """运行 Alembic 数据库迁移"""
+    # 初始迁移为空，全新数据库需要先按模型建表，迁移脚本对已存在的结构做了幂等处理
+    create_tables()
     try:
         from alembic.config import Config
         from alembic import command
@@ -71,8 +63,7 @@ def run_migrations():
         command.upgrade(alembic_cfg, "head")
         logger.info("Database migrations completed successfully")
     except Exception as e:
-        logger.warning(f"Migration skipped or failed: {e}, falling back to create_tables")
-        create_tables()
+        logger.warning(f"Migration skipped or failed: {e}")
 
 # Create tables and admin user on startup
 @app.on_event("startup")
@@ -86,6 +77,17 @@ async def startup_event():
         logger.error(f"Failed to create admin user: {e}")
     finally:
         db.close()
+    app.state.popularity_task = asyncio.create_task(popularity_worker())
+    app.state.image_job_task = asyncio.create_task(image_job_worker.run())
+    # First start after the upgrade: compute similar products without delaying startup
+    app.state.similarity_task = asyncio.create_task(asyncio.to_thread(build_similar_products_if_empty))
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    app.state.popularity_task.cancel()
+    app.state.image_job_task.cancel()
+    flush_popularity_counters()
+    image_pool.shutdown()
 
 # Middleware for request logging
 @app.middleware("http")
@@ -102,6 +104,82 @@ async def log_requests(request, call_next):
     
     return response
 
+# Conditional GET for public catalog endpoints: ETag derived from the catalog version,
+# so a matching If-None-Match is answered with 304 before any database access.
+# 200 responses are cached per catalog version, already compressed for the negotiated encoding
+@app.middleware("http")
+async def catalog_etag(request: Request, call_next):
+    if request.method != "GET" or not is_cacheable_path(request.url.path):
+        return await call_next(request)
+
+    path, query = request.url.path, request.url.query
+    version = get_catalog_version()
+    etag = compute_etag(path, query, version)
+    cache_headers = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+    if_none_match = request.headers.get("if-none-match")
+    if etag_matches(if_none_match, etag):
+        # 304 回送客户端持有的那种形式（压缩表示使用弱 ETag）
+        if weak_etag(etag) in if_none_match:
+            cache_headers["ETag"] = weak_etag(etag)
+        return Response(status_code=304, headers=cache_headers)
+
+    encoding = negotiate_encoding(request.headers.get("accept-encoding"))
+    cached = await asyncio.to_thread(response_cache.get, version, path, query, encoding)
+    if cached is None:
+        response = await call_next(request)
+        if response.status_code != 200:
+            return response
+        media_type = response.headers.get("content-type", "application/json")
+        body = b"".join([chunk async for chunk in response.body_iterator])
+        cached = (*await asyncio.to_thread(response_cache.put, version, path, query, body, media_type, encoding),
+                  media_type)
+
+    body, applied_encoding, media_type = cached
+    if applied_encoding:
+        cache_headers.update({"ETag": weak_etag(etag), "Content-Encoding": applied_encoding})
+    return Response(body, headers=cache_headers, media_type=media_type)
+
+# Compress remaining JSON / text responses on the fly (bodies with a known length only, so streams pass through)
+@app.middleware("http")
+async def compress_responses(request: Request, call_next):
+    response = await call_next(request)
+    if ("content-encoding" in response.headers
+            or not is_compressible(response.headers.get("content-type"))
+            or int(response.headers.get("content-length", 0)) < MIN_COMPRESS_SIZE):
+        return response
+
+    encoding = negotiate_encoding(request.headers.get("accept-encoding"))
+    if encoding is None:
+        response.headers["Vary"] = "Accept-Encoding"
+        return response
+
+    body = b"".join([chunk async for chunk in response.body_iterator])
+    body = await asyncio.to_thread(compress, body, encoding)
+    headers = {key: value for key, value in response.headers.items() if key != "content-length"}
+    headers.update({"Content-Encoding": encoding, "Vary": "Accept-Encoding"})
+    return Response(body, status_code=response.status_code, headers=headers)
+
+# CORS middleware (added last so it is the outermost layer: cached and 304 responses get CORS headers too)
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=[
+        "http://localhost:3000",
+        "http://localhost:5173",
+        "http://localhost:8080",
+        "http://localhost:8081",
+        "http://127.0.0.1:3000",
+        "http://127.0.0.1:5173",
+        "http://127.0.0.1:8080",
+        "http://127.0.0.1:8081",
+        "https://frbzhxxscekk.sealoshzh.site",
+        "http://frbzhxxscekk.sealoshzh.site"
+    ],
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+
+
 # Error handlers
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request, exc):
@@ -132,6 +210,8 @@ app.include_router(carousels.router, prefix="/api/carousels", tags=["Carousels"]
 app.include_router(featured.router, prefix="/api/featured-products", tags=["Featured Products"])
 app.include_router(settings.router, prefix="/api/settings", tags=["Settings"])
 app.include_router(imports.router, prefix="/api/products/batch-import", tags=["Imports"])
+app.include_router(exports.router, prefix="/api/products/export", tags=["Exports"])
+app.include_router(images.router, prefix="/img", tags=["Images"])
 
 # Health check (放在静态文件之前)
 @app.get("/health")
@@ -143,17 +223,18 @@ FRONTEND_DIR = Path(__file__).parent.parent / "frontend_dist"
 
 if FRONTEND_DIR.exists():
     # 挂载前端静态资源
-    app.mount("/assets", StaticFiles(directory=FRONTEND_DIR / "assets"), name="frontend_assets")
+    app.mount("/assets", PrecompressedStaticFiles(directory=FRONTEND_DIR / "assets"), name="frontend_assets")
     
     # SPA fallback: 所有非 API 路由返回 index.html
     @app.get("/{full_path:path}")
     async def serve_spa(request: Request, full_path: str):
         # API 和静态文件路由已经在上面处理
         file_path = FRONTEND_DIR / full_path
+        accept_encoding = request.headers.get("accept-encoding")
         if file_path.exists() and file_path.is_file():
-            return FileResponse(file_path)
+            return await file_response(file_path, accept_encoding)
         # 返回 index.html 支持前端路由
-        return FileResponse(FRONTEND_DIR / "index.html")
+        return await file_response(FRONTEND_DIR / "index.html", accept_encoding)
 else:
     # 开发环境：返回 API 信息
     @app.get("/")
@@ -1,21 +1,63 @@
-from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, Text, ForeignKey, JSON
+from sqlalchemy import Column, Integer, String, Float, Boolean, Date, DateTime, Text, ForeignKey, JSON, Index, func, literal_column
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, validates
 from datetime import datetime
 import uuid
 
+from app.core.product_code import normalize_code
+
 Base = declarative_base()
 
+# Stand-in for NULL in sort keys so keyset comparisons never see NULL (NULLs always sort last)
+NULL_SORT_SENTINEL = 1e308
+# DateTime columns are stored as 'YYYY-MM-DD HH:MM:SS.ffffff' text on SQLite, so their sentinels are compared as strings
+NULL_DATETIME_FIRST = datetime(1, 1, 1)
+NULL_DATETIME_LAST = datetime(9999, 12, 31, 23, 59, 59, 999999)
+
 def utc_now():
     """Return current UTC datetime with microsecond precision."""
     return datetime.utcnow()
 
+def _to_number(value, cast=float):
+    try:
+        return cast(value) if value is not None and value != "" else None
+    except (TypeError, ValueError):
+        return None
+
+def dimension_columns(dimensions) -> dict:
+    """Flatten the dimensions JSON into the denormalized numeric columns on Product."""
+    dimensions = dimensions if isinstance(dimensions, dict) else {}
+    capacity = dimensions.get("capacity")
+    capacity = capacity if isinstance(capacity, dict) else {}
+    capacity_min = _to_number(capacity.get("min"))
+    capacity_max = _to_number(capacity.get("max"))
+    return {
+        "weight": _to_number(dimensions.get("weight")),
+        "length": _to_number(dimensions.get("length")),
+        "width": _to_number(dimensions.get("width")),
+        "height": _to_number(dimensions.get("height")),
+        # A single bound is treated as both ends of the range
+        "capacity_min": capacity_min if capacity_min is not None else capacity_max,
+        "capacity_max": capacity_max if capacity_max is not None else capacity_min,
+        "compartments": _to_number(dimensions.get("compartments"), int),
+    }
+
+def nulls_last(column, descending: bool):
+    """Keyset-safe sort key for a nullable column; the sentinel is rendered inline so it matches the expression indexes."""
+    if isinstance(column.type, DateTime):
+        sentinel = NULL_DATETIME_FIRST if descending else NULL_DATETIME_LAST
+        return func.coalesce(column, literal_column(f"'{sentinel.isoformat(sep=' ', timespec='microseconds')}'"))
+    sentinel = -NULL_SORT_SENTINEL if descending else NULL_SORT_SENTINEL
+    return func.coalesce(column, literal_column(repr(sentinel)))
+
 class Product(Base):
     __tablename__ = "products"
     
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
     name = Column(String, nullable=False, index=True)
     code = Column(String, nullable=False, unique=True, index=True)
+    # normalize_code(code), so O1 / O01 resolve to one product with a single index probe (kept in sync by _sync_code_normalized)
+    code_normalized = Column(String, unique=True, index=True)
     description = Column(Text)
     
     # Product type and classification fields - now more flexible
@@ -31,6 +73,15 @@ class Product(Base):
     
     # Dimensions (stored as JSON for flexibility)
     dimensions = Column(JSON)  # ProductDimensions object with weight, length, width, height, capacity, compartments
+
+    # Numeric copies of dimensions for indexed range filters and sorts (kept in sync by _sync_dimension_columns)
+    weight = Column(Float, index=True)
+    length = Column(Float, index=True)
+    width = Column(Float, index=True)
+    height = Column(Float, index=True)
+    capacity_min = Column(Float, index=True)
+    capacity_max = Column(Float, index=True)
+    compartments = Column(Integer, index=True)
     
     # Pricing information
     cost_price = Column(Float, default=0.0)
@@ -41,13 +92,36 @@ class Product(Base):
     
     # Status and metadata
     in_stock = Column(Boolean, default=True)
-    popularity_score = Column(Integer, default=0)
+    popularity_score = Column(Integer, default=0)  # popularity_base + time-decayed view / add-to-cart score
+    popularity_base = Column(Integer, nullable=False, default=0, server_default="0")  # set through admin, kept by recomputes
     is_featured = Column(Boolean, default=False)
     created_at = Column(DateTime, default=utc_now)
     updated_at = Column(DateTime, default=utc_now, onupdate=utc_now)
     
     # Relationships
     images = relationship("ProductImage", back_populates="product", cascade="all, delete-orphan")
+    attributes = relationship("ProductAttribute", back_populates="product", cascade="all, delete-orphan")
+    event_counts = relationship("ProductEventCount", back_populates="product", cascade="all, delete-orphan")
+
+    __table_args__ = (
+        # Listing sorts: sort key + id (keyset pagination tiebreaker)
+        Index("ix_products_created_at_id", "created_at", "id"),
+        Index("ix_products_popularity_score_id", "popularity_score", "id"),
+        Index("ix_products_factory_price_id", "factory_price", "id"),
+        # Featured products block on the home page
+        Index("ix_products_is_featured_created_at", "is_featured", "created_at"),
+    )
+
+    @validates("code")
+    def _sync_code_normalized(self, key, code):
+        self.code_normalized = normalize_code(code) if code else None
+        return code
+
+    @validates("dimensions")
+    def _sync_dimension_columns(self, key, dimensions):
+        for column, value in dimension_columns(dimensions).items():
+            setattr(self, column, value)
+        return dimensions
 
 class ProductImage(Base):
     __tablename__ = "product_images"
@@ -58,11 +132,101 @@ class ProductImage(Base):
     alt = Column(String, nullable=False)
     type = Column(String, nullable=False)  # 'main', 'gallery', 'dimensions', 'detail'
     sort_order = Column(Integer, default=0)  # For ordering images
+    variants = Column(JSON(none_as_null=True))  # {size: {format: {width, height, bytes}}} of derived files; NULL = not yet recorded
     created_at = Column(DateTime, default=utc_now)
 
     # Relationships
     product = relationship("Product", back_populates="images")
 
+    __table_args__ = (
+        Index("ix_product_images_product_id_sort_order", "product_id", "sort_order"),
+        # Files are named by content hash, so several rows may share a url; counted before deleting files
+        Index("ix_product_images_url", "url"),
+    )
+
+class ProductAttribute(Base):
+    """Multi-valued classification fields split into one row per value, used for indexed filtering."""
+    __tablename__ = "product_attributes"
+
+    product_id = Column(String, ForeignKey("products.id"), primary_key=True)
+    kind = Column(String, primary_key=True)  # 'tube_type', 'box_type', 'functional_design', 'shape', 'material', 'process_type'
+    value = Column(String, primary_key=True)
+
+    # Relationships
+    product = relationship("Product", back_populates="attributes")
+
+    __table_args__ = (
+        Index("ix_product_attributes_kind_value", "kind", "value", "product_id"),
+    )
+
+class ProductEventCount(Base):
+    """Daily view / add-to-cart counters per product, written in batches by the popularity tracker."""
+    __tablename__ = "product_event_counts"
+
+    product_id = Column(String, ForeignKey("products.id"), primary_key=True)
+    day = Column(Date, primary_key=True)  # UTC day the events were recorded
+    views = Column(Integer, nullable=False, default=0)
+    add_to_carts = Column(Integer, nullable=False, default=0)
+
+    # Relationships
+    product = relationship("Product", back_populates="event_counts")
+
+    __table_args__ = (
+        # Decay job reads the recent window and prunes old days
+        Index("ix_product_event_counts_day", "day"),
+    )
+
+class ProductSimilarity(Base):
+    """Precomputed nearest neighbours of each product (see similarity_service), best match at rank 0."""
+    __tablename__ = "product_similarities"
+
+    product_id = Column(String, ForeignKey("products.id"), primary_key=True)
+    rank = Column(Integer, primary_key=True)
+    similar_product_id = Column(String, ForeignKey("products.id"), nullable=False)
+    score = Column(Float, nullable=False)  # cosine similarity of the attribute vectors
+
+    __table_args__ = (
+        # Incremental refresh finds the lists that contain a changed product
+        Index("ix_product_similarities_similar_product_id", "similar_product_id"),
+    )
+
+class ImageJob(Base):
+    """Background derivation of the images from one upload request (see image_job_service)."""
+    __tablename__ = "image_jobs"
+
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    product_id = Column(String, ForeignKey("products.id"), nullable=False)
+    status = Column(String, nullable=False, default="pending")  # 'pending', 'running', 'done', 'failed'
+    total = Column(Integer, nullable=False, default=0)
+    processed = Column(Integer, nullable=False, default=0)  # items finished, successfully or not
+    failed = Column(Integer, nullable=False, default=0)
+    attempts = Column(Integer, nullable=False, default=0)  # times the job has been claimed
+    claimed_at = Column(DateTime)
+    heartbeat_at = Column(DateTime)  # refreshed by the running worker; a stale heartbeat lets another worker reclaim the job
+    created_at = Column(DateTime, default=utc_now)
+    updated_at = Column(DateTime, default=utc_now, onupdate=utc_now)
+
+    # Relationships
+    items = relationship("ImageJobItem", back_populates="job", cascade="all, delete-orphan")
+
+    __table_args__ = (
+        # Worker picks the oldest pending job
+        Index("ix_image_jobs_status_created_at", "status", "created_at"),
+    )
+
+class ImageJobItem(Base):
+    """One uploaded file of an image job; the product image stays hidden until its item is done."""
+    __tablename__ = "image_job_items"
+
+    job_id = Column(String, ForeignKey("image_jobs.id"), primary_key=True)
+    image_id = Column(String, ForeignKey("product_images.id"), primary_key=True)
+    source = Column(String, nullable=False)  # staged upload relative to UPLOAD_DIR, removed once processed
+    status = Column(String, nullable=False, default="pending")  # 'pending', 'done', 'failed'
+    error = Column(Text)
+
+    # Relationships
+    job = relationship("ImageJob", back_populates="items")
+
 class User(Base):
     __tablename__ = "users"
 
@@ -87,6 +251,10 @@ class Carousel(Base):
     created_at = Column(DateTime, default=utc_now)
     updated_at = Column(DateTime, default=utc_now, onupdate=utc_now)
 
+    __table_args__ = (
+        Index("ix_carousels_is_active_sort_order", "is_active", "sort_order"),
+    )
+
 class FeaturedProduct(Base):
     __tablename__ = "featured_products"
 
@@ -100,6 +268,11 @@ class FeaturedProduct(Base):
     # Relationships
     product = relationship("Product", backref="featured_entries")
 
+    __table_args__ = (
+        Index("ix_featured_products_product_id", "product_id"),
+        Index("ix_featured_products_is_active_sort_order", "is_active", "sort_order"),
+    )
+
 class Settings(Base):
     __tablename__ = "settings"
 
@@ -117,3 +290,11 @@ class Settings(Base):
 
 # Keep original enums for reference, but models are no longer restricted to these
 IMAGE_TYPES = ['main', 'gallery', 'dimensions', 'detail']
+
+# Nullable sort keys are ordered by nulls_last(...) expressions
+Index("ix_products_created_at_nulls_last_desc", nulls_last(Product.created_at, True), Product.id)
+Index("ix_products_popularity_score_nulls_last_desc", nulls_last(Product.popularity_score, True), Product.id)
+Index("ix_products_capacity_min_nulls_last", nulls_last(Product.capacity_min, False), Product.id)
+Index("ix_products_capacity_max_nulls_last_desc", nulls_last(Product.capacity_max, True), Product.id)
+Index("ix_products_compartments_nulls_last", nulls_last(Product.compartments, False), Product.id)
+Index("ix_products_compartments_nulls_last_desc", nulls_last(Product.compartments, True), Product.id)
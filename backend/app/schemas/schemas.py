@@ -1,5 +1,6 @@
 from pydantic import BaseModel, Field, validator
-from typing import List, Optional, Dict, Any, Union
+from typing import List, Optional, Dict, Any, Union, Generic, TypeVar
+from typing_extensions import TypedDict
 from datetime import datetime
 from enum import Enum
 
@@ -8,6 +9,15 @@ class SortOption(str, Enum):
     POPULAR = "popular"
     PRICE_LOW = "price_low"
     PRICE_HIGH = "price_high"
+    RELEVANCE = "relevance"
+    CAPACITY_LOW = "capacity_low"
+    CAPACITY_HIGH = "capacity_high"
+    COMPARTMENTS_LOW = "compartments_low"
+    COMPARTMENTS_HIGH = "compartments_high"
+
+class ProductView(str, Enum):
+    FULL = 'full'  # every field and every displayable image
+    CARD = 'card'  # id, name, code, main image and factory price for product cards
 
 # Base schemas
 class ProductDimensions(BaseModel):
@@ -59,7 +69,7 @@ class ProductBase(BaseModel):
     box_dimensions: Optional[str] = None
     box_quantity: Optional[int] = None
     in_stock: bool = True
-    popularity_score: int = 0
+    popularity_score: int = 0  # manual base score; recent activity is added on top
     is_featured: bool = False
 
 class ProductCreate(ProductBase):
@@ -83,7 +93,7 @@ class ProductUpdate(BaseModel):
     box_dimensions: Optional[str] = None
     box_quantity: Optional[int] = None
     in_stock: Optional[bool] = None
-    popularity_score: Optional[int] = None
+    popularity_score: Optional[int] = None  # manual base score (null = 0); recent activity is added on top
     is_featured: Optional[bool] = None
 
 class ProductResponse(ProductBase):
@@ -95,6 +105,30 @@ class ProductResponse(ProductBase):
     class Config:
         from_attributes = True
 
+class ExportFormat(str, Enum):
+    NDJSON = 'ndjson'  # one JSON object per line
+    CSV = 'csv'
+
+class ImageFormat(str, Enum):
+    WEBP = 'webp'
+    JPG = 'jpg'
+
+class ProductEventType(str, Enum):
+    VIEW = 'view'
+    ADD_TO_CART = 'add_to_cart'
+
+class ProductEvent(BaseModel):
+    product_id: str = Field(..., min_length=1, max_length=64)
+    type: ProductEventType
+
+class ProductEventBatch(BaseModel):
+    events: List[ProductEvent] = Field(..., min_length=1, max_length=100)
+
+class ProductBatchRequest(BaseModel):
+    """Multi-get for cart / comparison views: each entry may be a product id or a product code."""
+    ids: List[str] = Field(..., min_length=1, max_length=300)
+    view: ProductView = ProductView.FULL
+
 class ProductFilters(BaseModel):
     tube_types: Optional[List[str]] = None
     box_types: Optional[List[str]] = None
@@ -111,6 +145,11 @@ class SortOption(str, Enum):
     POPULAR = 'popular'
     PRICE_LOW = 'price_low'
     PRICE_HIGH = 'price_high'
+    RELEVANCE = 'relevance'
+    CAPACITY_LOW = 'capacity_low'
+    CAPACITY_HIGH = 'capacity_high'
+    COMPARTMENTS_LOW = 'compartments_low'
+    COMPARTMENTS_HIGH = 'compartments_high'
 
 class ProductListResponse(BaseModel):
     products: List[ProductResponse]
@@ -149,6 +188,69 @@ class ApiResponse(BaseModel):
     message: Optional[str] = None
     success: bool = True
 
+# Wire-format product payloads (camelCase, as built by convert_product_to_response / convert_product_to_card).
+# Used only to serialize responses in pydantic-core, never to validate input; card payloads fill a subset of keys.
+class ProductImagePayload(TypedDict):
+    id: str
+    url: str
+    alt: str
+    type: str
+    sort_order: Optional[int]
+
+class ProductPricingPayload(TypedDict, total=False):
+    costPrice: Optional[float]
+    factoryPrice: float
+    hasSample: Optional[bool]
+    boxDimensions: Optional[str]
+    boxQuantity: Optional[int]
+
+class ProductPayload(TypedDict, total=False):
+    id: str
+    name: str
+    code: str
+    description: Optional[str]
+    productType: Optional[str]
+    tubeType: Optional[str]
+    boxType: Optional[str]
+    processType: Optional[str]
+    functionalDesigns: List[str]
+    shape: str
+    material: str
+    dimensions: Dict[str, Any]
+    images: List[ProductImagePayload]
+    pricing: ProductPricingPayload
+    inStock: Optional[bool]
+    popularityScore: Optional[int]
+    popularityBase: Optional[int]
+    isFeatured: Optional[bool]
+    createdAt: Optional[str]
+    updatedAt: Optional[str]
+
+class ProductListPayload(TypedDict, total=False):
+    products: List[ProductPayload]
+    total: Optional[int]
+    page: int
+    totalPages: Optional[int]
+    nextCursor: Optional[str]
+    facets: Dict[str, Dict[str, int]]
+
+class ProductBatchPayload(TypedDict):
+    products: List[ProductPayload]
+    missing: List[str]
+
+class ProductSuggestionPayload(TypedDict):
+    id: str
+    code: str
+    name: str
+
+PayloadT = TypeVar("PayloadT")
+
+class ApiPayload(TypedDict, Generic[PayloadT]):
+    """Same shape as ApiResponse, with a typed data field."""
+    data: PayloadT
+    message: Optional[str]
+    success: bool
+
 class ErrorResponse(BaseModel):
     message: str
     success: bool = False
@@ -0,0 +1,99 @@
+"""
+产品属性规范化服务
+将管型、盒型、功能设计、形状、材质、工艺等多值字段在写入时拆分到 product_attributes 表，
+筛选时走 (kind, value) 索引而不是对原字段做 LIKE 子串匹配
+"""
+
+from typing import Any, Dict, List
+
+from sqlalchemy import select, delete, insert
+from sqlalchemy.orm import Session
+
+from app.models.models import Product, ProductAttribute
+
+# 属性类型 -> Product 字段
+ATTRIBUTE_KINDS = {
+    "tube_type": "tube_type",
+    "box_type": "box_type",
+    "functional_design": "functional_designs",
+    "shape": "shape",
+    "material": "material",
+    "process_type": "process_type",
+}
+
+# 与 backup/clean_categories.py 的清洗规则一致：统一分隔符为 / 后拆分
+SEPARATORS = (',', '，', '、')
+
+
+class ProductAttributeService:
+
+    @staticmethod
+    def split_values(value: Any) -> List[str]:
+        """拆分多值字段，去空格、去重并保持原有顺序"""
+        if not value:
+            return []
+        cleaned = str(value)
+        for separator in SEPARATORS:
+            cleaned = cleaned.replace(separator, '/')
+        items = [item.strip() for item in cleaned.split('/') if item.strip()]
+        return list(dict.fromkeys(items))
+
+    @staticmethod
+    def product_values(product: Any) -> List[tuple]:
+        """返回产品的全部 (kind, value) 属性对，product 可以是 ORM 对象或行记录"""
+        pairs = []
+        for kind, field in ATTRIBUTE_KINDS.items():
+            for value in ProductAttributeService.split_values(getattr(product, field, None)):
+                pairs.append((kind, value))
+        return pairs
+
+    @staticmethod
+    def sync_product(product: Product) -> None:
+        """根据产品当前字段同步属性行，需在修改字段之后、提交之前调用"""
+        wanted = ProductAttributeService.product_values(product)
+        current = {(attr.kind, attr.value): attr for attr in product.attributes}
+
+        for key, attr in current.items():
+            if key not in wanted:
+                product.attributes.remove(attr)
+        for kind, value in wanted:
+            if (kind, value) not in current:
+                product.attributes.append(ProductAttribute(kind=kind, value=value))
+
+    @staticmethod
+    def filter_condition(kind: str, values: List[str]):
+        """生成“产品拥有任一指定属性值”的过滤条件，走 (kind, value) 索引"""
+        return Product.id.in_(
+            select(ProductAttribute.product_id).where(
+                ProductAttribute.kind == kind,
+                ProductAttribute.value.in_(values)
+            )
+        )
+
+    @staticmethod
+    def distinct_values(db: Session) -> Dict[str, List[str]]:
+        """按属性类型返回所有去重后的取值（已排序）"""
+        grouped: Dict[str, List[str]] = {kind: [] for kind in ATTRIBUTE_KINDS}
+        rows = db.query(ProductAttribute.kind, ProductAttribute.value).distinct().order_by(
+            ProductAttribute.kind, ProductAttribute.value
+        ).all()
+        for kind, value in rows:
+            grouped.setdefault(kind, []).append(value)
+        return grouped
+
+    @staticmethod
+    def backfill(connection) -> int:
+        """根据 products 表全量重建属性行，返回写入的行数"""
+        products = Product.__table__
+        columns = [products.c.id] + [products.c[field] for field in ATTRIBUTE_KINDS.values()]
+        rows = connection.execute(select(*columns)).all()
+
+        records = []
+        for row in rows:
+            for kind, value in ProductAttributeService.product_values(row):
+                records.append({"product_id": row.id, "kind": kind, "value": value})
+
+        connection.execute(delete(ProductAttribute.__table__))
+        if records:
+            connection.execute(insert(ProductAttribute.__table__), records)
+        return len(records)
@@ -0,0 +1,364 @@
+"""
+内存列式目录引擎（可选）
+公开列表需要的排序 / 区间字段保存为 NumPy 列数组，每个 (属性类型, 取值) 一个布尔位集，
+每种排序方式预先算好 (排序键, id) 顺序。get_products 的筛选、排序、分页和计数都在内存中完成，
+数据库只按主键读取当前页的产品用于序列化。
+
+管理端写入 / 批量导入提交后，根据变更日志只重新读取改动过的产品（CatalogCache 的 updater），
+日志不可用时整体重建。改动行按二分查找插入 / 移出已有的排序顺序，不再整体重新排序；
+已删除的行先留作墓碑，占比超过 TOMBSTONE_RATIO 时压缩重建。检索（FTS）等引擎不支持的请求继续走 SQL。
+
+CATALOG_ENGINE 环境变量：
+- sql（默认）：只使用 SQL
+- memory：优先使用内存引擎，不支持的请求回退到 SQL
+- compare：两条路径都执行，结果不一致时记录 warning，返回 SQL 的结果
+"""
+
+import bisect
+import os
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.api.pagination import encode_cursor, decode_cursor
+from app.core.catalog import CatalogCache
+from app.models.models import (
+    Product, ProductAttribute, NULL_DATETIME_FIRST, NULL_DATETIME_LAST, NULL_SORT_SENTINEL
+)
+from app.services.facet_service import PRODUCT_ROWID
+
+CATALOG_ENGINE_MODE = os.getenv("CATALOG_ENGINE", "sql").strip().lower()
+
+# 增量更新时按主键分批读取
+LOAD_BATCH_SIZE = 500
+
+# 已删除行（墓碑）占比超过该值时压缩数组并从头重建排序
+TOMBSTONE_RATIO = 0.25
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def catalog_engine_mode() -> str:
+    return CATALOG_ENGINE_MODE
+
+
+def _to_micros(value: Optional[datetime]) -> Optional[float]:
+    """datetime -> 微秒时间戳（float64 在该量级下可精确表示微秒）"""
+    if value is None:
+        return None
+    return float((value.replace(tzinfo=None) - _EPOCH) // timedelta(microseconds=1))
+
+
+def _from_micros(value: float) -> datetime:
+    return _EPOCH + timedelta(microseconds=int(value))
+
+
+def _grow(array: np.ndarray, size: int, fill: Any) -> np.ndarray:
+    """复制并扩展到 size 行，新行填充 fill"""
+    grown = np.full(size, fill, dtype=array.dtype)
+    grown[:len(array)] = array
+    return grown
+
+
+def _patched(array: np.ndarray, size: int, fill: Any, positions: np.ndarray, values: np.ndarray) -> np.ndarray:
+    """写入 positions 处的取值；行数不变且取值相同时直接复用原数组，否则在副本上修改"""
+    if len(array) == size and np.array_equal(array[positions], values, equal_nan=array.dtype.kind == "f"):
+        return array
+    patched = _grow(array, size, fill)
+    patched[positions] = values
+    return patched
+
+
+class CatalogEngine:
+    # 引擎保存的列（均为 float64，NULL 为 NaN）
+    COLUMNS = ("created_at", "popularity_score", "factory_price", "capacity_min", "capacity_max", "compartments")
+    # 整数列：生成游标时还原为 int，与 SQL 路径的排序键一致
+    INTEGER_COLUMNS = {"popularity_score", "compartments"}
+
+    # 排序方式 -> (列, 是否降序)；与 products._resolve_sort 保持一致，无检索词时 relevance 等同 newest
+    SORTS = {
+        "newest": ("created_at", True),
+        "relevance": ("created_at", True),
+        "popular": ("popularity_score", True),
+        "price_low": ("factory_price", False),
+        "price_high": ("factory_price", True),
+        "capacity_low": ("capacity_min", False),
+        "capacity_high": ("capacity_max", True),
+        "compartments_low": ("compartments", False),
+        "compartments_high": ("compartments", True),
+    }
+
+    def __init__(self, ids: List[str], position: Dict[str, int], alive: np.ndarray, rowids: np.ndarray,
+                 columns: Dict[str, np.ndarray], bitsets: Dict[str, Dict[str, np.ndarray]],
+                 ascending: Optional[Dict[Tuple[str, bool], np.ndarray]] = None):
+        self.ids = ids
+        self.position = position
+        self.alive = alive
+        self.rowids = rowids
+        self.columns = columns
+        # 位集可能短于 ids（新增行之后未改动的位集直接复用），超出部分视为 False
+        self.bitsets = bitsets
+        # 每种 (列, 方向) 下存活行按 (排序键, id) 升序排列的位置，降序取其逆序
+        if ascending is None:
+            alive_positions = np.flatnonzero(alive)
+            ascending = {
+                sort: self._merge_order(ids, columns, np.zeros(0, dtype=np.int64), alive_positions, *sort)
+                for sort in set(self.SORTS.values())
+            }
+        self.ascending = ascending
+        self.orders = self._build_orders()
+
+    # ---- 构建与增量更新 ----
+
+    @staticmethod
+    def empty() -> "CatalogEngine":
+        return CatalogEngine(
+            ids=[],
+            position={},
+            alive=np.zeros(0, dtype=bool),
+            rowids=np.zeros(0, dtype=np.int64),
+            columns={name: np.zeros(0, dtype=np.float64) for name in CatalogEngine.COLUMNS},
+            bitsets={},
+        )
+
+    @staticmethod
+    def _row_query(db: Session):
+        return db.query(Product.id, PRODUCT_ROWID, *(getattr(Product, name) for name in CatalogEngine.COLUMNS))
+
+    @staticmethod
+    def _attribute_query(db: Session):
+        return db.query(ProductAttribute.product_id, ProductAttribute.kind, ProductAttribute.value)
+
+    @staticmethod
+    def build(db: Session) -> "CatalogEngine":
+        rows = CatalogEngine._row_query(db).all()
+        attributes = CatalogEngine._attribute_query(db).all()
+        return CatalogEngine.empty().with_changes([row[0] for row in rows], rows, attributes)
+
+    @staticmethod
+    def update(db: Session, engine: "CatalogEngine", product_ids: Set[str]) -> "CatalogEngine":
+        """重新读取改动过的产品（新增、修改或已删除），返回新的引擎实例"""
+        if not product_ids:
+            return engine
+        changed = sorted(product_ids)
+        rows, attributes = [], []
+        for start in range(0, len(changed), LOAD_BATCH_SIZE):
+            batch = changed[start:start + LOAD_BATCH_SIZE]
+            rows.extend(CatalogEngine._row_query(db).filter(Product.id.in_(batch)).all())
+            attributes.extend(CatalogEngine._attribute_query(db).filter(ProductAttribute.product_id.in_(batch)).all())
+        return engine.with_changes(changed, rows, attributes)
+
+    def with_changes(self, changed_ids: Iterable[str], rows: List[Tuple], attributes: List[Tuple]) -> "CatalogEngine":
+        """
+        在副本上应用变更：changed_ids 中查不到行的产品视为已删除。
+        读请求可能仍在使用旧实例，因此不原地修改数组，取值未变的数组直接复用
+        """
+        ids, position = self.ids, self.position
+        added = [row[0] for row in rows if row[0] not in position]
+        if added:
+            ids = ids + added
+            position = dict(position)
+            position.update((product_id, index) for index, product_id in enumerate(added, start=len(self.ids)))
+        size = len(ids)
+
+        touched = np.array(sorted({position[product_id] for product_id in changed_ids if product_id in position}
+                                  | {position[row[0]] for row in rows}), dtype=np.int64)
+        positions = np.array([position[row[0]] for row in rows], dtype=np.int64)
+        present = np.zeros(size, dtype=bool)
+        present[positions] = True
+
+        alive = _patched(self.alive, size, False, touched, present[touched])
+        rowids = _patched(self.rowids, size, 0, positions, np.array([row[1] for row in rows], dtype=np.int64))
+        columns = {}
+        for offset, name in enumerate(self.COLUMNS, start=2):
+            values = [row[offset] for row in rows]
+            if name == "created_at":
+                values = [_to_micros(value) for value in values]
+            columns[name] = _patched(self.columns[name], size, np.nan, positions, np.array(values, dtype=np.float64))
+
+        # 只复制受影响的位集
+        bitsets = {kind: dict(values) for kind, values in self.bitsets.items()}
+        copied: Set[Tuple[str, str]] = set()
+
+        def writable(kind: str, value: str) -> np.ndarray:
+            bits = bitsets.setdefault(kind, {}).get(value)
+            if (kind, value) not in copied:
+                bits = np.zeros(size, dtype=bool) if bits is None else _grow(bits, size, False)
+                bitsets[kind][value] = bits
+                copied.add((kind, value))
+            return bits
+
+        for kind, values in self.bitsets.items():
+            for value, bits in values.items():
+                cleared = touched[touched < len(bits)]
+                if bits[cleared].any():
+                    writable(kind, value)[cleared] = False
+
+        grouped: Dict[Tuple[str, str], List[int]] = defaultdict(list)
+        for product_id, kind, value in attributes:
+            grouped[(kind, value)].append(position[product_id])
+        for (kind, value), items in grouped.items():
+            writable(kind, value)[items] = True
+
+        # 从排序中移出改动过的行，再按新的排序键插回仍然存在的行
+        removed = np.zeros(size, dtype=bool)
+        removed[touched] = True
+        ascending = {
+            sort: self._merge_order(ids, columns, order[~removed[order]], positions, *sort)
+            for sort, order in self.ascending.items()
+        }
+        engine = CatalogEngine(ids, position, alive, rowids, columns, bitsets, ascending)
+
+        if size - int(np.count_nonzero(alive)) > TOMBSTONE_RATIO * size:
+            return engine.compacted()
+        return engine
+
+    def compacted(self) -> "CatalogEngine":
+        """去掉已删除的行并从头重建排序，返回新的引擎实例"""
+        keep = np.flatnonzero(self.alive)
+        ids = [self.ids[index] for index in keep]
+        bitsets = {}
+        for kind, values in self.bitsets.items():
+            for value, bits in values.items():
+                bits = _grow(bits, len(self.ids), False)[keep]
+                if bits.any():
+                    bitsets.setdefault(kind, {})[value] = bits
+        return CatalogEngine(
+            ids=ids,
+            position={product_id: index for index, product_id in enumerate(ids)},
+            alive=np.ones(len(ids), dtype=bool),
+            rowids=self.rowids[keep],
+            columns={name: array[keep] for name, array in self.columns.items()},
+            bitsets=bitsets,
+        )
+
+    @staticmethod
+    def _sort_keys(columns: Dict[str, np.ndarray], name: str, descending: bool, positions: np.ndarray) -> np.ndarray:
+        column = columns[name][positions]
+        # NULL 总排在最后，与 SQL 路径的 coalesce 哨兵一致
+        return np.where(np.isnan(column), -NULL_SORT_SENTINEL if descending else NULL_SORT_SENTINEL, column)
+
+    @staticmethod
+    def _merge_order(ids: List[str], columns: Dict[str, np.ndarray], order: np.ndarray, positions: np.ndarray,
+                     name: str, descending: bool) -> np.ndarray:
+        """把 positions 插入按 (排序键, id) 升序排列的 order：先按排序键二分，键相同的再按 id 二分"""
+        if not len(positions):
+            return order
+        keys = CatalogEngine._sort_keys(columns, name, descending, positions)
+        id_order = np.argsort(np.array([ids[index] for index in positions], dtype=object), kind="stable")
+        id_rank = np.empty(len(positions), dtype=np.int64)
+        id_rank[id_order] = np.arange(len(positions))
+        arrange = np.lexsort((id_rank, keys))
+        positions, keys = positions[arrange], keys[arrange]
+        if not len(order):
+            return positions
+
+        order_keys = CatalogEngine._sort_keys(columns, name, descending, order)
+        slots = np.searchsorted(order_keys, keys, side="left")
+        ties_end = np.searchsorted(order_keys, keys, side="right")
+        for offset in np.flatnonzero(ties_end > slots):
+            slots[offset] = bisect.bisect_left(order, ids[positions[offset]], int(slots[offset]),
+                                               int(ties_end[offset]), key=lambda index: ids[index])
+        return np.insert(order, slots, positions)
+
+    def _build_orders(self) -> Dict[Tuple[str, bool], Tuple[np.ndarray, np.ndarray]]:
+        """每种 (列, 方向) 的 (排序后的存活位置, 位置 -> 名次)"""
+        orders = {}
+        for (name, descending), ascending in self.ascending.items():
+            order = ascending[::-1] if descending else ascending
+            rank = np.zeros(len(self.ids), dtype=np.int64)
+            rank[order] = np.arange(len(order))
+            orders[(name, descending)] = (order, rank)
+        return orders
+
+    # ---- 查询 ----
+
+    def sort_key(self, sort_name: str, index: int) -> Any:
+        """某一行的排序键，取值与 SQL 路径 add_columns(sort_key) 返回的一致"""
+        name, descending = self.SORTS[sort_name]
+        value = self.columns[name][index]
+        if np.isnan(value):
+            if name == "created_at":
+                return NULL_DATETIME_FIRST if descending else NULL_DATETIME_LAST
+            return -NULL_SORT_SENTINEL if descending else NULL_SORT_SENTINEL
+        if name == "created_at":
+            return _from_micros(value)
+        if name in self.INTEGER_COLUMNS:
+            return int(value)
+        return float(value)
+
+    def match_mask(self, selections: Dict[str, List[str]], ranges: Dict[str, Optional[float]]) -> Tuple[np.ndarray, np.ndarray]:
+        """返回 (数值区间命中的掩码, 再叠加属性筛选后的掩码)"""
+        columns = self.columns
+        base = self.alive.copy()
+        # NaN 比较结果为 False，与 SQL 中 NULL 不满足区间条件一致；容量按区间重叠匹配
+        if ranges.get("capacity_min") is not None:
+            base &= columns["capacity_max"] >= ranges["capacity_min"]
+        if ranges.get("capacity_max") is not None:
+            base &= columns["capacity_min"] <= ranges["capacity_max"]
+        if ranges.get("compartments_min") is not None:
+            base &= columns["compartments"] >= ranges["compartments_min"]
+        if ranges.get("compartments_max") is not None:
+            base &= columns["compartments"] <= ranges["compartments_max"]
+        if ranges.get("price_min") is not None:
+            base &= columns["factory_price"] >= ranges["price_min"]
+        if ranges.get("price_max") is not None:
+            base &= columns["factory_price"] <= ranges["price_max"]
+
+        mask = base.copy()
+        for kind, values in selections.items():
+            selected = np.zeros(len(self.ids), dtype=bool)
+            for value in values:
+                bits = self.bitsets.get(kind, {}).get(value)
+                if bits is not None:
+                    selected[:len(bits)] |= bits
+            mask &= selected
+        return base, mask
+
+    def query(self, sort_name: str, selections: Dict[str, List[str]], ranges: Dict[str, Optional[float]],
+              page: int, limit: int, cursor: Optional[str], include_total: bool) -> Optional[Dict[str, Any]]:
+        """
+        返回 {"ids", "total", "next_cursor", "base_mask"}；
+        游标指向的产品已删除或排序键已变化时返回 None，由调用方回退到 SQL
+        """
+        if sort_name not in self.SORTS:
+            return None
+        order, rank = self.orders[self.SORTS[sort_name]]
+        base, mask = self.match_mask(selections, ranges)
+
+        # 命中行在该排序下的名次（升序）
+        matched = np.flatnonzero(mask[order])
+
+        if cursor:
+            cursor_key, cursor_id = decode_cursor(cursor, sort_name)
+            index = self.position.get(cursor_id)
+            if index is None or not self.alive[index] or self.sort_key(sort_name, index) != cursor_key:
+                return None
+            start = int(np.searchsorted(matched, rank[index], side="right"))
+        elif cursor is None:
+            start = (page - 1) * limit
+        else:
+            start = 0
+
+        window = order[matched[start:start + limit + 1]]
+        has_more = len(window) > limit
+        window = window[:limit]
+        ids = [self.ids[index] for index in window]
+        next_cursor = encode_cursor(sort_name, self.sort_key(sort_name, window[-1]), ids[-1]) if has_more else None
+
+        return {
+            "ids": ids,
+            "total": int(len(matched)) if include_total else None,
+            "next_cursor": next_cursor,
+            "base_mask": base,
+        }
+
+    def base_rowids(self, base_mask: np.ndarray) -> List[int]:
+        """数值区间命中行的 products.rowid，用于分面计数"""
+        return self.rowids[base_mask].tolist()
+
+
+catalog_engine_cache = CatalogCache("catalog engine", CatalogEngine.build, CatalogEngine.update)
@@ -0,0 +1,142 @@
+"""
+产品目录导出（ERP 同步）
+按主键 keyset 分块读取 products（每块一条语句，只取列值，不构造 ORM 对象），
+每块编码为 NDJSON 或 CSV 后立即输出，内存占用与产品总数无关。
+每块使用独立的短连接：SQLite 下长时间保持游标会一直持有共享锁、阻塞写入，
+分块读取则只在执行单条语句期间持锁，下载速度慢的客户端不会影响后台写入
+"""
+
+import csv
+import io
+from pathlib import PurePosixPath
+from typing import Any, Dict, Iterator, List, Optional
+
+from pydantic_core import to_json
+from sqlalchemy import select
+
+from app.db.session import engine
+from app.models.models import Product, ProductImage
+from app.schemas.schemas import ExportFormat
+
+EXPORT_CHUNK_SIZE = 500
+
+# 导出的产品列（与数据库列名一致）
+EXPORT_COLUMNS = [
+    "id", "code", "name", "description", "product_type", "tube_type", "box_type", "process_type",
+    "functional_designs", "shape", "material",
+    "weight", "length", "width", "height", "capacity_min", "capacity_max", "compartments",
+    "cost_price", "factory_price", "has_sample", "box_dimensions", "box_quantity",
+    "in_stock", "popularity_score", "popularity_base", "is_featured", "created_at", "updated_at",
+]
+
+PRODUCT_COLUMNS = [Product.__table__.c[name] for name in EXPORT_COLUMNS]
+IMAGE_COLUMNS = [ProductImage.product_id, ProductImage.url, ProductImage.alt, ProductImage.type,
+                 ProductImage.sort_order, ProductImage.variants]
+
+EXPORT_MEDIA_TYPES = {
+    ExportFormat.NDJSON: "application/x-ndjson",
+    ExportFormat.CSV: "text/csv",  # Starlette appends charset=utf-8 to text/* types
+}
+
+
+class CatalogExportService:
+
+    @staticmethod
+    def image_url(base_url: str, url: str) -> str:
+        if url.startswith(("http://", "https://")):
+            return url
+        return base_url.rstrip("/") + "/" + url.lstrip("/")
+
+    @staticmethod
+    def variant_urls(base_url: str, url: str, variants: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        """在变体清单中补充每个文件的 URL：原图与原始文件同目录，其余尺寸位于 {size}/ 子目录"""
+        path = PurePosixPath(url)
+        result = {}
+        for size_name, formats in variants.items():
+            directory = path.parent if size_name == "original" else path.parent / size_name
+            result[size_name] = {
+                ext: {**info, "url": CatalogExportService.image_url(base_url, str(directory / f"{path.stem}.{ext}"))}
+                for ext, info in formats.items()
+            }
+        return result
+
+    @staticmethod
+    def iter_chunks(base_url: str, include_images: bool, include_variants: bool,
+                    chunk_size: int = EXPORT_CHUNK_SIZE) -> Iterator[List[Dict[str, Any]]]:
+        """按 id 顺序分块产出产品字典"""
+        last_id: Optional[str] = None
+        while True:
+            query = select(*PRODUCT_COLUMNS).order_by(Product.id).limit(chunk_size)
+            if last_id is not None:
+                query = query.where(Product.id > last_id)
+            with engine.connect() as connection:
+                rows = [dict(row) for row in connection.execute(query).mappings()]
+                if not rows:
+                    return
+                for row in rows:
+                    for name in ("created_at", "updated_at"):
+                        row[name] = row[name].isoformat() if row[name] else None
+                if include_images:
+                    images: Dict[str, List[Dict[str, Any]]] = {row["id"]: [] for row in rows}
+                    image_rows = connection.execute(
+                        select(*IMAGE_COLUMNS).where(ProductImage.product_id.in_(list(images)))
+                        .order_by(ProductImage.product_id, ProductImage.sort_order)
+                    )
+                    for product_id, url, alt, image_type, sort_order, variants in image_rows:
+                        if variants is not None and not variants.get("small"):
+                            # 与前台一致：跳过尚未生成变体（后台任务处理中）的图片
+                            continue
+                        image = {"url": CatalogExportService.image_url(base_url, url), "alt": alt,
+                                 "type": image_type, "sort_order": sort_order}
+                        if include_variants:
+                            image["variants"] = CatalogExportService.variant_urls(base_url, url, variants or {})
+                        images[product_id].append(image)
+                    for row in rows:
+                        row["images"] = images[row["id"]]
+
+            yield rows
+            if len(rows) < chunk_size:
+                return
+            last_id = rows[-1]["id"]
+
+    @staticmethod
+    def iter_ndjson(chunks: Iterator[List[Dict[str, Any]]]) -> Iterator[bytes]:
+        for rows in chunks:
+            yield b"".join(to_json(row) + b"\n" for row in rows)
+
+    @staticmethod
+    def iter_csv(chunks: Iterator[List[Dict[str, Any]]], include_images: bool,
+                 include_variants: bool) -> Iterator[bytes]:
+        """图片 URL 以 | 分隔放在 image_urls 列，变体清单以 JSON 数组放在 image_variants 列"""
+        header = list(EXPORT_COLUMNS)
+        if include_images:
+            header.append("image_urls")
+        if include_variants:
+            header.append("image_variants")
+
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(header)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+        for rows in chunks:
+            for row in rows:
+                values = [row[name] for name in EXPORT_COLUMNS]
+                if include_images:
+                    values.append("|".join(image["url"] for image in row["images"]))
+                if include_variants:
+                    values.append(to_json([image["variants"] for image in row["images"]]).decode())
+                writer.writerow(values)
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+
+    @staticmethod
+    def stream(export_format: ExportFormat, base_url: str, include_images: bool = False,
+               include_variants: bool = False, chunk_size: int = EXPORT_CHUNK_SIZE) -> Iterator[bytes]:
+        include_images = include_images or include_variants
+        chunks = CatalogExportService.iter_chunks(base_url, include_images, include_variants, chunk_size)
+        if export_format == ExportFormat.CSV:
+            return CatalogExportService.iter_csv(chunks, include_images, include_variants)
+        return CatalogExportService.iter_ndjson(chunks)
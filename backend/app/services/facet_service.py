@@ -0,0 +1,92 @@
+"""
+分面计数索引
+为每个 (属性类型, 取值) 预先构建以 products.rowid 为位置的位图（Python int），
+列表接口返回分面计数时只需做位与 + popcount，开销与产品数量基本无关
+"""
+
+from collections import defaultdict
+from typing import Dict, Iterable, List
+
+from sqlalchemy import literal_column
+from sqlalchemy.orm import Session
+
+from app.core.catalog import CatalogCache
+from app.models.models import Product, ProductAttribute
+
+# 属性类型 -> 响应中的分面名称（与 filter-options 保持一致）
+FACET_NAMES = {
+    "tube_type": "tubeTypes",
+    "box_type": "boxTypes",
+    "functional_design": "functionalDesigns",
+    "shape": "shapes",
+    "material": "materials",
+    "process_type": "processTypes",
+}
+
+PRODUCT_ROWID = literal_column("products.rowid")
+
+
+def bitmap_from_positions(positions: Iterable[int]) -> int:
+    """将位置列表转换为位图"""
+    positions = list(positions)
+    if not positions:
+        return 0
+    buffer = bytearray(max(positions) // 8 + 1)
+    for position in positions:
+        buffer[position >> 3] |= 1 << (position & 7)
+    return int.from_bytes(buffer, "little")
+
+
+class FacetIndex:
+
+    def __init__(self, universe: int, bitmaps: Dict[str, Dict[str, int]]):
+        self.universe = universe
+        self.bitmaps = bitmaps
+
+    @staticmethod
+    def build(db: Session) -> "FacetIndex":
+        universe = bitmap_from_positions(rowid for (rowid,) in db.query(PRODUCT_ROWID).select_from(Product))
+
+        positions: Dict[str, Dict[str, List[int]]] = {kind: defaultdict(list) for kind in FACET_NAMES}
+        rows = db.query(PRODUCT_ROWID, ProductAttribute.kind, ProductAttribute.value).select_from(
+            ProductAttribute
+        ).join(Product, Product.id == ProductAttribute.product_id)
+        for rowid, kind, value in rows:
+            if kind in positions:
+                positions[kind][value].append(rowid)
+
+        bitmaps = {
+            kind: {value: bitmap_from_positions(items) for value, items in sorted(values.items())}
+            for kind, values in positions.items()
+        }
+        return FacetIndex(universe, bitmaps)
+
+    def selection_bitmap(self, kind: str, values: List[str]) -> int:
+        """任一取值命中即可（与列表筛选的 OR 语义一致）"""
+        bitmap = 0
+        for value in values:
+            bitmap |= self.bitmaps.get(kind, {}).get(value, 0)
+        return bitmap
+
+    def counts(self, base: int, selections: Dict[str, List[str]]) -> Dict[str, Dict[str, int]]:
+        """
+        计算各分面每个取值的产品数。
+        base 为检索、数值区间等非属性条件命中的位图；某个分面的计数不应用该分面自身的选择，
+        即显示“再选中这个值会有多少结果”（多选分面的常见语义）
+        """
+        selected = {kind: self.selection_bitmap(kind, values) for kind, values in selections.items() if values}
+
+        facets = {}
+        for kind, name in FACET_NAMES.items():
+            scope = base
+            for other_kind, bitmap in selected.items():
+                if other_kind != kind:
+                    scope &= bitmap
+            facets[name] = {
+                value: (bitmap & scope).bit_count()
+                for value, bitmap in self.bitmaps[kind].items()
+            }
+        return facets
+
+
+facet_index_cache = CatalogCache("facet index", FacetIndex.build)
@@ -0,0 +1,67 @@
+"""
+筛选项快照
+分类取值和容量、分隔数、价格区间在目录变更后重建一次并常驻内存，
+/api/products/filter-options 直接返回快照，耗时与产品数量无关
+"""
+
+import logging
+from typing import Any, Dict
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.core.catalog import CatalogCache
+from app.models.models import Product
+from app.services.attribute_service import ProductAttributeService
+
+logger = logging.getLogger(__name__)
+
+
+def build_filter_options(db: Session) -> Dict[str, Any]:
+    """一次性计算全部筛选项"""
+    # 分类取值来自规范化后的属性表（写入时已按 / , 等分隔符拆分）
+    attribute_values = ProductAttributeService.distinct_values(db)
+
+    # 容量、分隔数区间由数据库在冗余数值列上聚合
+    capacity_min = 0
+    capacity_max = 100
+    compartment_min = 1
+    compartment_max = 10
+    try:
+        low, high = db.query(func.min(Product.capacity_min), func.max(Product.capacity_max)).one()
+        if low is not None:
+            capacity_min = low
+            capacity_max = high
+        low, high = db.query(func.min(Product.compartments), func.max(Product.compartments)).filter(
+            Product.compartments != 0
+        ).one()
+        if low is not None:
+            compartment_min = low
+            compartment_max = high
+    except Exception as e:
+        logger.warning(f"Error calculating capacity/compartment range: {e}")
+
+    # 价格区间由数据库聚合
+    price_min = 0
+    price_max = 0
+    try:
+        low, high = db.query(func.min(Product.factory_price), func.max(Product.factory_price)).one()
+        if low is not None:
+            price_min = low
+            price_max = high
+    except Exception as e:
+        logger.warning(f"Error calculating price range: {e}")
+
+    return {
+        "tubeTypes": attribute_values["tube_type"],
+        "boxTypes": attribute_values["box_type"],
+        "functionalDesigns": attribute_values["functional_design"],
+        "shapes": attribute_values["shape"],
+        "materials": attribute_values["material"],
+        "capacityRange": {"min": capacity_min, "max": capacity_max},
+        "compartmentRange": {"min": compartment_min, "max": compartment_max},
+        "priceRange": {"min": price_min, "max": price_max}
+    }
+
+
+filter_options_cache = CatalogCache("filter options", build_filter_options)
@@ -0,0 +1,339 @@
+"""
+图片变体后台任务
+上传接口只暂存原始文件并写入 image_jobs / image_job_items（同一个 SQLite 数据库，服务重启后继续处理），
+立即返回任务 id；后台任务在图片进程池中生成原图及各尺寸 JPEG/WebP，逐张写回变体清单。
+图片按内容哈希命名，已有相同内容的图片时直接复用其文件和清单，不再解码；同一任务中的相同内容只生成一次。
+变体生成前图片的清单为空（没有 small），序列化时会被跳过，前台不会出现无法加载的图片；
+处理失败的图片记录会被删除，失败原因保留在任务中。
+处理中的任务由领取它的进程定期刷新心跳（租约），其他进程只接手心跳超过 IMAGE_JOB_LEASE_SECONDS 的任务，
+不会抢走仍在运行的任务；处理出错的任务放回队列，超过 IMAGE_JOB_MAX_ATTEMPTS 次后标记失败
+"""
+
+import asyncio
+import logging
+import os
+import shutil
+from datetime import timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, or_, update
+from sqlalchemy.orm import Session
+
+from app.core.catalog import bump_catalog_version
+from app.core.file_utils import (
+    IMAGES_DIR, STAGING_DIR, delete_file, existing_image_variants, save_product_image_variants
+)
+from app.core.image_pool import image_pool
+from app.db.session import SessionLocal
+from app.models.models import ImageJob, ImageJobItem, Product, ProductImage, utc_now
+
+logger = logging.getLogger(__name__)
+
+JOB_PENDING = "pending"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+# 没有新任务通知时，每隔多少秒检查一次（多进程部署时其他进程创建的任务靠轮询发现）
+POLL_INTERVAL_SECONDS = float(os.getenv("IMAGE_JOB_POLL_SECONDS", "5"))
+# 处理中任务的心跳超过多少秒未刷新即视为领取它的进程已退出，可被重新领取；心跳每 1/4 租约刷新一次
+LEASE_SECONDS = float(os.getenv("IMAGE_JOB_LEASE_SECONDS", "120"))
+# 任务最多被领取几次，之后仍出错则把未处理的图片标记为失败
+MAX_ATTEMPTS = int(os.getenv("IMAGE_JOB_MAX_ATTEMPTS", "3"))
+
+
+class ImageJobService:
+
+    @staticmethod
+    def create_job(db: Session, product: Product, staged_images: List[Dict[str, Any]], job_id: str,
+                   first_sort_order: int) -> Tuple[ImageJob, List[ProductImage]]:
+        """为暂存的上传文件创建图片记录（清单为空，暂不展示）和任务"""
+        job = ImageJob(id=job_id, product_id=product.id, status=JOB_PENDING, total=len(staged_images))
+        db.add(job)
+        images = []
+        for i, staged in enumerate(staged_images):
+            image = ProductImage(
+                product_id=product.id,
+                url=staged["url"],
+                alt=staged["alt"],
+                type=staged["type"],
+                sort_order=first_sort_order + i,
+                variants={}
+            )
+            db.add(image)
+            db.flush()
+            job.items.append(ImageJobItem(image_id=image.id, source=staged["source"], status=JOB_PENDING))
+            images.append(image)
+        db.commit()
+        return job, images
+
+    @staticmethod
+    def get_status(db: Session, job_id: str) -> Optional[Dict[str, Any]]:
+        job = db.query(ImageJob).filter(ImageJob.id == job_id).first()
+        if job is None:
+            return None
+        return {
+            "id": job.id,
+            "productId": job.product_id,
+            "status": job.status,
+            "total": job.total,
+            "processed": job.processed,
+            "failed": job.failed,
+            "images": [
+                {"imageId": item.image_id, "status": item.status, "error": item.error}
+                for item in job.items
+            ],
+            "createdAt": job.created_at.isoformat() if job.created_at else None,
+            "updatedAt": job.updated_at.isoformat() if job.updated_at else None,
+        }
+
+    @staticmethod
+    def _lease_expired():
+        """处理中但心跳已过期（领取它的进程已退出或卡住）的任务"""
+        expired = utc_now() - timedelta(seconds=LEASE_SECONDS)
+        return and_(
+            ImageJob.status == JOB_RUNNING,
+            or_(ImageJob.heartbeat_at.is_(None), ImageJob.heartbeat_at < expired)
+        )
+
+    @staticmethod
+    def recover(db: Session) -> int:
+        """把租约已过期的任务放回队列（已完成的图片不会重复处理）；其他进程仍在处理的任务保持不变"""
+        count = db.query(ImageJob).filter(ImageJobService._lease_expired()).update(
+            {ImageJob.status: JOB_PENDING}, synchronize_session=False
+        )
+        db.commit()
+        return count
+
+    @staticmethod
+    def claim_next(db: Session) -> Optional[str]:
+        """
+        领取最早的待处理任务，没有时接手一个租约已过期的任务；
+        条件更新保证多个进程不会同时领取同一个任务
+        """
+        while True:
+            job_id = db.query(ImageJob.id).filter(ImageJob.status == JOB_PENDING).order_by(
+                ImageJob.created_at
+            ).limit(1).scalar()
+            claimable = ImageJob.status == JOB_PENDING
+            if job_id is None:
+                claimable = ImageJobService._lease_expired()
+                job_id = db.query(ImageJob.id).filter(claimable).order_by(ImageJob.created_at).limit(1).scalar()
+                if job_id is None:
+                    return None
+            now = utc_now()
+            claimed = db.execute(
+                update(ImageJob).where(ImageJob.id == job_id, claimable)
+                .values(status=JOB_RUNNING, attempts=ImageJob.attempts + 1, claimed_at=now, heartbeat_at=now)
+            ).rowcount
+            db.commit()
+            if claimed:
+                return job_id
+
+    @staticmethod
+    def heartbeat(db: Session, job_id: str) -> None:
+        """刷新处理中任务的租约"""
+        db.execute(
+            update(ImageJob).where(ImageJob.id == job_id, ImageJob.status == JOB_RUNNING)
+            .values(heartbeat_at=utc_now())
+        )
+        db.commit()
+
+    @staticmethod
+    def release(db: Session, job_id: str, error: Optional[str]) -> str:
+        """
+        处理中断或出错时交还任务：放回队列等待重试；
+        出错且已领取 MAX_ATTEMPTS 次时把未处理的图片标记为失败并结束任务。error 为 None 表示服务停止，不计入重试次数
+        """
+        job = db.query(ImageJob).filter(ImageJob.id == job_id).first()
+        if job is None or job.status != JOB_RUNNING:
+            return job.status if job is not None else JOB_FAILED
+        if error is not None and job.attempts >= MAX_ATTEMPTS:
+            pending = db.query(ImageJobItem.image_id).filter(
+                ImageJobItem.job_id == job_id, ImageJobItem.status == JOB_PENDING
+            ).all()
+            for (image_id,) in pending:
+                ImageJobService.finish_item(db, job_id, image_id, None, error)
+            return ImageJobService.finish_job(db, job_id)
+        job.status = JOB_PENDING
+        if error is None:
+            job.attempts = max(job.attempts - 1, 0)
+        db.commit()
+        return JOB_PENDING
+
+    @staticmethod
+    def pending_items(db: Session, job_id: str) -> List[Tuple[str, str, str, str, Optional[Dict[str, Any]]]]:
+        """
+        返回任务中未处理的 (图片 id, 暂存文件绝对路径, 货号, 图片 url, 可复用的变体清单)；
+        图片或产品已删除的直接标记失败
+        """
+        rows = db.query(ImageJobItem, ProductImage.url, Product.code).outerjoin(
+            ProductImage, ProductImage.id == ImageJobItem.image_id
+        ).outerjoin(
+            Product, Product.id == ProductImage.product_id
+        ).filter(ImageJobItem.job_id == job_id, ImageJobItem.status == JOB_PENDING).all()
+
+        items = []
+        for item, url, product_code in rows:
+            if url is None or product_code is None:
+                ImageJobService.finish_item(db, job_id, item.image_id, None, "Image was deleted before processing")
+                continue
+            items.append((
+                item.image_id, os.path.join(IMAGES_DIR, item.source), product_code, url,
+                existing_image_variants(db, url)
+            ))
+        return items
+
+    @staticmethod
+    def finish_item(db: Session, job_id: str, image_id: str, variants: Optional[Dict[str, Any]],
+                    error: Optional[str], url: Optional[str] = None) -> None:
+        """写回一张图片的变体清单并更新任务进度；成功的图片立即对前台可见"""
+        item = db.query(ImageJobItem).filter(
+            ImageJobItem.job_id == job_id, ImageJobItem.image_id == image_id
+        ).first()
+        if item is None or item.status != JOB_PENDING:
+            return
+        image = db.query(ProductImage).filter(ProductImage.id == image_id).first()
+        if error is None and image is None:
+            error = "Image was deleted during processing"
+            if variants and url:
+                # 处理期间图片被删除，清理刚生成的文件（仍被其他图片引用时保留）
+                delete_file(url, db)
+        if error is None and image is not None:
+            image.variants = variants
+        elif image is not None:
+            # 无法处理的图片不保留隐藏记录，失败原因见任务状态
+            db.delete(image)
+            db.flush()
+            delete_file(image.url, db)
+        item.status = JOB_FAILED if error else JOB_DONE
+        item.error = error
+
+        # 同一任务的多张图片并行完成，计数在 SQL 中自增，避免并发会话互相覆盖
+        db.execute(update(ImageJob).where(ImageJob.id == job_id).values(
+            processed=ImageJob.processed + 1, failed=ImageJob.failed + (1 if error else 0)
+        ))
+        db.commit()
+
+        source = os.path.join(IMAGES_DIR, item.source)
+        if os.path.exists(source):
+            os.remove(source)
+        if image is not None and error is None:
+            bump_catalog_version(product_ids=[image.product_id])
+
+    @staticmethod
+    def finish_job(db: Session, job_id: str) -> str:
+        job = db.query(ImageJob).filter(ImageJob.id == job_id).first()
+        if job is None:
+            return JOB_FAILED
+        job.status = JOB_FAILED if job.total and job.failed == job.total else JOB_DONE
+        db.commit()
+        shutil.rmtree(os.path.join(STAGING_DIR, job_id), ignore_errors=True)
+        return job.status
+
+
+def _with_session(func, *args):
+    db = SessionLocal()
+    try:
+        return func(db, *args)
+    finally:
+        db.close()
+
+
+async def run_image_job(job_id: str) -> str:
+    """处理一个已领取的任务：同时提交的图片数不超过工作进程数，给轮播图等上传接口留出进程池排队位置"""
+    items = await asyncio.to_thread(_with_session, ImageJobService.pending_items, job_id)
+    slots = asyncio.Semaphore(max(image_pool.workers, 1))
+    # 同一 url（相同内容）的图片共享一次生成
+    derived: Dict[str, asyncio.Future] = {}
+
+    async def save_variants(source: str, product_code: str, url: str) -> Dict[str, Dict[str, Any]]:
+        async with slots:
+            stem = os.path.splitext(os.path.basename(url))[0]
+            return await image_pool.run(save_product_image_variants, source, product_code, stem)
+
+    async def derive(image_id: str, source: str, product_code: str, url: str,
+                     existing: Optional[Dict[str, Any]]) -> None:
+        try:
+            if existing is not None:
+                variants = existing
+            else:
+                if url not in derived:
+                    derived[url] = asyncio.ensure_future(save_variants(source, product_code, url))
+                variants = await asyncio.shield(derived[url])
+            error = None if variants.get("small") else "Failed to decode or resize image"
+        except Exception as e:
+            variants, error = None, str(e) or e.__class__.__name__
+        await asyncio.to_thread(_with_session, ImageJobService.finish_item, job_id, image_id, variants, error, url)
+
+    await asyncio.gather(*(derive(*item) for item in items))
+    return await asyncio.to_thread(_with_session, ImageJobService.finish_job, job_id)
+
+
+class ImageJobWorker:
+    """
+    后台任务：依次处理待处理任务；上传接口调用 notify 立即唤醒，否则每 POLL_INTERVAL_SECONDS 检查一次。
+    处理期间定期刷新心跳，出错时交还任务，服务停止时放回队列
+    """
+
+    def __init__(self):
+        self._wakeup: Optional[asyncio.Event] = None
+
+    def notify(self) -> None:
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def run(self) -> None:
+        self._wakeup = asyncio.Event()
+        recovered = await asyncio.to_thread(_with_session, ImageJobService.recover)
+        if recovered:
+            logger.info(f"Resuming {recovered} interrupted image jobs")
+        while True:
+            try:
+                job_id = await asyncio.to_thread(_with_session, ImageJobService.claim_next)
+                if job_id is None:
+                    try:
+                        await asyncio.wait_for(self._wakeup.wait(), POLL_INTERVAL_SECONDS)
+                    except asyncio.TimeoutError:
+                        pass
+                    self._wakeup.clear()
+                    continue
+                status = await self._run_claimed(job_id)
+                logger.info(f"Image job {job_id} finished: {status}")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # 交还任务也失败（如数据库被锁）时任务保持处理中，心跳停止后租约过期即可被重新领取
+                logger.error(f"Image job failed: {e}")
+                await asyncio.sleep(POLL_INTERVAL_SECONDS)
+
+    async def _run_claimed(self, job_id: str) -> str:
+        heartbeat = asyncio.create_task(self._heartbeat(job_id))
+        try:
+            return await run_image_job(job_id)
+        except asyncio.CancelledError:
+            # 服务停止：立即放回队列，下次启动或其他进程无需等待租约过期
+            try:
+                _with_session(ImageJobService.release, job_id, None)
+            except Exception as e:
+                logger.warning(f"Image job {job_id} could not be released on shutdown: {e}")
+            raise
+        except Exception as e:
+            logger.error(f"Image job {job_id} failed, releasing it: {e}")
+            return await asyncio.to_thread(
+                _with_session, ImageJobService.release, job_id, str(e) or e.__class__.__name__
+            )
+        finally:
+            heartbeat.cancel()
+
+    @staticmethod
+    async def _heartbeat(job_id: str) -> None:
+        while True:
+            await asyncio.sleep(LEASE_SECONDS / 4)
+            try:
+                await asyncio.to_thread(_with_session, ImageJobService.heartbeat, job_id)
+            except Exception as e:
+                logger.warning(f"Image job {job_id} heartbeat failed: {e}")
+
+
+image_job_worker = ImageJobWorker()
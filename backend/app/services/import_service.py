@@ -7,10 +7,13 @@ import uuid
 import logging
 from typing import List, Dict, Any, Optional
 from sqlalchemy.orm import Session
-from pathlib import Path
 
 from app.models.models import Product, ProductImage
-from app.core.file_utils import optimize_single_image, IMAGES_DIR
+from app.core.file_utils import (
+    existing_image_variants, file_content_hash, product_image_url, save_product_image_variants
+)
+from app.core.product_code import normalize_code
+from app.services.attribute_service import ProductAttributeService
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -22,6 +25,7 @@ class ImportResult:
         self.failed_count = 0
         self.errors: List[str] = []
         self.warnings: List[str] = []
+        self.product_ids: List[str] = []
 
 class BatchImportService:
     # Standard columns expected in the Excel file
@@ -218,7 +222,13 @@ class BatchImportService:
                         continue
 
                     with db.begin_nested():
-                        existing_product = db.query(Product).filter(Product.code == product_code).first()
+                        # 优先按原货号精确匹配（规范化冲突的历史货号没有 code_normalized），
+                        # 否则按规范化货号匹配已有产品（O1 与 O01 视为同一产品，沿用已有货号）
+                        existing_product = db.query(Product).filter(
+                            Product.code == product_code
+                        ).first() or db.query(Product).filter(
+                            Product.code_normalized == normalize_code(product_code)
+                        ).first()
 
                         product_data = {
                             'name': BatchImportService._clean_string(row.get('产品名称')) or f"Product {product_code}",
@@ -234,8 +244,8 @@ class BatchImportService:
                             'box_dimensions': BatchImportService._clean_string(row.get('纸箱尺寸')),
                             'box_quantity': BatchImportService._safe_int(row.get('装箱数量')),
                             'cost_price': 0.0,
-                            'in_stock': True,
-                            'popularity_score': 50
+                            'in_stock': True
+                            # 热度不在导入时设置：新产品为 0，已有产品保留后台设置的基础热度和由浏览 / 加购统计得出的热度
                         }
 
                         dimensions = {}
@@ -272,6 +282,8 @@ class BatchImportService:
                             db.add(product)
                             db.flush()
 
+                        ProductAttributeService.sync_product(product)
+
                         if temp_dir:
                             images_found = BatchImportService._process_product_images(
                                 product.code, temp_dir, product.id, db
@@ -283,6 +295,7 @@ class BatchImportService:
                                 unmatched_codes.append(product_code)
 
                     result.success_count += 1
+                    result.product_ids.append(product.id)
 
                 except Exception as e:
                     result.failed_count += 1
@@ -318,35 +331,15 @@ class BatchImportService:
             "imported": result.success_count,
             "failed": result.failed_count,
             "errors": result.errors,
-            "warnings": result.warnings
+            "warnings": result.warnings,
+            "product_ids": result.product_ids
         }
 
     @staticmethod
     def _normalize_code(code: str) -> str:
-        """
-        规范化货号，移除数字部分的前导零，统一格式。
-        支持多种格式：
-        - O01 -> o1, O001 -> o1, O1 -> o1
-        - F-01 -> f-1, F_01 -> f_1
-        - 01 -> 1 (纯数字)
-        - abc -> abc (纯字母保持不变)
-        """
-        import re
-        code = code.strip().lower()
-        
-        # 模式1: 字母前缀 + 可选分隔符 + 数字 (如 O01, F-01, ABC_001)
-        match = re.match(r'^([A-Za-z]+)([-_]?)0*(\d+)$', code)
-        if match:
-            prefix, sep, num = match.groups()
-            return f"{prefix}{sep}{num}"
-        
-        # 模式2: 纯数字带前导零 (如 001 -> 1)
-        match = re.match(r'^0*(\d+)$', code)
-        if match:
-            return match.group(1)
-        
-        return code
-    
+        """规范化货号（O01 -> o1），规则见 app.core.product_code"""
+        return normalize_code(code)
+
     @staticmethod
     def _get_all_folder_names(source_root: str) -> List[str]:
         """获取 ZIP 解压后的所有文件夹名称"""
@@ -397,55 +390,41 @@ class BatchImportService:
             ProductImage.product_id == product_id
         ).scalar() or -1
 
+        attached_urls = {
+            url for (url,) in db.query(ProductImage.url).filter(ProductImage.product_id == product_id)
+        }
+        added = 0
+
         for i, filename in enumerate(image_files):
             try:
                 src_path = os.path.join(found_folder, filename)
                 
                 # Define destination
-                # We reuse the structure: static/images/{code}/{size}/{name}.jpg
-                # We need to generate unique names to avoid conflicts if re-importing
-                file_stem = Path(filename).stem
-                unique_stem = f"{file_stem}_{uuid.uuid4().hex[:6]}"
-                
-                # Define sizes
-                sizes = {
-                    'thumbnail': (150, 150),
-                    'small': (300, 300),
-                    'medium': (500, 500), 
-                    'large': (800, 800)
-                }
-
-                product_dir = os.path.join(IMAGES_DIR, product_code)
-                os.makedirs(product_dir, exist_ok=True)
-                
-                # Optimize Main Images
-                original_jpg = os.path.join(product_dir, f"{unique_stem}.jpg")
-                original_webp = os.path.join(product_dir, f"{unique_stem}.webp")
-                
-                optimize_single_image(src_path, original_jpg, None, quality=90, format='JPEG')
-                optimize_single_image(src_path, original_webp, None, quality=80, format='WebP')
-
-                # Optimize Sizes
-                for size_name, size_dims in sizes.items():
-                    size_dir = os.path.join(product_dir, size_name)
-                    os.makedirs(size_dir, exist_ok=True)
-                    
-                    jpg_path = os.path.join(size_dir, f"{unique_stem}.jpg")
-                    webp_path = os.path.join(size_dir, f"{unique_stem}.webp")
-                    
-                    optimize_single_image(src_path, jpg_path, size_dims, quality=85, format='JPEG')
-                    optimize_single_image(src_path, webp_path, size_dims, quality=80, format='WebP')
+                # We reuse the structure: static/images/{code}/{size}/{content hash}.jpg
+                # 按内容哈希命名：重新导入相同的图片不会产生新文件
+                digest = file_content_hash(src_path)
+                url = product_image_url(product_code, digest)
+                if url in attached_urls:
+                    # 产品已有这张图片
+                    count += 1
+                    continue
+
+                # 相同内容已生成过各尺寸时直接复用，否则生成原图及各尺寸（JPEG + WebP）
+                variants = existing_image_variants(db, url) or save_product_image_variants(src_path, product_code, digest)
 
                 # Add to DB
                 image = ProductImage(
                     id=str(uuid.uuid4()),
                     product_id=product_id,
-                    url=f"images/{product_code}/{unique_stem}.jpg",
+                    url=url,
                     alt=f"{product_code} - {filename}",
-                    type="main" if (max_sort == -1 and i == 0) else "gallery",
-                    sort_order=max_sort + 1 + i
+                    type="main" if (max_sort == -1 and added == 0) else "gallery",
+                    sort_order=max_sort + 1 + added,
+                    variants=variants
                 )
                 db.add(image)
+                attached_urls.add(url)
+                added += 1
                 count += 1
 
             except Exception as e:
@@ -0,0 +1,183 @@
+"""
+产品热度统计
+浏览 / 加购事件只在内存中累加（请求路径上不访问数据库、不占用写锁），
+后台任务定期把计数批量写入按天分桶的 product_event_counts 表，
+再按时间衰减（半衰期 POPULARITY_HALF_LIFE_DAYS 天）把各天计数折算为热度，
+products.popularity_score = popularity_base（后台设置的基础热度）+ 衰减后的热度，
+“最受欢迎”排序因此反映的是近期的真实热度，后台设置的值也不会被覆盖
+"""
+
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import Date, bindparam, text
+from sqlalchemy.orm import Session
+
+from app.core.catalog import bump_catalog_version
+from app.db.session import SessionLocal
+from app.models.models import Product, ProductEventCount
+from app.schemas.schemas import ProductEventType
+
+logger = logging.getLogger(__name__)
+
+# 事件权重：加购比浏览更能说明兴趣
+EVENT_WEIGHTS = {ProductEventType.VIEW: 1.0, ProductEventType.ADD_TO_CART: 5.0}
+HALF_LIFE_DAYS = float(os.getenv("POPULARITY_HALF_LIFE_DAYS", "7"))
+# 超过该天数的分桶权重已可忽略，参与计算前删除
+WINDOW_DAYS = int(os.getenv("POPULARITY_WINDOW_DAYS", "90"))
+FLUSH_INTERVAL_SECONDS = float(os.getenv("POPULARITY_FLUSH_SECONDS", "30"))
+SCORE_INTERVAL_SECONDS = float(os.getenv("POPULARITY_SCORE_SECONDS", "600"))
+# 缓冲区最多保留的 (产品, 天) 数量，超出后丢弃新事件直到下次写入，防止伪造 id 撑爆内存
+MAX_PENDING_KEYS = 50000
+
+# 未知产品 id 的事件在写入时被 EXISTS 条件过滤掉
+UPSERT_EVENT_COUNTS = text("""
+    INSERT INTO product_event_counts (product_id, day, views, add_to_carts)
+    SELECT :product_id, :day, :views, :add_to_carts
+    WHERE EXISTS (SELECT 1 FROM products WHERE id = :product_id)
+    ON CONFLICT (product_id, day) DO UPDATE SET
+        views = views + excluded.views,
+        add_to_carts = add_to_carts + excluded.add_to_carts
+""").bindparams(bindparam("day", type_=Date))
+
+
+def utc_today() -> date:
+    return datetime.utcnow().date()
+
+
+class PopularityTracker:
+    """进程内事件缓冲区：record 只做一次加锁的字典累加"""
+
+    def __init__(self, max_pending: int = MAX_PENDING_KEYS):
+        self.max_pending = max_pending
+        self._lock = threading.Lock()
+        self._pending: Dict[Tuple[str, date], List[int]] = {}
+        self.dropped = 0
+
+    def record(self, product_id: str, event_type: ProductEventType, day: Optional[date] = None) -> bool:
+        key = (product_id, day or utc_today())
+        with self._lock:
+            counts = self._pending.get(key)
+            if counts is None:
+                if len(self._pending) >= self.max_pending:
+                    self.dropped += 1
+                    return False
+                counts = self._pending[key] = [0, 0]
+            counts[0 if event_type == ProductEventType.VIEW else 1] += 1
+        return True
+
+    def drain(self) -> Dict[Tuple[str, date], List[int]]:
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        return pending
+
+    def flush(self, db: Session) -> int:
+        """把缓冲区计数写入数据库（单个事务、一条批量 upsert），返回写入的 (产品, 天) 数"""
+        pending = self.drain()
+        if not pending:
+            return 0
+        rows = [
+            {"product_id": product_id, "day": day, "views": views, "add_to_carts": add_to_carts}
+            for (product_id, day), (views, add_to_carts) in pending.items()
+        ]
+        try:
+            db.execute(UPSERT_EVENT_COUNTS, rows)
+            db.commit()
+        except Exception:
+            db.rollback()
+            # 写入失败时放回缓冲区，下次重试
+            with self._lock:
+                for key, (views, add_to_carts) in pending.items():
+                    counts = self._pending.setdefault(key, [0, 0])
+                    counts[0] += views
+                    counts[1] += add_to_carts
+            raise
+        return len(rows)
+
+
+class PopularityService:
+
+    @staticmethod
+    def decayed_scores(db: Session, today: date) -> Dict[str, int]:
+        """按天计数乘以衰减系数 0.5 ** (天数 / 半衰期) 后求和"""
+        scores: Dict[str, float] = defaultdict(float)
+        rows = db.query(
+            ProductEventCount.product_id, ProductEventCount.day,
+            ProductEventCount.views, ProductEventCount.add_to_carts
+        ).filter(ProductEventCount.day > today - timedelta(days=WINDOW_DAYS))
+        for product_id, day, views, add_to_carts in rows:
+            decay = 0.5 ** (max((today - day).days, 0) / HALF_LIFE_DAYS)
+            scores[product_id] += decay * (views * EVENT_WEIGHTS[ProductEventType.VIEW]
+                                           + add_to_carts * EVENT_WEIGHTS[ProductEventType.ADD_TO_CART])
+        return {product_id: round(score) for product_id, score in scores.items()}
+
+    @staticmethod
+    def recompute_scores(db: Session, today: Optional[date] = None) -> List[str]:
+        """
+        重新计算全部产品的 popularity_score（基础热度 + 衰减后的事件热度），
+        只更新数值有变化的产品并使目录缓存失效
+        """
+        today = today or utc_today()
+        db.query(ProductEventCount).filter(
+            ProductEventCount.day <= today - timedelta(days=WINDOW_DAYS)
+        ).delete(synchronize_session=False)
+
+        scores = PopularityService.decayed_scores(db, today)
+        changed = [
+            {"id": product_id, "score": (base or 0) + scores.get(product_id, 0)}
+            for product_id, current, base in db.query(Product.id, Product.popularity_score, Product.popularity_base)
+            if current != (base or 0) + scores.get(product_id, 0)
+        ]
+        if changed:
+            # 只改热度，不更新 updated_at
+            db.execute(text("UPDATE products SET popularity_score = :score WHERE id = :id"), changed)
+        db.commit()
+
+        product_ids = [row["id"] for row in changed]
+        if product_ids:
+            bump_catalog_version(product_ids=product_ids)
+        return product_ids
+
+
+popularity_tracker = PopularityTracker()
+
+
+def _run_jobs(recompute: bool) -> None:
+    db = SessionLocal()
+    try:
+        flushed = popularity_tracker.flush(db)
+        if flushed:
+            logger.info(f"Flushed popularity counters for {flushed} product-days")
+        if recompute:
+            changed = PopularityService.recompute_scores(db)
+            logger.info(f"Recomputed popularity scores ({len(changed)} changed)")
+    finally:
+        db.close()
+
+
+async def popularity_worker() -> None:
+    """后台任务：每 FLUSH_INTERVAL_SECONDS 写入一次计数，每 SCORE_INTERVAL_SECONDS 重算一次热度"""
+    last_scored = 0.0
+    while True:
+        await asyncio.sleep(FLUSH_INTERVAL_SECONDS)
+        recompute = time.monotonic() - last_scored >= SCORE_INTERVAL_SECONDS
+        try:
+            await asyncio.to_thread(_run_jobs, recompute)
+            if recompute:
+                last_scored = time.monotonic()
+        except Exception as e:
+            logger.error(f"Popularity job failed: {e}")
+
+
+def flush_popularity_counters() -> None:
+    """关闭服务前写入缓冲区中剩余的计数"""
+    try:
+        _run_jobs(recompute=False)
+    except Exception as e:
+        logger.error(f"Failed to flush popularity counters: {e}")
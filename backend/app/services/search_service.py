@@ -0,0 +1,240 @@
+"""
+产品全文检索服务
+基于 SQLite FTS5 对产品名称、货号、描述建立全文索引：
+- products_fts：trigram 分词器，用于 3 个字符及以上的检索词
+- products_fts_short：把文本拆成相邻二字组（末尾单字单独成词），unicode61 分词，
+  用于“口红”“粉盒”这类 1～2 个字符的检索词，不再回退到 LIKE 全表扫描
+"""
+
+import logging
+from typing import Optional, Tuple
+
+from sqlalchemy import text, column, or_, Float
+from sqlalchemy.sql.elements import ColumnElement
+from sqlalchemy.orm import Session, Query
+
+from app.core.product_code import normalize_code
+from app.models.models import Product
+
+logger = logging.getLogger(__name__)
+
+FTS_TABLE = "products_fts"
+FTS_SHORT_TABLE = "products_fts_short"
+# products.id -> 索引行 rowid。整数主键在 VACUUM 后保持不变，触发器按 rowid 直接定位索引行，
+# 不使用 products.rowid（products 主键是字符串，VACUUM 可能重排 rowid）
+FTS_KEYS_TABLE = "products_fts_keys"
+# 1..MAX_GRAM_POSITIONS 的序号表，触发器中用它把文本拆成二字组（触发器内不能使用 CTE）
+FTS_POSITIONS_TABLE = "products_fts_positions"
+# 每个字段只为前若干个字符生成二字组，超长描述中更靠后的 1～2 字检索词不会命中
+MAX_GRAM_POSITIONS = 4096
+
+FTS_COLUMNS = ("name", "code", "description")
+
+
+def _grams_sql(expression: str) -> str:
+    """生成把文本拆成空格分隔的二字组的 SQL 表达式：口红管 -> '口红 红管 管'"""
+    return (
+        f"coalesce((SELECT group_concat(substr({expression}, n, 2), ' ') FROM {FTS_POSITIONS_TABLE} "
+        f"WHERE n <= length({expression})), '')"
+    )
+
+
+def _insert_sql(row: str) -> str:
+    """触发器中为 row（new）写入两张索引表的语句，rowid 取自映射表（唯一索引查找）"""
+    key = f"(SELECT id FROM {FTS_KEYS_TABLE} WHERE product_id = {row}.id)"
+    values = [f"{row}.name", f"{row}.code", f"coalesce({row}.description, '')"]
+    columns = ", ".join(FTS_COLUMNS)
+    return f"""
+        INSERT INTO {FTS_TABLE}(rowid, {columns}) VALUES ({key}, {", ".join(values)});
+        INSERT INTO {FTS_SHORT_TABLE}(rowid, {columns})
+        VALUES ({key}, {", ".join(_grams_sql(value) for value in values)});"""
+
+
+def _delete_sql(row: str) -> str:
+    """触发器中删除 row（old）的索引行：按 rowid 单次查找，不扫描索引表"""
+    key = f"(SELECT id FROM {FTS_KEYS_TABLE} WHERE product_id = {row}.id)"
+    return f"""
+        DELETE FROM {FTS_TABLE} WHERE rowid = {key};
+        DELETE FROM {FTS_SHORT_TABLE} WHERE rowid = {key};"""
+
+
+# 通过触发器与 products 表保持同步，因此 admin 接口、批量导入等所有写入路径都会自动更新索引
+FTS_DDL = [
+    f"""
+    CREATE TABLE IF NOT EXISTS {FTS_KEYS_TABLE} (
+        id INTEGER PRIMARY KEY,
+        product_id VARCHAR NOT NULL UNIQUE
+    )
+    """,
+    f"CREATE TABLE IF NOT EXISTS {FTS_POSITIONS_TABLE} (n INTEGER PRIMARY KEY)",
+    f"""
+    INSERT OR IGNORE INTO {FTS_POSITIONS_TABLE}(n)
+    WITH RECURSIVE seq(n) AS (SELECT 1 UNION ALL SELECT n + 1 FROM seq WHERE n < {MAX_GRAM_POSITIONS})
+    SELECT n FROM seq
+    """,
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE}
+    USING fts5({", ".join(FTS_COLUMNS)}, tokenize='trigram')
+    """,
+    # 只有空白分隔词，标点和符号也算词内字符，与 trigram 的子串语义一致
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_SHORT_TABLE}
+    USING fts5({", ".join(FTS_COLUMNS)}, tokenize="unicode61 remove_diacritics 0 categories 'L* M* N* P* S* Co'")
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON products BEGIN
+        INSERT INTO {FTS_KEYS_TABLE}(product_id) VALUES (new.id);{_insert_sql("new")}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON products BEGIN{_delete_sql("old")}
+        DELETE FROM {FTS_KEYS_TABLE} WHERE product_id = old.id;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF id, name, code, description ON products BEGIN{_delete_sql("old")}
+        UPDATE {FTS_KEYS_TABLE} SET product_id = new.id WHERE product_id = old.id;{_insert_sql("new")}
+    END
+    """,
+]
+
+FTS_DROP_DDL = [
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_ai",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_ad",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_au",
+    f"DROP TABLE IF EXISTS {FTS_TABLE}",
+    f"DROP TABLE IF EXISTS {FTS_SHORT_TABLE}",
+    f"DROP TABLE IF EXISTS {FTS_KEYS_TABLE}",
+    f"DROP TABLE IF EXISTS {FTS_POSITIONS_TABLE}",
+]
+
+
+class ProductSearchService:
+    # trigram 分词器要求检索词至少 3 个字符，更短的检索词走二字组索引
+    MIN_TERM_LENGTH = 3
+    # bm25 列权重：名称、货号、描述
+    RANK_WEIGHTS = (10.0, 10.0, 1.0)
+    # 检索词按规范化货号完全命中（O1 -> O01）时的相关度，排在所有 bm25 结果之前
+    EXACT_CODE_RANK = -1e9
+
+    _available: Optional[bool] = None
+
+    @staticmethod
+    def create_index(connection) -> bool:
+        """
+        创建全文索引表、id 映射表及同步触发器（幂等）。
+        旧版结构（以 products.rowid 关联，或在索引表中保存不分词的 product_id 列）会被删除重建。
+        返回 True 表示索引表为新建，需要调用 rebuild_index 回填数据。
+        """
+        if connection.dialect.name != "sqlite":
+            return False
+
+        tables = {
+            row[0] for row in connection.execute(text(
+                "SELECT name FROM sqlite_master WHERE type = 'table' AND name IN (:fts, :short, :keys)"
+            ), {"fts": FTS_TABLE, "short": FTS_SHORT_TABLE, "keys": FTS_KEYS_TABLE})
+        }
+        exists = bool(tables)
+        if exists and (len(tables) < 3 or "product_id" in {
+            row[1] for row in connection.execute(text(f"PRAGMA table_info({FTS_TABLE})"))
+        }):
+            ProductSearchService.drop_index(connection)
+            exists = False
+
+        for statement in FTS_DDL:
+            connection.execute(text(statement))
+        ProductSearchService._available = None
+        return not exists
+
+    @staticmethod
+    def rebuild_index(connection) -> None:
+        """根据 products 表全量重建全文索引"""
+        columns = ", ".join(FTS_COLUMNS)
+        for table in (FTS_TABLE, FTS_SHORT_TABLE, FTS_KEYS_TABLE):
+            connection.execute(text(f"DELETE FROM {table}"))
+        connection.execute(text(f"INSERT INTO {FTS_KEYS_TABLE}(product_id) SELECT id FROM products"))
+        source = f"FROM products JOIN {FTS_KEYS_TABLE} AS keys ON keys.product_id = products.id"
+        connection.execute(text(
+            f"INSERT INTO {FTS_TABLE}(rowid, {columns}) "
+            f"SELECT keys.id, name, code, coalesce(description, '') {source}"
+        ))
+        grams = ", ".join(_grams_sql(value) for value in ("name", "code", "coalesce(description, '')"))
+        connection.execute(text(f"INSERT INTO {FTS_SHORT_TABLE}(rowid, {columns}) SELECT keys.id, {grams} {source}"))
+
+    @staticmethod
+    def drop_index(connection) -> None:
+        for statement in FTS_DROP_DDL:
+            connection.execute(text(statement))
+
+    @staticmethod
+    def is_available(db: Session) -> bool:
+        """检查当前数据库是否已建立全文索引（结果按进程缓存）"""
+        if ProductSearchService._available is None:
+            try:
+                bind = db.get_bind()
+                ProductSearchService._available = bind.dialect.name == "sqlite" and db.execute(
+                    text("SELECT count(*) FROM sqlite_master WHERE type = 'table' AND name IN (:fts, :short)"),
+                    {"fts": FTS_TABLE, "short": FTS_SHORT_TABLE}
+                ).scalar() == 2
+            except Exception as e:
+                logger.warning(f"Full-text index unavailable: {e}")
+                ProductSearchService._available = False
+        return ProductSearchService._available
+
+    @staticmethod
+    def build_match_expression(search: str) -> Optional[Tuple[str, str]]:
+        """
+        将用户输入转换为 (索引表, FTS5 MATCH 表达式)，与原先 '%term%' 的子串语义保持一致：
+        3 个字符及以上在 trigram 索引中按短语匹配；2 个字符精确匹配二字组；
+        1 个字符按前缀匹配二字组（末尾单字单独成词，也能命中）
+        """
+        term = search.strip()
+        if not term:
+            return None
+        phrase = '"' + term.replace('"', '""') + '"'
+        if len(term) >= ProductSearchService.MIN_TERM_LENGTH:
+            return FTS_TABLE, phrase
+        if any(char.isspace() for char in term):
+            # 二字组按空白分词，含空白的短检索词无法在索引中表示
+            return None
+        return FTS_SHORT_TABLE, phrase if len(term) == 2 else phrase + " *"
+
+    @staticmethod
+    def apply_search(query: Query, db: Session, search: str) -> Tuple[Query, Optional[ColumnElement]]:
+        """
+        为产品查询添加检索条件，返回 (query, rank)。
+        有全文索引时通过 FTS5 子查询（经 id 映射表）关联，rank 为 bm25 相关度（越小越相关）；
+        否则回退到 name/code/description 的 LIKE 匹配，rank 为 None。
+        两种方式都会按规范化货号做一次精确匹配（唯一索引），输入 O1 也能查到 O01
+        """
+        code_normalized = normalize_code(search)
+        match = ProductSearchService.build_match_expression(search)
+        if match is None or not ProductSearchService.is_available(db):
+            search_term = f"%{search}%"
+            query = query.filter(
+                or_(
+                    Product.name.ilike(search_term),
+                    Product.code.ilike(search_term),
+                    Product.description.ilike(search_term),
+                    Product.code_normalized == code_normalized
+                )
+            )
+            return query, None
+
+        # 全文命中与货号精确命中合并，同一产品取更靠前的相关度
+        table, match = match
+        weights = ", ".join(str(w) for w in ProductSearchService.RANK_WEIGHTS)
+        fts = text(
+            f"SELECT product_id, min(rank) AS rank FROM ("
+            f"SELECT keys.product_id, hits.rank FROM ("
+            f"SELECT rowid, bm25({table}, {weights}) AS rank FROM {table} WHERE {table} MATCH :match"
+            f") AS hits JOIN {FTS_KEYS_TABLE} AS keys ON keys.id = hits.rowid "
+            f"UNION ALL "
+            f"SELECT id, {ProductSearchService.EXACT_CODE_RANK!r} FROM products WHERE code_normalized = :code"
+            f") GROUP BY product_id"
+        ).bindparams(match=match, code=code_normalized).columns(
+            column("product_id"), column("rank", Float)
+        ).subquery("fts")
+
+        query = query.join(fts, fts.c.product_id == Product.id)
+        return query, fts.c.rank
@@ -0,0 +1,263 @@
+"""
+相似产品预计算
+每个产品的属性编码为一个向量：
+- 管型、盒型、形状、材质、功能设计：按取值 one-hot / multi-hot（取自 product_attributes），每类归一化后加权
+- 容量、长宽高、重量、出厂价：log1p 后标准化（缺失值记为均值）
+向量按行 L2 归一化后，相似度即点积（余弦相似度）。按行分块做矩阵乘法（每块的临时矩阵不超过
+BLOCK_MEMORY_BYTES，与产品数无关），用 argpartition 取前 k 个，
+结果写入 product_similarities，详情页的相似产品接口只需按主键读取一次。
+
+增量刷新（批量导入、管理端修改后）：重新编码全部产品（只读两张表，开销很小），
+但只重算受影响产品的近邻列表 —— 改动的产品本身、列表中包含改动产品的产品，
+以及与改动产品的相似度超过自身第 k 名的产品。取值表或数值分布变化时其他产品的旧分数略有偏差，
+可定期运行 build_similar_products.py 全量重建
+"""
+
+import logging
+import threading
+import warnings
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set
+
+import numpy as np
+from sqlalchemy import func, insert
+from sqlalchemy.orm import Session
+
+from app.core.catalog import bump_catalog_version
+from app.db.session import SessionLocal
+from app.models.models import Product, ProductAttribute, ProductSimilarity
+
+logger = logging.getLogger(__name__)
+
+# 每个产品保存的近邻数（接口 limit 上限）
+SIMILAR_TOP_K = 12
+
+# 属性类型 -> 权重
+CATEGORICAL_WEIGHTS = {
+    "tube_type": 1.0,
+    "box_type": 1.0,
+    "shape": 1.0,
+    "material": 1.0,
+    "functional_design": 0.8,
+}
+# 数值特征 -> 权重；容量取区间中点
+NUMERIC_WEIGHTS = {
+    "capacity": 0.6,
+    "length": 0.4,
+    "width": 0.4,
+    "height": 0.4,
+    "weight": 0.3,
+    "factory_price": 0.6,
+}
+# 标准化后的截断范围，避免个别极端值主导距离
+NUMERIC_CLIP = 3.0
+
+# 分块矩阵乘法的临时内存预算。每行占 产品数 x 16 字节：float32 相似度 + int64 argpartition 下标（另留余量）
+BLOCK_MEMORY_BYTES = 64 * 1024 * 1024
+BLOCK_BYTES_PER_CELL = 16
+# 写库时每条 DELETE ... IN 的 id 数
+WRITE_BATCH_SIZE = 500
+
+
+def block_rows(product_count: int) -> int:
+    """每次矩阵乘法处理的行数，使 行数 x 产品数 的临时矩阵不超过 BLOCK_MEMORY_BYTES"""
+    return max(1, BLOCK_MEMORY_BYTES // (max(product_count, 1) * BLOCK_BYTES_PER_CELL))
+
+
+class ProductVectors:
+
+    def __init__(self, ids: List[str], matrix: np.ndarray):
+        self.ids = ids
+        self.position = {product_id: i for i, product_id in enumerate(ids)}
+        self.matrix = matrix
+
+    @staticmethod
+    def build(db: Session) -> "ProductVectors":
+        rows = db.query(
+            Product.id, Product.capacity_min, Product.capacity_max, Product.length, Product.width,
+            Product.height, Product.weight, Product.factory_price
+        ).order_by(Product.id).all()
+        ids = [row[0] for row in rows]
+        position = {product_id: i for i, product_id in enumerate(ids)}
+
+        blocks = []
+
+        # 分类属性：每类一个 multi-hot 块，行内归一化后乘以权重
+        values: Dict[str, Dict[str, List[int]]] = {kind: defaultdict(list) for kind in CATEGORICAL_WEIGHTS}
+        attributes = db.query(ProductAttribute.product_id, ProductAttribute.kind, ProductAttribute.value).filter(
+            ProductAttribute.kind.in_(list(CATEGORICAL_WEIGHTS))
+        )
+        for product_id, kind, value in attributes:
+            if product_id in position:
+                values[kind][value].append(position[product_id])
+        for kind, weight in CATEGORICAL_WEIGHTS.items():
+            if not values[kind]:
+                continue
+            block = np.zeros((len(ids), len(values[kind])), dtype=np.float32)
+            for column, (_, members) in enumerate(sorted(values[kind].items())):
+                block[members, column] = 1.0
+            counts = block.sum(axis=1, keepdims=True)
+            blocks.append(block / np.sqrt(np.maximum(counts, 1.0)) * weight)
+
+        # 数值属性
+        numeric = np.array(
+            [[_capacity(row[1], row[2]), row[3], row[4], row[5], row[6], row[7]] for row in rows],
+            dtype=np.float64
+        ).reshape(len(ids), len(NUMERIC_WEIGHTS))
+        numeric = np.log1p(np.clip(numeric, 0, None))
+        # 全为缺失值的列 nanmean / nanstd 会告警并返回 NaN，下面按均值 0、标准差 1 处理
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)
+            mean = np.nanmean(numeric, axis=0)
+            std = np.nanstd(numeric, axis=0)
+        std = np.where(np.isfinite(std) & (std > 0), std, 1.0)
+        mean = np.where(np.isfinite(mean), mean, 0.0)
+        numeric = np.clip(np.nan_to_num((numeric - mean) / std, nan=0.0), -NUMERIC_CLIP, NUMERIC_CLIP)
+        blocks.append((numeric * np.array(list(NUMERIC_WEIGHTS.values()))).astype(np.float32))
+
+        matrix = np.hstack(blocks) if blocks else np.zeros((len(ids), 0), dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix = matrix / np.where(norms > 0, norms, 1.0)
+        return ProductVectors(ids, matrix.astype(np.float32))
+
+    def top_k(self, rows: np.ndarray, k: int = SIMILAR_TOP_K):
+        """返回 rows 中每个产品的 (近邻下标, 相似度)，按相似度降序，不含自身和相似度 <= 0 的产品"""
+        count = len(self.ids)
+        step = block_rows(count)
+        for start in range(0, len(rows), step):
+            block = rows[start:start + step]
+            scores = self.matrix[block] @ self.matrix.T
+            scores[np.arange(len(block)), block] = -np.inf
+            width = min(k, count - 1)
+            if width <= 0:
+                for row in block:
+                    yield row, np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+                continue
+            # 直接对 scores 取最大的 width 个（不生成取负的副本）
+            candidates = np.argpartition(scores, count - width, axis=1)[:, count - width:]
+            candidate_scores = np.take_along_axis(scores, candidates, axis=1)
+            # 相似度降序，相同时按产品 id 顺序，保证结果稳定
+            order = np.lexsort((candidates, -candidate_scores), axis=1)
+            candidates = np.take_along_axis(candidates, order, axis=1)
+            candidate_scores = np.take_along_axis(candidate_scores, order, axis=1)
+            for row, neighbours, neighbour_scores in zip(block, candidates, candidate_scores):
+                keep = neighbour_scores > 0
+                yield row, neighbours[keep], neighbour_scores[keep]
+
+
+def _capacity(capacity_min: Optional[float], capacity_max: Optional[float]) -> float:
+    bounds = [value for value in (capacity_min, capacity_max) if value is not None]
+    return sum(bounds) / len(bounds) if bounds else np.nan
+
+
+class SimilarityService:
+    _lock = threading.Lock()
+
+    @staticmethod
+    def _store(db: Session, vectors: ProductVectors, product_ids: Iterable[str], rows: np.ndarray) -> int:
+        """替换 product_ids 的近邻列表（已删除的产品只删除不写入）"""
+        product_ids = list(product_ids)
+        for start in range(0, len(product_ids), WRITE_BATCH_SIZE):
+            db.query(ProductSimilarity).filter(
+                ProductSimilarity.product_id.in_(product_ids[start:start + WRITE_BATCH_SIZE])
+            ).delete(synchronize_session=False)
+
+        records = []
+        for row, neighbours, scores in vectors.top_k(rows):
+            records.extend(
+                {"product_id": vectors.ids[row], "rank": rank,
+                 "similar_product_id": vectors.ids[neighbour], "score": float(score)}
+                for rank, (neighbour, score) in enumerate(zip(neighbours, scores))
+            )
+        if records:
+            db.execute(insert(ProductSimilarity), records)
+        db.commit()
+        # 使相似产品接口的 ETag / 响应缓存失效
+        bump_catalog_version(product_ids=())
+        return len(rows)
+
+    @staticmethod
+    def rebuild(db: Session) -> int:
+        """全量重算全部产品的近邻列表，返回处理的产品数"""
+        with SimilarityService._lock:
+            vectors = ProductVectors.build(db)
+            db.query(ProductSimilarity).delete(synchronize_session=False)
+            return SimilarityService._store(db, vectors, [], np.arange(len(vectors.ids)))
+
+    @staticmethod
+    def refresh(db: Session, product_ids: Iterable[str]) -> int:
+        """增量刷新：只重算受 product_ids（新增、修改或已删除）影响的近邻列表，返回重算的产品数"""
+        changed: Set[str] = set(product_ids)
+        if not changed:
+            return 0
+        with SimilarityService._lock:
+            vectors = ProductVectors.build(db)
+            affected = set(changed)
+
+            # 列表中包含改动产品的
+            changed_list = list(changed)
+            for start in range(0, len(changed_list), WRITE_BATCH_SIZE):
+                affected.update(product_id for (product_id,) in db.query(ProductSimilarity.product_id).filter(
+                    ProductSimilarity.similar_product_id.in_(changed_list[start:start + WRITE_BATCH_SIZE])
+                ).distinct())
+
+            # 与改动产品的相似度超过自身第 k 名（或列表未满）的
+            changed_rows = np.array([vectors.position[p] for p in changed if p in vectors.position], dtype=np.int64)
+            if len(changed_rows):
+                threshold = np.zeros(len(vectors.ids), dtype=np.float32)
+                full = np.zeros(len(vectors.ids), dtype=bool)
+                kth = db.query(
+                    ProductSimilarity.product_id, func.min(ProductSimilarity.score), func.count()
+                ).group_by(ProductSimilarity.product_id)
+                for product_id, min_score, count in kth:
+                    if product_id in vectors.position:
+                        threshold[vectors.position[product_id]] = min_score
+                        full[vectors.position[product_id]] = count >= min(SIMILAR_TOP_K, len(vectors.ids) - 1)
+                best = np.full(len(vectors.ids), -np.inf, dtype=np.float32)
+                step = block_rows(len(vectors.ids))
+                for start in range(0, len(changed_rows), step):
+                    block = changed_rows[start:start + step]
+                    scores = vectors.matrix @ vectors.matrix[block].T
+                    scores[block, np.arange(len(block))] = -np.inf
+                    best = np.maximum(best, scores.max(axis=1))
+                candidates = np.flatnonzero((best > threshold) | (~full & (best > 0)))
+                affected.update(vectors.ids[row] for row in candidates)
+
+            rows = np.array(sorted(vectors.position[p] for p in affected if p in vectors.position), dtype=np.int64)
+            return SimilarityService._store(db, vectors, affected, rows)
+
+    @staticmethod
+    def is_empty(db: Session) -> bool:
+        return db.query(ProductSimilarity.product_id).first() is None
+
+
+def refresh_similar_products(product_ids: Iterable[str]) -> None:
+    """后台任务入口（导入、管理端写入完成后调用），使用独立的数据库会话"""
+    product_ids = list(product_ids)
+    db = SessionLocal()
+    try:
+        if SimilarityService.is_empty(db):
+            count = SimilarityService.rebuild(db)
+            logger.info(f"Built similar products for {count} products")
+        else:
+            count = SimilarityService.refresh(db, product_ids)
+            logger.info(f"Refreshed similar products for {count} products ({len(product_ids)} changed)")
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Failed to refresh similar products: {e}")
+    finally:
+        db.close()
+
+
+def build_similar_products_if_empty() -> None:
+    """启动时回填：表为空（新部署或刚升级）时全量计算一次"""
+    db = SessionLocal()
+    try:
+        if SimilarityService.is_empty(db) and db.query(Product.id).first() is not None:
+            count = SimilarityService.rebuild(db)
+            logger.info(f"Built similar products for {count} products")
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Failed to build similar products: {e}")
+    finally:
+        db.close()
@@ -0,0 +1,89 @@
+"""
+货号 / 名称联想
+目录变更后把货号和名称的小写形式放进两个有序数组，输入联想时用 bisect 定位前缀区间，
+只扫描命中的少量条目，耗时与产品数量基本无关。
+货号同时索引原文和规范化形式（见 app.core.product_code），查询也同时按两种形式匹配，
+因此输入 O1 能联想到 O01，输入 O01 也能联想到 O1
+"""
+
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.core.catalog import CatalogCache
+from app.core.product_code import normalize_code
+from app.models.models import Product
+
+# 联想条目：(id, 货号, 名称)
+Entry = Tuple[str, str, str]
+
+
+class PrefixArray:
+    """有序的 (键, 条目下标) 数组，支持按前缀取出前 limit 个不同条目"""
+
+    def __init__(self, pairs: Iterable[Tuple[str, int]]):
+        pairs = sorted(set(pairs))
+        self.keys = [key for key, _ in pairs]
+        self.refs = [ref for _, ref in pairs]
+
+    def scan(self, prefix: str, limit: int) -> List[Tuple[str, int]]:
+        matches, seen = [], set()
+        position = bisect_left(self.keys, prefix)
+        while position < len(self.keys) and len(seen) < limit:
+            key = self.keys[position]
+            if not key.startswith(prefix):
+                break
+            ref = self.refs[position]
+            if ref not in seen:
+                seen.add(ref)
+                matches.append((key, ref))
+            position += 1
+        return matches
+
+
+class SuggestIndex:
+
+    def __init__(self, entries: List[Entry]):
+        self.entries = entries
+        code_keys, name_keys = [], []
+        for ref, (_, code, name) in enumerate(entries):
+            if code:
+                code_keys.append((code.strip().lower(), ref))
+                code_keys.append((normalize_code(code), ref))
+            if name:
+                name = name.strip().lower()
+                name_keys.append((name, ref))
+                # 名称中空格分隔的各个词也可以作为前缀命中
+                name_keys.extend((word, ref) for word in name.split()[1:])
+        self.codes = PrefixArray(code_keys)
+        self.names = PrefixArray(name_keys)
+
+    @staticmethod
+    def build(db: Session) -> "SuggestIndex":
+        rows = db.query(Product.id, Product.code, Product.name).order_by(Product.code)
+        return SuggestIndex([(product_id, code, name) for product_id, code, name in rows])
+
+    def suggest(self, query: str, limit: int = 10) -> List[Dict[str, str]]:
+        """货号命中排在名称命中之前；同一组内与输入完全相同的排最前，其余按字典序"""
+        query = query.strip().lower()
+        if not query:
+            return []
+        prefixes = {query, normalize_code(query)}
+
+        suggestions, seen = [], set()
+        for array in (self.codes, self.names):
+            candidates = []
+            for prefix in prefixes:
+                candidates.extend((key != prefix, key, ref) for key, ref in array.scan(prefix, limit))
+            for _, _, ref in sorted(candidates):
+                if len(suggestions) >= limit:
+                    return suggestions
+                if ref not in seen:
+                    seen.add(ref)
+                    product_id, code, name = self.entries[ref]
+                    suggestions.append({"id": product_id, "code": code, "name": name})
+        return suggestions
+
+
+suggest_index_cache = CatalogCache("suggest index", SuggestIndex.build)
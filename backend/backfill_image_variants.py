@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+一次性回填产品图片变体清单
+扫描 UPLOAD_DIR 下已有的原图及各尺寸文件，写入 product_images.variants，
+之后列表接口不再需要逐张检查文件系统
+
+用法:
+    python backfill_image_variants.py            # 只处理尚未记录清单的图片
+    python backfill_image_variants.py --force    # 重新扫描全部图片
+    python backfill_image_variants.py --dry-run  # 只统计，不写入
+"""
+
+import argparse
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from app.db.session import SessionLocal
+from app.models.models import Product, ProductImage
+from app.core.file_utils import scan_product_image_variants
+
+BATCH_SIZE = 500
+
+
+def backfill(force: bool = False, dry_run: bool = False) -> None:
+    db = SessionLocal()
+    try:
+        query = db.query(ProductImage, Product.code).join(Product, ProductImage.product_id == Product.id)
+        if not force:
+            query = query.filter(ProductImage.variants.is_(None))
+
+        total = query.count()
+        print(f"开始扫描 {total} 张图片的变体文件...")
+
+        scanned = 0
+        missing_small = 0
+        last_id = ""
+        while True:
+            # 按 id 分批，避免在遍历游标时提交事务
+            batch = query.filter(ProductImage.id > last_id).order_by(ProductImage.id).limit(BATCH_SIZE).all()
+            if not batch:
+                break
+            last_id = batch[-1][0].id
+
+            for image, product_code in batch:
+                stem = Path(image.url or "").stem
+                if not stem:
+                    continue
+                variants = scan_product_image_variants(product_code, stem)
+                if not variants.get("small"):
+                    missing_small += 1
+                if not dry_run:
+                    image.variants = variants
+                scanned += 1
+
+            if not dry_run:
+                db.commit()
+            print(f"  已处理 {scanned}/{total}")
+
+        if not dry_run:
+            db.commit()
+        print(f"完成：共处理 {scanned} 张图片，其中 {missing_small} 张缺少 small 变体（列表接口将隐藏）")
+    except Exception as e:
+        print(f"回填过程中发生错误: {e}")
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backfill product image variant manifests from disk")
+    parser.add_argument("--force", action="store_true", help="rescan images that already have a manifest")
+    parser.add_argument("--dry-run", action="store_true", help="scan without writing to the database")
+    args = parser.parse_args()
+    backfill(force=args.force, dry_run=args.dry_run)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+产品列表响应序列化基准
+对比两条路径把同一页产品字典写成 JSON 字节的耗时：
+- 原路径：ApiResponse 作为 response_model，FastAPI 校验 + jsonable_encoder + json.dumps
+- 快速路径：SchemaJSONResponse，按类型化负载在 pydantic-core 中直接序列化
+
+不访问数据库，产品由内存中构造的 Product 对象经 convert_product_to_response 生成
+
+用法:
+    python benchmark_serialization.py                  # 默认 1000 个产品 / 页
+    python benchmark_serialization.py --products 200 --rounds 50
+"""
+
+import argparse
+import asyncio
+import json
+import time
+import uuid
+from datetime import datetime
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute, serialize_response
+
+from app.api.responses import api_response, PRODUCT_LIST_ADAPTER
+from app.api.utils import convert_product_to_response, convert_product_to_card
+from app.main import app
+from app.models.models import Product, ProductImage
+from app.schemas.schemas import ApiResponse
+
+SMALL_VARIANTS = {"small": {"jpg": {"width": 300, "height": 300, "bytes": 18000}}}
+
+
+def build_products(count: int):
+    products = []
+    for i in range(count):
+        product = Product(
+            id=str(uuid.uuid4()), name=f"磁吸方形口红管 {i}", code=f"B{i:05d}",
+            description="双色注塑口红管，磁吸开合，支持定制印刷" * 3, product_type="tube",
+            tube_type="口红管", functional_designs="磁吸,双色", shape="方形", material="ABS/PC",
+            dimensions={"weight": 21.5, "length": 80.0, "width": 20.0, "height": 20.0,
+                        "capacity": {"min": 3.5, "max": 4.0}, "compartments": 1},
+            cost_price=0.0, factory_price=1.8 + i / 100, has_sample=True, box_dimensions="50*40*30",
+            box_quantity=500, in_stock=True, popularity_score=50, is_featured=False,
+            created_at=datetime(2025, 1, 1), updated_at=datetime(2025, 1, 2),
+        )
+        product.images = [
+            ProductImage(id=str(uuid.uuid4()), url=f"images/{product.code}/{j}.jpg", alt=f"{product.code} - {j}",
+                         type="main" if j == 0 else "gallery", sort_order=j, variants=SMALL_VARIANTS)
+            for j in range(4)
+        ]
+        products.append(product)
+    return products
+
+
+def listing_data(products, card: bool):
+    convert = convert_product_to_card if card else convert_product_to_response
+    return {"products": [convert(p) for p in products], "total": len(products), "page": 1,
+            "totalPages": 1, "nextCursor": None}
+
+
+def legacy_body(route: APIRoute, data) -> bytes:
+    content = asyncio.run(serialize_response(
+        field=route.response_field,
+        response_content=ApiResponse(data=data, message="Products retrieved successfully"),
+    ))
+    return JSONResponse(content).body
+
+
+def fast_body(data) -> bytes:
+    return api_response(data, "Products retrieved successfully", PRODUCT_LIST_ADAPTER).body
+
+
+def timed(func, rounds: int) -> float:
+    started = time.perf_counter()
+    for _ in range(rounds):
+        func()
+    return (time.perf_counter() - started) / rounds * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark product listing JSON serialization")
+    parser.add_argument("--products", type=int, default=1000, help="products per page")
+    parser.add_argument("--rounds", type=int, default=20, help="timed iterations per path")
+    args = parser.parse_args()
+
+    route = next(r for r in app.routes if isinstance(r, APIRoute) and r.path == "/api/products")
+    products = build_products(args.products)
+
+    print(f"{args.products} 个产品 / 页，每条路径 {args.rounds} 轮")
+    for card in (False, True):
+        data = listing_data(products, card)
+        legacy, fast = legacy_body(route, data), fast_body(data)
+        assert json.loads(legacy) == json.loads(fast), "两条路径输出不一致"
+
+        legacy_ms = timed(lambda: legacy_body(route, data), args.rounds)
+        fast_ms = timed(lambda: fast_body(data), args.rounds)
+        print(f"  {'card' if card else 'full'} 视图 ({len(fast) / 1024:.0f} KB): "
+              f"原路径 {legacy_ms:.2f}ms，快速路径 {fast_ms:.2f}ms，{legacy_ms / fast_ms:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+"""
+全量重建相似产品表 product_similarities
+日常由导入 / 管理端修改后的增量刷新维护；属性取值或价格分布整体变化后可运行本脚本重算全部产品
+
+用法:
+    python build_similar_products.py
+"""
+
+import time
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from app.db.session import SessionLocal
+from app.services.similarity_service import SimilarityService
+
+
+def main():
+    db = SessionLocal()
+    try:
+        started = time.perf_counter()
+        count = SimilarityService.rebuild(db)
+        print(f"完成：共计算 {count} 个产品的相似产品，耗时 {time.perf_counter() - started:.1f}s")
+    except Exception as e:
+        print(f"重建过程中发生错误: {e}")
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
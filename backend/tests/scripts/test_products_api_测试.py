@@ -95,5 +95,194 @@ class TestProductsApi测试:
             db_config=db_config
         )
 
+        # Step: search_products_step
+        log.info(f'开始执行 step: search_products_step')
+        search_products_step = self.steps_dict.get('search_products_step')
+        step_host = self.testcase_host
+        response = RequestHandler.send_request(
+            method=search_products_step['method'],
+            url=step_host + self.VR.process_data(search_products_step['path']),
+            headers=self.VR.process_data(search_products_step.get('headers')),
+            data=self.VR.process_data(search_products_step.get('data')),
+            params=self.VR.process_data(search_products_step.get('params')),
+            files=self.VR.process_data(search_products_step.get('files'))
+        )
+        log.info(f'search_products_step 请求结果为：{response}')
+        self.session_vars['search_products_step'] = response
+        db_config = None
+        AssertHandler().handle_assertion(
+            asserts=self.VR.process_data(search_products_step['assert']),
+            response=response,
+            db_config=db_config
+        )
+
+        # Step: filter_products_step
+        log.info(f'开始执行 step: filter_products_step')
+        filter_products_step = self.steps_dict.get('filter_products_step')
+        step_host = self.testcase_host
+        response = RequestHandler.send_request(
+            method=filter_products_step['method'],
+            url=step_host + self.VR.process_data(filter_products_step['path']),
+            headers=self.VR.process_data(filter_products_step.get('headers')),
+            data=self.VR.process_data(filter_products_step.get('data')),
+            params=self.VR.process_data(filter_products_step.get('params')),
+            files=self.VR.process_data(filter_products_step.get('files'))
+        )
+        log.info(f'filter_products_step 请求结果为：{response}')
+        self.session_vars['filter_products_step'] = response
+        db_config = None
+        AssertHandler().handle_assertion(
+            asserts=self.VR.process_data(filter_products_step['assert']),
+            response=response,
+            db_config=db_config
+        )
+
+        # Step: get_products_cursor_step
+        log.info(f'开始执行 step: get_products_cursor_step')
+        get_products_cursor_step = self.steps_dict.get('get_products_cursor_step')
+        step_host = self.testcase_host
+        response = RequestHandler.send_request(
+            method=get_products_cursor_step['method'],
+            url=step_host + self.VR.process_data(get_products_cursor_step['path']),
+            headers=self.VR.process_data(get_products_cursor_step.get('headers')),
+            data=self.VR.process_data(get_products_cursor_step.get('data')),
+            params=self.VR.process_data(get_products_cursor_step.get('params')),
+            files=self.VR.process_data(get_products_cursor_step.get('files'))
+        )
+        log.info(f'get_products_cursor_step 请求结果为：{response}')
+        self.session_vars['get_products_cursor_step'] = response
+        db_config = None
+        AssertHandler().handle_assertion(
+            asserts=self.VR.process_data(get_products_cursor_step['assert']),
+            response=response,
+            db_config=db_config
+        )
+
+        # Step: get_products_card_view_step
+        log.info(f'开始执行 step: get_products_card_view_step')
+        get_products_card_view_step = self.steps_dict.get('get_products_card_view_step')
+        step_host = self.testcase_host
+        response = RequestHandler.send_request(
+            method=get_products_card_view_step['method'],
+            url=step_host + self.VR.process_data(get_products_card_view_step['path']),
+            headers=self.VR.process_data(get_products_card_view_step.get('headers')),
+            data=self.VR.process_data(get_products_card_view_step.get('data')),
+            params=self.VR.process_data(get_products_card_view_step.get('params')),
+            files=self.VR.process_data(get_products_card_view_step.get('files'))
+        )
+        log.info(f'get_products_card_view_step 请求结果为：{response}')
+        self.session_vars['get_products_card_view_step'] = response
+        db_config = None
+        AssertHandler().handle_assertion(
+            asserts=self.VR.process_data(get_products_card_view_step['assert']),
+            response=response,
+            db_config=db_config
+        )
+
+        # Step: get_products_batch_step
+        log.info(f'开始执行 step: get_products_batch_step')
+        get_products_batch_step = self.steps_dict.get('get_products_batch_step')
+        step_host = self.testcase_host
+        response = RequestHandler.send_request(
+            method=get_products_batch_step['method'],
+            url=step_host + self.VR.process_data(get_products_batch_step['path']),
+            headers=self.VR.process_data(get_products_batch_step.get('headers')),
+            data=self.VR.process_data(get_products_batch_step.get('data')),
+            params=self.VR.process_data(get_products_batch_step.get('params')),
+            files=self.VR.process_data(get_products_batch_step.get('files'))
+        )
+        log.info(f'get_products_batch_step 请求结果为：{response}')
+        self.session_vars['get_products_batch_step'] = response
+        db_config = None
+        AssertHandler().handle_assertion(
+            asserts=self.VR.process_data(get_products_batch_step['assert']),
+            response=response,
+            db_config=db_config
+        )
+
+        # Step: suggest_products_step
+        log.info(f'开始执行 step: suggest_products_step')
+        suggest_products_step = self.steps_dict.get('suggest_products_step')
+        step_host = self.testcase_host
+        response = RequestHandler.send_request(
+            method=suggest_products_step['method'],
+            url=step_host + self.VR.process_data(suggest_products_step['path']),
+            headers=self.VR.process_data(suggest_products_step.get('headers')),
+            data=self.VR.process_data(suggest_products_step.get('data')),
+            params=self.VR.process_data(suggest_products_step.get('params')),
+            files=self.VR.process_data(suggest_products_step.get('files'))
+        )
+        log.info(f'suggest_products_step 请求结果为：{response}')
+        self.session_vars['suggest_products_step'] = response
+        db_config = None
+        AssertHandler().handle_assertion(
+            asserts=self.VR.process_data(suggest_products_step['assert']),
+            response=response,
+            db_config=db_config
+        )
+
+        # Step: get_product_by_code_step
+        log.info(f'开始执行 step: get_product_by_code_step')
+        get_product_by_code_step = self.steps_dict.get('get_product_by_code_step')
+        step_host = self.testcase_host
+        response = RequestHandler.send_request(
+            method=get_product_by_code_step['method'],
+            url=step_host + self.VR.process_data(get_product_by_code_step['path']),
+            headers=self.VR.process_data(get_product_by_code_step.get('headers')),
+            data=self.VR.process_data(get_product_by_code_step.get('data')),
+            params=self.VR.process_data(get_product_by_code_step.get('params')),
+            files=self.VR.process_data(get_product_by_code_step.get('files'))
+        )
+        log.info(f'get_product_by_code_step 请求结果为：{response}')
+        self.session_vars['get_product_by_code_step'] = response
+        db_config = None
+        AssertHandler().handle_assertion(
+            asserts=self.VR.process_data(get_product_by_code_step['assert']),
+            response=response,
+            db_config=db_config
+        )
+
+        # Step: track_product_events_step
+        log.info(f'开始执行 step: track_product_events_step')
+        track_product_events_step = self.steps_dict.get('track_product_events_step')
+        step_host = self.testcase_host
+        response = RequestHandler.send_request(
+            method=track_product_events_step['method'],
+            url=step_host + self.VR.process_data(track_product_events_step['path']),
+            headers=self.VR.process_data(track_product_events_step.get('headers')),
+            data=self.VR.process_data(track_product_events_step.get('data')),
+            params=self.VR.process_data(track_product_events_step.get('params')),
+            files=self.VR.process_data(track_product_events_step.get('files'))
+        )
+        log.info(f'track_product_events_step 请求结果为：{response}')
+        self.session_vars['track_product_events_step'] = response
+        db_config = None
+        AssertHandler().handle_assertion(
+            asserts=self.VR.process_data(track_product_events_step['assert']),
+            response=response,
+            db_config=db_config
+        )
+
+        # Step: get_similar_products_step
+        log.info(f'开始执行 step: get_similar_products_step')
+        get_similar_products_step = self.steps_dict.get('get_similar_products_step')
+        step_host = self.testcase_host
+        response = RequestHandler.send_request(
+            method=get_similar_products_step['method'],
+            url=step_host + self.VR.process_data(get_similar_products_step['path']),
+            headers=self.VR.process_data(get_similar_products_step.get('headers')),
+            data=self.VR.process_data(get_similar_products_step.get('data')),
+            params=self.VR.process_data(get_similar_products_step.get('params')),
+            files=self.VR.process_data(get_similar_products_step.get('files'))
+        )
+        log.info(f'get_similar_products_step 请求结果为：{response}')
+        self.session_vars['get_similar_products_step'] = response
+        db_config = None
+        AssertHandler().handle_assertion(
+            asserts=self.VR.process_data(get_similar_products_step['assert']),
+            response=response,
+            db_config=db_config
+        )
+
 
         log.info(f"Test case test_products_api_测试 completed.")
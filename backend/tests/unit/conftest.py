@@ -0,0 +1,105 @@
+"""
+进程内测试的公共夹具
+使用临时 SQLite 数据库和图片目录，需在导入 app 之前设置环境变量
+"""
+
+import os
+import sys
+import tempfile
+import uuid
+from contextlib import contextmanager
+
+import pytest
+
+_TEST_ROOT = tempfile.mkdtemp(prefix="glam_cart_test_")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_TEST_ROOT, 'test.db')}"
+os.environ["UPLOAD_DIR"] = os.path.join(_TEST_ROOT, "images")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+from app.main import app as fastapi_app
+from app.db.session import SessionLocal, engine, create_tables
+from app.models.models import Base, Product, ProductImage
+from app.services.attribute_service import ProductAttributeService
+from app.core.security import get_current_active_user
+from app.core.catalog import bump_catalog_version
+
+
+@pytest.fixture(scope="session")
+def app():
+    create_tables()
+    fastapi_app.dependency_overrides[get_current_active_user] = lambda: None
+    yield fastapi_app
+    fastapi_app.dependency_overrides.clear()
+
+
+@pytest.fixture
+def client(app):
+    # 不进入上下文管理器，跳过 startup 中的迁移和管理员初始化
+    return TestClient(app)
+
+
+@pytest.fixture
+def db(app):
+    session = SessionLocal()
+    yield session
+    session.close()
+    with engine.begin() as connection:
+        for table in reversed(Base.metadata.sorted_tables):
+            connection.execute(table.delete())
+    bump_catalog_version()
+
+
+@pytest.fixture
+def make_products(db):
+    """批量创建测试产品，每个产品附带 images_per_product 张图片"""
+    def _make(count: int, images_per_product: int = 2, **fields):
+        products = []
+        for i in range(count):
+            product = Product(
+                name=fields.get("name", f"测试产品 {i}"),
+                code=fields["codes"][i] if "codes" in fields else f"T{uuid.uuid4().hex[:8]}",
+                shape=fields.get("shape", "圆形"),
+                material=fields.get("material", "ABS"),
+                tube_type=fields.get("tube_type", "口红管"),
+                functional_designs=fields.get("functional_designs", "磁吸"),
+                dimensions=fields.get("dimensions", {}),
+                factory_price=fields.get("factory_price", 1.0 + i),
+                is_featured=fields.get("is_featured", False),
+            )
+            for j in range(images_per_product):
+                product.images.append(ProductImage(
+                    url=f"images/{product.code}/img{j}.jpg",
+                    alt=f"{product.code} - Image {j + 1}",
+                    type="main" if j == 0 else "gallery",
+                    sort_order=j,
+                    variants=fields.get("image_variants"),
+                ))
+            ProductAttributeService.sync_product(product)
+            db.add(product)
+            products.append(product)
+        db.commit()
+        # 绕过管理接口直接写库，需要手动使目录快照失效
+        bump_catalog_version()
+        return products
+    return _make
+
+
+@pytest.fixture
+def count_queries():
+    """统计代码块内执行的 SQL 语句数"""
+    @contextmanager
+    def _count():
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(engine, "before_cursor_execute", before_cursor_execute)
+        try:
+            yield statements
+        finally:
+            event.remove(engine, "before_cursor_execute", before_cursor_execute)
+    return _count
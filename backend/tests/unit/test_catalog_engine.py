@@ -0,0 +1,173 @@
+"""
+内存列式目录引擎：结果必须与 SQL 路径完全一致，写入后增量更新
+"""
+
+import logging
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from app.core.catalog import bump_catalog_version, get_catalog_version, product_changes_between
+from app.services import catalog_engine
+from app.services.catalog_engine import CatalogEngine, catalog_engine_cache
+
+LISTING_PARAMS = [
+    {},
+    {"limit": 3},
+    {"limit": 3, "page": 2},
+    {"sort": "price_low", "limit": 4},
+    {"sort": "price_high", "limit": 4, "page": 3},
+    {"sort": "popular"},
+    {"sort": "relevance", "limit": 5},
+    {"sort": "capacity_low"},
+    {"sort": "capacity_high", "limit": 2},
+    {"sort": "compartments_low"},
+    {"sort": "compartments_high", "limit": 3},
+    {"materials": "PC"},
+    {"materials": "ABS,PC", "shapes": "方形"},
+    {"tube_types": "不存在"},
+    {"capacity_min": 4, "capacity_max": 10},
+    {"compartments_min": 2, "price_max": 6},
+    {"price_min": 3, "materials": "ABS", "include_facets": "true"},
+    {"include_total": "false", "limit": 2},
+]
+
+
+@pytest.fixture
+def catalog(make_products):
+    make_products(3, material="ABS", shape="圆形", dimensions={"capacity": {"min": 2, "max": 5}, "compartments": 2})
+    make_products(3, material="PC", shape="方形", dimensions={"capacity": {"min": 8, "max": 15}})
+    make_products(2, material="ABS/PC", shape="方形", dimensions={"compartments": 4})
+    make_products(2, material="AS", shape="圆形", dimensions={})
+
+
+def _listing(client, monkeypatch, mode, params):
+    monkeypatch.setattr(catalog_engine, "CATALOG_ENGINE_MODE", mode)
+    response = client.get("/api/products", params=params)
+    assert response.status_code == 200, response.text
+    return response.json()["data"]
+
+
+@pytest.mark.parametrize("params", LISTING_PARAMS)
+def test_memory_engine_matches_sql(client, monkeypatch, catalog, params):
+    assert _listing(client, monkeypatch, "memory", params) == _listing(client, monkeypatch, "sql", params)
+
+
+@pytest.mark.parametrize("sort", ["newest", "price_low", "capacity_high", "compartments_low"])
+def test_memory_engine_cursor_pages_match_sql(client, monkeypatch, catalog, sort):
+    pages = {}
+    for mode in ("memory", "sql"):
+        codes, cursor = [], ""
+        while cursor is not None:
+            data = _listing(client, monkeypatch, mode, {"sort": sort, "limit": 3, "cursor": cursor})
+            codes.extend(p["code"] for p in data["products"])
+            cursor = data["nextCursor"]
+        pages[mode] = codes
+    assert len(pages["memory"]) == 10
+    assert pages["memory"] == pages["sql"]
+
+    # 两条路径生成的游标可以互相接续
+    first = _listing(client, monkeypatch, "sql", {"sort": sort, "limit": 4, "cursor": ""})
+    rest = _listing(client, monkeypatch, "memory", {"sort": sort, "limit": 20, "cursor": first["nextCursor"]})
+    assert [p["code"] for p in rest["products"]] == pages["sql"][4:]
+
+
+def test_admin_writes_update_engine_incrementally(client, monkeypatch, catalog, make_products):
+    monkeypatch.setattr(catalog_engine, "CATALOG_ENGINE_MODE", "memory")
+    client.get("/api/products")
+    before = catalog_engine_cache.get(None)
+
+    listing = _listing(client, monkeypatch, "memory", {"sort": "price_high", "limit": 1})
+    target = listing["products"][0]
+    response = client.put(f"/api/products/{target['id']}", json={"factory_price": 0.5})
+    assert response.status_code == 200, response.text
+    deleted = _listing(client, monkeypatch, "memory", {"sort": "price_low", "limit": 2})["products"][1]
+    assert client.delete(f"/api/products/{deleted['id']}").status_code == 200
+
+    after_changes = _listing(client, monkeypatch, "memory", {"sort": "price_low", "limit": 20})
+    engine = catalog_engine_cache.get(None)
+    # 只追加 / 修改了改动过的行，没有整体重建
+    assert engine is not before
+    assert engine.ids == before.ids
+    assert after_changes["products"][0]["id"] == target["id"]
+    assert deleted["id"] not in [p["id"] for p in after_changes["products"]]
+    assert after_changes == _listing(client, monkeypatch, "sql", {"sort": "price_low", "limit": 20})
+
+
+def test_compare_mode_logs_no_mismatch(client, monkeypatch, catalog, caplog):
+    with caplog.at_level(logging.WARNING, logger="app.api.routers.products"):
+        for params in LISTING_PARAMS:
+            _listing(client, monkeypatch, "compare", params)
+    assert "Catalog engine mismatch" not in caplog.text
+
+
+def test_change_log_reports_changed_products():
+    start = get_catalog_version()
+    bump_catalog_version(product_ids=["a"])
+    bump_catalog_version(product_ids=())
+    middle = bump_catalog_version(product_ids=["b", "a"])
+    assert product_changes_between(start, middle) == {"a", "b"}
+
+    bump_catalog_version()
+    assert product_changes_between(start, get_catalog_version()) is None
+    assert product_changes_between("other-boot.0", middle) is None
+
+
+def _engine_rows(rng, product_ids):
+    """随机生成引擎行与属性：取值集中在少数几个数上以制造并列，部分为 NULL"""
+    rows, attributes = [], []
+    for product_id in product_ids:
+        values = [None if rng.random() < 0.2 else float(rng.integers(0, 4)) for _ in range(5)]
+        created_at = None if rng.random() < 0.1 else datetime(2026, 1, 1 + int(rng.integers(0, 3)))
+        rows.append((product_id, int(rng.integers(1, 10 ** 6)), created_at, *values))
+        attributes.append((product_id, "material", str(rng.choice(["ABS", "PC", "AS"]))))
+    return rows, attributes
+
+
+def _sorted_ids(engine):
+    return {sort: [engine.ids[index] for index in order] for sort, (order, _) in engine.orders.items()}
+
+
+def test_incremental_orders_match_full_rebuild():
+    rng = np.random.default_rng(7)
+    rows, attributes = _engine_rows(rng, [f"p{i:03d}" for i in range(200)])
+    state = {row[0]: (row, attribute) for row, attribute in zip(rows, attributes)}
+    engine = CatalogEngine.empty().with_changes(list(state), [row for row, _ in state.values()],
+                                                [attribute for _, attribute in state.values()])
+
+    for _ in range(30):
+        changed = set(rng.choice(sorted(state), size=8, replace=False).tolist())
+        changed |= {f"n{rng.integers(0, 10 ** 6):06d}" for _ in range(3)}
+        deleted = set(list(changed)[:2])
+        rows, attributes = _engine_rows(rng, sorted(changed - deleted))
+        for product_id in deleted:
+            state.pop(product_id, None)
+        state.update((row[0], (row, attribute)) for row, attribute in zip(rows, attributes))
+
+        previous, previous_orders = engine, _sorted_ids(engine)
+        engine = engine.with_changes(changed, rows, attributes)
+        # 旧实例不受影响
+        assert _sorted_ids(previous) == previous_orders
+
+        rebuilt = CatalogEngine.empty().with_changes(list(state), [row for row, _ in state.values()],
+                                                     [attribute for _, attribute in state.values()])
+        assert _sorted_ids(engine) == _sorted_ids(rebuilt)
+        for selections in ({}, {"material": ["PC"]}, {"material": ["ABS", "AS"]}):
+            for sort in CatalogEngine.SORTS:
+                page = engine.query(sort, selections, {"price_max": 2}, 1, 500, None, True)
+                assert page["ids"] == rebuilt.query(sort, selections, {"price_max": 2}, 1, 500, None, True)["ids"]
+
+
+def test_tombstones_compacted_past_ratio(monkeypatch):
+    monkeypatch.setattr(catalog_engine, "TOMBSTONE_RATIO", 0.25)
+    rows, attributes = _engine_rows(np.random.default_rng(1), [f"p{i}" for i in range(8)])
+    engine = CatalogEngine.empty().with_changes([row[0] for row in rows], rows, attributes)
+
+    engine = engine.with_changes(["p0", "p1"], [], [])
+    # 2/8 未超过阈值：只打墓碑
+    assert len(engine.ids) == 8 and not engine.alive[:2].any()
+    engine = engine.with_changes(["p2"], [], [])
+    assert engine.ids == [f"p{i}" for i in range(3, 8)]
+    assert engine.alive.all()
+    assert engine.query("newest", {"material": ["ABS", "PC", "AS"]}, {}, 1, 20, None, True)["total"] == 5
@@ -0,0 +1,52 @@
+"""
+公开目录接口的 ETag / 304 条件请求
+"""
+
+import pytest
+
+
+@pytest.mark.parametrize("path", [
+    "/api/products",
+    "/api/products/featured",
+    "/api/products/filter-options",
+    "/api/carousels",
+    "/api/settings",
+])
+def test_public_endpoint_answers_304_without_database(client, make_products, count_queries, path):
+    make_products(2)
+    first = client.get(path)
+    assert first.status_code == 200
+    etag = first.headers["etag"]
+
+    with count_queries() as statements:
+        second = client.get(path, headers={"If-None-Match": etag})
+    assert second.status_code == 304
+    assert second.headers["etag"] == etag
+    assert statements == []
+
+
+def test_admin_write_invalidates_etag(client, make_products):
+    product = make_products(1)[0]
+    path = f"/api/products/{product.id}"
+    etag = client.get(path).headers["etag"]
+
+    response = client.put(path, json={"name": "已修改"})
+    assert response.status_code == 200
+
+    refreshed = client.get(path, headers={"If-None-Match": etag})
+    assert refreshed.status_code == 200
+    assert refreshed.headers["etag"] != etag
+    assert refreshed.json()["data"]["name"] == "已修改"
+
+
+def test_different_queries_get_different_etags(client, make_products):
+    make_products(3)
+    first = client.get("/api/products", params={"limit": 1})
+    second = client.get("/api/products", params={"limit": 2})
+    assert first.headers["etag"] != second.headers["etag"]
+
+
+def test_admin_endpoints_are_not_tagged(client):
+    response = client.get("/api/featured-products")
+    assert response.status_code == 200
+    assert "etag" not in response.headers
@@ -0,0 +1,72 @@
+"""
+产品目录流式导出（NDJSON / CSV）
+"""
+
+import csv
+import io
+import json
+
+from app.schemas.schemas import ExportFormat
+from app.services.export_service import CatalogExportService, EXPORT_COLUMNS
+
+VARIANTS = {"original": {"jpg": {"width": 800, "height": 800, "bytes": 9000}},
+            "small": {"webp": {"width": 300, "height": 300, "bytes": 1000}}}
+
+
+def test_ndjson_export_streams_every_product(client, make_products):
+    products = make_products(5, image_variants=VARIANTS)
+    response = client.get("/api/products/export/ndjson")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert "attachment" in response.headers["content-disposition"]
+
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert sorted(row["id"] for row in rows) == sorted(p.id for p in products)
+    assert set(rows[0]) == set(EXPORT_COLUMNS)
+
+
+def test_ndjson_export_with_variants(client, make_products):
+    product = make_products(1, images_per_product=2, image_variants=VARIANTS)[0]
+    response = client.get("/api/products/export/ndjson", params={"include_variants": "true"})
+    row = json.loads(response.text)
+
+    assert [image["url"] for image in row["images"]] == [
+        f"http://testserver/images/{product.code}/img0.jpg", f"http://testserver/images/{product.code}/img1.jpg"
+    ]
+    variants = row["images"][0]["variants"]
+    assert variants["original"]["jpg"]["url"] == f"http://testserver/images/{product.code}/img0.jpg"
+    assert variants["small"]["webp"] == {"width": 300, "height": 300, "bytes": 1000,
+                                         "url": f"http://testserver/images/{product.code}/small/img0.webp"}
+
+
+def test_csv_export(client, make_products):
+    products = make_products(3, images_per_product=2, dimensions={"capacity": {"min": 2, "max": 5}})
+    response = client.get("/api/products/export/csv", params={"include_images": "true"})
+    assert response.headers["content-type"] == "text/csv; charset=utf-8"
+
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert list(rows[0]) == EXPORT_COLUMNS + ["image_urls"]
+    assert sorted(row["code"] for row in rows) == sorted(p.code for p in products)
+    assert rows[0]["capacity_max"] == "5.0"
+    assert len(rows[0]["image_urls"].split("|")) == 2
+
+
+def test_csv_export_of_empty_catalog_has_header(client, db):
+    response = client.get("/api/products/export/csv")
+    assert response.text.strip() == ",".join(EXPORT_COLUMNS)
+
+
+def test_export_reads_in_primary_key_chunks(make_products, count_queries):
+    make_products(7)
+    with count_queries() as statements:
+        chunks = list(CatalogExportService.stream(ExportFormat.NDJSON, "http://testserver/",
+                                                  include_images=True, chunk_size=3))
+    # 3 + 3 + 1 个产品，每块一条产品查询 + 一条图片查询
+    assert [chunk.count(b"\n") for chunk in chunks] == [3, 3, 1]
+    assert len(statements) == 6
+    ids = [json.loads(line)["id"] for chunk in chunks for line in chunk.splitlines()]
+    assert ids == sorted(ids) and len(set(ids)) == 7
+
+
+def test_export_rejects_unknown_format(client):
+    assert client.get("/api/products/export/xml").status_code == 422
@@ -0,0 +1,161 @@
+"""
+响应压缩：Accept-Encoding 协商、按目录版本缓存的压缩响应、前端静态资源预压缩
+"""
+
+import asyncio
+import gzip
+import json
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.core import compression
+from app.core.compression import (
+    negotiate_encoding, CompressedResponseCache, PrecompressedStaticFiles, MIN_COMPRESS_SIZE
+)
+
+
+@pytest.mark.parametrize("header,expected", [
+    (None, None),
+    ("", None),
+    ("identity", None),
+    ("gzip", "gzip"),
+    ("gzip, deflate", "gzip"),
+    ("gzip;q=0", None),
+    ("*", compression.SUPPORTED_ENCODINGS[0]),
+    ("*;q=0.5, gzip;q=0", "br"),
+    ("deflate, gzip;q=0.8", "gzip"),
+])
+def test_negotiate_encoding(header, expected):
+    assert negotiate_encoding(header) == expected
+
+
+def test_listing_is_served_compressed_from_cache(client, make_products, count_queries):
+    make_products(5)
+    plain = client.get("/api/products", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in plain.headers
+    assert plain.headers["vary"] == "Accept-Encoding"
+
+    with count_queries() as statements:
+        compressed = client.get("/api/products", headers={"Accept-Encoding": "gzip"})
+    assert statements == []
+    assert compressed.headers["content-encoding"] == "gzip"
+    assert compressed.headers["etag"] == f"W/{plain.headers['etag']}"
+    assert compressed.json() == plain.json()
+
+    revalidated = client.get("/api/products", headers={
+        "Accept-Encoding": "gzip", "If-None-Match": compressed.headers["etag"]})
+    assert revalidated.status_code == 304
+    assert revalidated.headers["etag"] == compressed.headers["etag"]
+
+
+def test_admin_write_drops_cached_responses(client, make_products):
+    product = make_products(1)[0]
+    path = f"/api/products/{product.id}"
+    assert client.get(path).json()["data"]["name"] != "已修改"
+
+    client.put(path, json={"name": "已修改"})
+    assert client.get(path).json()["data"]["name"] == "已修改"
+
+
+def test_response_cache_compresses_once_per_version():
+    cache = CompressedResponseCache()
+    body = json.dumps({"data": ["x" * 10] * 100}).encode()
+
+    sent, encoding = cache.put("v1", "/api/products", "", body, "application/json", "gzip")
+    assert encoding == "gzip" and gzip.decompress(sent) == body
+    assert cache.get("v1", "/api/products", "", "gzip")[0] is sent
+    assert cache.get("v1", "/api/products", "", None) == (body, None, "application/json")
+    assert cache.get("v2", "/api/products", "", "gzip") is None
+
+    small, encoding = cache.put("v1", "/api/settings", "", b"{}", "application/json", "gzip")
+    assert (small, encoding) == (b"{}", None)
+
+
+def test_response_cache_ignores_stale_versions():
+    cache = CompressedResponseCache()
+    body = json.dumps({"data": ["x" * 10] * 100}).encode()
+    cache.put("boot.2", "/api/products", "", body, "application/json", None)
+
+    # 目录更新前开始的慢请求晚到：照常返回结果，但不把缓存回退到旧版本
+    stale = json.dumps({"data": ["y" * 10] * 100}).encode()
+    sent, encoding = cache.put("boot.1", "/api/products", "", stale, "application/json", "gzip")
+    assert encoding == "gzip" and gzip.decompress(sent) == stale
+    assert cache.get("boot.2", "/api/products", "", None) == (body, None, "application/json")
+    assert cache.get("boot.1", "/api/products", "", None) is None
+
+    cache.put("boot.3", "/api/products", "", stale, "application/json", None)
+    assert cache.get("boot.2", "/api/products", "", None) is None
+    # 其他进程实例的版本无法比较，按新版本处理
+    cache.put("other.1", "/api/products", "", body, "application/json", None)
+    assert cache.get("other.1", "/api/products", "", None) is not None
+
+
+def test_response_cache_evicts_least_recently_used():
+    cache = CompressedResponseCache(max_entries=2)
+    for path in ("/a", "/b"):
+        cache.put("v1", path, "", b"{}", "application/json", None)
+    cache.get("v1", "/a", "", None)
+    cache.put("v1", "/c", "", b"{}", "application/json", None)
+    assert cache.get("v1", "/b", "", None) is None
+    assert cache.get("v1", "/a", "", None) is not None
+
+
+def test_static_assets_are_precompressed(tmp_path):
+    script = b"export const value = 1;\n" * 200
+    (tmp_path / "app.js").write_bytes(script)
+    (tmp_path / "tiny.js").write_bytes(b"1;")
+    (tmp_path / "logo.png").write_bytes(b"\x89PNG" + b"\0" * MIN_COMPRESS_SIZE)
+
+    app = FastAPI()
+    app.mount("/assets", PrecompressedStaticFiles(directory=tmp_path), name="assets")
+    client = TestClient(app)
+
+    response = client.get("/assets/app.js", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["etag"].startswith("W/")
+    assert response.content == script
+
+    # 同一文件只压缩一次
+    cached = compression.precompressed_files._bodies
+    assert len(cached) == 1
+    client.get("/assets/app.js", headers={"Accept-Encoding": "gzip"})
+    assert len(cached) == 1
+
+    assert "content-encoding" not in client.get("/assets/app.js", headers={"Accept-Encoding": "identity"}).headers
+    assert "content-encoding" not in client.get("/assets/tiny.js", headers={"Accept-Encoding": "gzip"}).headers
+    assert "content-encoding" not in client.get("/assets/logo.png", headers={"Accept-Encoding": "gzip"}).headers
+
+
+def test_brotli_preferred(client, make_products):
+    make_products(5)
+    response = client.get("/api/products", headers={"Accept-Encoding": "gzip, br"})
+    assert response.headers["content-encoding"] == "br"
+
+
+def test_compression_runs_off_the_event_loop(client, make_products, monkeypatch, tmp_path):
+    import app.main as main
+
+    threads = []
+
+    def spy(body, encoding, levels=compression.API_LEVELS):
+        try:
+            asyncio.get_running_loop()
+            threads.append("event loop")
+        except RuntimeError:
+            threads.append("worker")
+        return gzip.compress(body)
+
+    monkeypatch.setattr(compression, "compress", spy)
+    monkeypatch.setattr(main, "compress", spy)
+    compression.response_cache.clear()
+    make_products(5)
+    client.get("/api/products", headers={"Accept-Encoding": "gzip"})
+    client.get("/openapi.json", headers={"Accept-Encoding": "gzip"})
+
+    (tmp_path / "app.js").write_bytes(b"export const value = 1;\n" * 200)
+    static = FastAPI()
+    static.mount("/assets", PrecompressedStaticFiles(directory=tmp_path), name="assets")
+    TestClient(static).get("/assets/app.js", headers={"Accept-Encoding": "gzip"})
+    assert threads == ["worker"] * 3
@@ -0,0 +1,45 @@
+"""
+产品接口的类型化快速序列化：输出必须与 ApiResponse + jsonable_encoder 路径完全一致
+"""
+
+import json
+
+from fastapi.encoders import jsonable_encoder
+
+from app.api.responses import PRODUCT_ADAPTER, PRODUCT_LIST_ADAPTER
+from app.api.utils import convert_product_to_card, convert_product_to_response
+from app.models.models import Product
+from app.schemas.schemas import ApiResponse
+
+SMALL_VARIANTS = {"small": {"jpg": {"width": 300, "height": 300, "bytes": 1000}}}
+
+
+def _legacy(data, message):
+    return json.loads(json.dumps(jsonable_encoder(ApiResponse(data=data, message=message))))
+
+
+def test_typed_payload_keeps_every_field(db, make_products):
+    product = make_products(1, image_variants=SMALL_VARIANTS, name="磁吸口红管",
+                            dimensions={"weight": 12.5, "capacity": {"min": 2, "max": 5}, "compartments": 3})[0]
+    product = db.query(Product).filter(Product.id == product.id).one()
+
+    for payload in (convert_product_to_response(product), convert_product_to_card(product)):
+        assert json.loads(PRODUCT_ADAPTER.dump_json({"data": payload, "message": "ok", "success": True})) == \
+            _legacy(payload, "ok")
+
+
+def test_listing_response_matches_legacy_encoding(client, db, make_products):
+    make_products(3, image_variants=SMALL_VARIANTS, material="ABS/PC")
+
+    response = client.get("/api/products", params={"include_facets": "true", "limit": 2})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/json"
+    body = response.json()
+
+    products = {p.id: p for p in db.query(Product).all()}
+    data = dict(body["data"], products=[convert_product_to_response(products[p["id"]]) for p in body["data"]["products"]])
+    assert body == _legacy(data, "Products retrieved successfully")
+    assert set(body["data"]) == {"products", "total", "page", "totalPages", "nextCursor", "facets"}
+
+    # 未知字段会被类型化序列化丢弃，因此列表包装本身也要逐字段一致
+    assert json.loads(PRODUCT_LIST_ADAPTER.dump_json({"data": data, "message": "m", "success": True})) == _legacy(data, "m")
@@ -0,0 +1,29 @@
+"""
+筛选项快照
+"""
+
+
+def test_filter_options_served_from_snapshot(client, make_products, count_queries):
+    make_products(2, material="ABS/PC", dimensions={"capacity": {"min": 5, "max": 12}, "compartments": 3})
+    first = client.get("/api/products/filter-options").json()["data"]
+    assert first["materials"] == ["ABS", "PC"]
+    assert first["capacityRange"] == {"min": 5, "max": 12}
+    assert first["compartmentRange"] == {"min": 3, "max": 3}
+    assert first["priceRange"] == {"min": 1.0, "max": 2.0}
+
+    with count_queries() as statements:
+        second = client.get("/api/products/filter-options").json()["data"]
+    assert second == first
+    assert statements == []
+
+
+def test_filter_options_rebuilt_after_admin_write(client, make_products):
+    product = make_products(1, material="ABS")[0]
+    assert client.get("/api/products/filter-options").json()["data"]["materials"] == ["ABS"]
+
+    response = client.put(f"/api/products/{product.id}", json={"material": "PETG", "factory_price": 9.5})
+    assert response.status_code == 200
+
+    data = client.get("/api/products/filter-options").json()["data"]
+    assert data["materials"] == ["PETG"]
+    assert data["priceRange"] == {"min": 9.5, "max": 9.5}
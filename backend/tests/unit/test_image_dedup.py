@@ -0,0 +1,146 @@
+"""
+按内容哈希存储产品图片：相同内容复用文件和变体清单，删除最后一个引用时才删除文件
+"""
+
+import asyncio
+import io
+import os
+import shutil
+
+import pytest
+from PIL import Image
+
+from app.core.file_utils import IMAGES_DIR, content_hash, product_image_url
+from app.models.models import ProductImage
+from app.services import image_job_service
+from app.services.image_job_service import ImageJobService, run_image_job, JOB_DONE
+from app.services.import_service import BatchImportService
+
+
+def _jpeg(color):
+    buffer = io.BytesIO()
+    Image.new("RGB", (640, 480), color).save(buffer, "JPEG")
+    return buffer.getvalue()
+
+
+RED = _jpeg((255, 0, 0))
+BLUE = _jpeg((0, 0, 255))
+
+
+def _upload(client, product_id, *contents):
+    response = client.post(f"/api/products/{product_id}/images", files=[
+        ("images", (f"{name}.jpg", content, "image/jpeg")) for name, content in contents
+    ])
+    assert response.status_code == 200, response.text
+    return response.json()["data"]
+
+
+def _run_next_job(db):
+    return asyncio.run(run_image_job(ImageJobService.claim_next(db)))
+
+
+def _files(product_code):
+    product_dir = os.path.join(IMAGES_DIR, product_code)
+    return sorted(
+        os.path.relpath(os.path.join(root, name), product_dir)
+        for root, _, names in os.walk(product_dir) for name in names
+    )
+
+
+def _count_derivations(monkeypatch):
+    calls = []
+    derive = image_job_service.save_product_image_variants
+
+    def counting(*args):
+        calls.append(args)
+        return derive(*args)
+
+    # 在线程中执行，才能统计调用次数
+    monkeypatch.setattr(image_job_service.image_pool, "workers", 0)
+    monkeypatch.setattr(image_job_service.image_pool, "_executor", None)
+    monkeypatch.setattr(image_job_service, "save_product_image_variants", counting)
+    return calls
+
+
+@pytest.fixture
+def product_id(make_products):
+    yield make_products(1, images_per_product=0, codes=["DUP1"])[0].id
+    shutil.rmtree(os.path.join(IMAGES_DIR, "DUP1"), ignore_errors=True)
+
+
+def test_identical_upload_reuses_files_without_decoding(client, db, product_id, monkeypatch):
+    calls = _count_derivations(monkeypatch)
+
+    first = _upload(client, product_id, ("a", RED))
+    assert first["images"][0]["url"] == product_image_url("DUP1", content_hash(RED))
+    assert _run_next_job(db) == JOB_DONE
+    files = _files("DUP1")
+    assert len(calls) == 1
+
+    # 文件名不同、内容相同
+    second = _upload(client, product_id, ("copy of a", RED))
+    assert second["images"][0]["url"] == first["images"][0]["url"]
+    assert _run_next_job(db) == JOB_DONE
+    assert len(calls) == 1
+    assert _files("DUP1") == files
+
+    images = client.get(f"/api/products/{product_id}").json()["data"]["images"]
+    assert [image["url"] for image in images] == [first["images"][0]["url"]] * 2
+    db.expire_all()
+    first_variants, second_variants = [image.variants for image in db.query(ProductImage)]
+    assert first_variants == second_variants
+
+
+def test_duplicates_within_one_upload_are_derived_once(client, db, product_id, monkeypatch):
+    calls = _count_derivations(monkeypatch)
+
+    data = _upload(client, product_id, ("a", RED), ("b", BLUE), ("a again", RED))
+    assert _run_next_job(db) == JOB_DONE
+    assert len(calls) == 2
+    assert len({image["url"] for image in data["images"]}) == 2
+    assert len(client.get(f"/api/products/{product_id}").json()["data"]["images"]) == 3
+
+
+def test_files_removed_with_last_reference(client, db, product_id):
+    data = _upload(client, product_id, ("a", RED), ("b", RED))
+    assert _run_next_job(db) == JOB_DONE
+    first, second = [image["id"] for image in data["images"]]
+    assert _files("DUP1")
+
+    assert client.get("/img/DUP1/" + content_hash(RED) + "?w=300").status_code == 200
+    assert client.delete(f"/api/products/{product_id}/images/{first}").status_code == 200
+    assert _files("DUP1")
+    assert client.get("/img/DUP1/" + content_hash(RED) + "?w=300").status_code == 200
+
+    assert client.delete(f"/api/products/{product_id}/images/{second}").status_code == 200
+    assert _files("DUP1") == []
+    assert client.get("/img/DUP1/" + content_hash(RED) + "?w=300").status_code == 404
+
+
+def test_deleting_product_removes_its_files(client, db, product_id):
+    _upload(client, product_id, ("a", RED), ("b", RED), ("c", BLUE))
+    assert _run_next_job(db) == JOB_DONE
+    assert client.delete(f"/api/products/{product_id}").status_code == 200
+    assert _files("DUP1") == []
+
+
+def test_reimport_does_not_duplicate_images(db, product_id, tmp_path):
+    folder = tmp_path / "DUP1"
+    folder.mkdir()
+    (folder / "1.jpg").write_bytes(RED)
+    (folder / "2.jpg").write_bytes(BLUE)
+    (folder / "2 copy.jpg").write_bytes(BLUE)
+
+    assert BatchImportService._process_product_images("DUP1", str(tmp_path), product_id, db) == 3
+    db.commit()
+    files = _files("DUP1")
+    images = db.query(ProductImage).filter(ProductImage.product_id == product_id).order_by(ProductImage.sort_order).all()
+    assert [image.type for image in images] == ["main", "gallery"]
+    assert all(image.variants.get("small") for image in images)
+
+    # 再次导入同一个 ZIP（文件名变化也一样）
+    (folder / "1.jpg").rename(folder / "renamed.jpg")
+    assert BatchImportService._process_product_images("DUP1", str(tmp_path), product_id, db) == 3
+    db.commit()
+    assert db.query(ProductImage).filter(ProductImage.product_id == product_id).count() == 2
+    assert _files("DUP1") == files
@@ -0,0 +1,181 @@
+"""
+图片变体后台任务：上传立即返回、任务进度、处理完成前隐藏图片
+"""
+
+import asyncio
+import io
+import os
+from datetime import datetime, timedelta
+
+import pytest
+from PIL import Image
+
+from app.core.file_utils import IMAGES_DIR, STAGING_DIR
+from app.models.models import ImageJob, ProductImage
+from app.services import image_job_service
+from app.services.image_job_service import (
+    ImageJobService, run_image_job, JOB_PENDING, JOB_RUNNING, JOB_DONE, JOB_FAILED
+)
+
+
+def _jpeg(color):
+    buffer = io.BytesIO()
+    Image.new("RGB", (640, 480), color).save(buffer, "JPEG")
+    return buffer.getvalue()
+
+
+def _upload(client, product_id, *contents):
+    response = client.post(f"/api/products/{product_id}/images", files=[
+        ("images", (f"{name}.jpg", content, "image/jpeg")) for name, content in contents
+    ])
+    assert response.status_code == 200, response.text
+    return response.json()["data"]
+
+
+def _job(client, job_id):
+    response = client.get(f"/api/products/image-jobs/{job_id}")
+    assert response.status_code == 200, response.text
+    return response.json()["data"]
+
+
+def _claim_and_run(db):
+    job_id = ImageJobService.claim_next(db)
+    assert job_id is not None
+    return asyncio.run(run_image_job(job_id))
+
+
+@pytest.fixture
+def product_id(make_products):
+    return make_products(1, images_per_product=0, codes=["JOB1"])[0].id
+
+
+def test_upload_returns_job_and_hides_images_until_ready(client, db, product_id):
+    data = _upload(client, product_id, ("a", _jpeg((255, 0, 0))), ("b", _jpeg((0, 0, 255))))
+    assert data["status"] == JOB_PENDING
+    assert [image["type"] for image in data["images"]] == ["main", "gallery"]
+
+    job = _job(client, data["jobId"])
+    assert (job["status"], job["total"], job["processed"]) == (JOB_PENDING, 2, 0)
+    assert client.get(f"/api/products/{product_id}").json()["data"]["images"] == []
+    assert not os.path.exists(os.path.join(IMAGES_DIR, "JOB1", "small"))
+
+    assert _claim_and_run(db) == JOB_DONE
+    job = _job(client, data["jobId"])
+    assert (job["status"], job["processed"], job["failed"]) == (JOB_DONE, 2, 0)
+    assert {image["status"] for image in job["images"]} == {JOB_DONE}
+
+    images = client.get(f"/api/products/{product_id}").json()["data"]["images"]
+    assert [image["url"] for image in images] == [image["url"] for image in data["images"]]
+    for image in data["images"]:
+        stem = os.path.splitext(os.path.basename(image["url"]))[0]
+        assert os.path.exists(os.path.join(IMAGES_DIR, "JOB1", "small", f"{stem}.webp"))
+    assert not os.path.exists(os.path.join(STAGING_DIR, data["jobId"]))
+
+
+def test_undecodable_upload_fails_and_drops_image(client, db, product_id):
+    data = _upload(client, product_id, ("good", _jpeg((0, 255, 0))), ("bad", b"not an image"))
+    assert _claim_and_run(db) == JOB_DONE
+
+    job = _job(client, data["jobId"])
+    assert (job["processed"], job["failed"]) == (2, 1)
+    failed = [image for image in job["images"] if image["status"] == JOB_FAILED]
+    assert len(failed) == 1 and failed[0]["error"]
+    db.expire_all()
+    assert db.query(ProductImage).filter(ProductImage.product_id == product_id).count() == 1
+
+
+def test_image_deleted_before_processing(client, db, product_id):
+    data = _upload(client, product_id, ("a", _jpeg((255, 0, 0))))
+    image_id = data["images"][0]["id"]
+    assert client.delete(f"/api/products/{product_id}/images/{image_id}").status_code == 200
+
+    assert _claim_and_run(db) == JOB_FAILED
+    assert _job(client, data["jobId"])["images"][0]["error"] == "Image was deleted before processing"
+    assert not os.path.exists(os.path.join(STAGING_DIR, data["jobId"]))
+
+
+def _expire_lease(db, job_id):
+    db.query(ImageJob).filter(ImageJob.id == job_id).update(
+        {ImageJob.heartbeat_at: datetime.utcnow() - timedelta(seconds=image_job_service.LEASE_SECONDS + 1)}
+    )
+    db.commit()
+
+
+def _load_job(db, job_id):
+    db.expire_all()
+    return db.query(ImageJob).filter(ImageJob.id == job_id).one()
+
+
+def test_claim_is_exclusive_and_interrupted_jobs_resume(client, db, product_id):
+    data = _upload(client, product_id, ("a", _jpeg((255, 0, 0))))
+    assert ImageJobService.claim_next(db) == data["jobId"]
+    assert ImageJobService.claim_next(db) is None
+
+    # 另一个进程仍在处理（心跳未过期）：重启时不会接手
+    assert ImageJobService.recover(db) == 0
+    assert _load_job(db, data["jobId"]).status == JOB_RUNNING
+
+    # 模拟处理中途进程退出：心跳过期后放回队列
+    _expire_lease(db, data["jobId"])
+    assert ImageJobService.recover(db) == 1
+    assert _load_job(db, data["jobId"]).status == JOB_PENDING
+    assert _claim_and_run(db) == JOB_DONE
+    assert _job(client, data["jobId"])["status"] == JOB_DONE
+    assert JOB_RUNNING not in {job.status for job in db.query(ImageJob)}
+
+
+def test_stale_running_job_is_reclaimed(client, db, product_id):
+    data = _upload(client, product_id, ("a", _jpeg((255, 0, 0))))
+    assert ImageJobService.claim_next(db) == data["jobId"]
+    ImageJobService.heartbeat(db, data["jobId"])
+    assert ImageJobService.claim_next(db) is None
+
+    _expire_lease(db, data["jobId"])
+    assert ImageJobService.claim_next(db) == data["jobId"]
+    assert _load_job(db, data["jobId"]).attempts == 2
+
+
+def test_failed_run_is_released_then_given_up(client, db, product_id, monkeypatch):
+    data = _upload(client, product_id, ("a", _jpeg((255, 0, 0))))
+
+    async def broken(job_id):
+        raise RuntimeError("database is locked")
+
+    monkeypatch.setattr(image_job_service, "run_image_job", broken)
+    worker = image_job_service.ImageJobWorker()
+    for attempt in range(1, image_job_service.MAX_ATTEMPTS):
+        assert ImageJobService.claim_next(db) == data["jobId"]
+        assert asyncio.run(worker._run_claimed(data["jobId"])) == JOB_PENDING
+        assert _load_job(db, data["jobId"]).attempts == attempt
+
+    # 最后一次仍失败：图片标记失败并删除记录，任务结束
+    assert ImageJobService.claim_next(db) == data["jobId"]
+    assert asyncio.run(worker._run_claimed(data["jobId"])) == JOB_FAILED
+    job = _job(client, data["jobId"])
+    assert (job["status"], job["failed"]) == (JOB_FAILED, 1)
+    assert job["images"][0]["error"] == "database is locked"
+    assert db.query(ProductImage).filter(ProductImage.product_id == product_id).count() == 0
+
+
+def test_unknown_job(client):
+    assert client.get("/api/products/image-jobs/no-such-job").status_code == 404
+
+
+def test_shutdown_puts_running_job_back(client, db, product_id, monkeypatch):
+    data = _upload(client, product_id, ("a", _jpeg((255, 0, 0))))
+
+    async def slow(job_id):
+        await asyncio.sleep(10)
+
+    async def scenario():
+        task = asyncio.create_task(image_job_service.ImageJobWorker()._run_claimed(data["jobId"]))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    monkeypatch.setattr(image_job_service, "run_image_job", slow)
+    assert ImageJobService.claim_next(db) == data["jobId"]
+    asyncio.run(scenario())
+    job = _load_job(db, data["jobId"])
+    assert (job.status, job.attempts) == (JOB_PENDING, 0)
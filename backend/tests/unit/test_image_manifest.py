@@ -0,0 +1,118 @@
+"""
+图片变体清单：上传 / 导入时写入 product_images.variants，序列化优先读清单、
+未回填清单的历史图片回退到文件系统检查，以及历史图片的回填脚本
+"""
+
+import asyncio
+import io
+import os
+from pathlib import Path
+
+import pytest
+from PIL import Image
+
+import backfill_image_variants
+from app.core.file_utils import IMAGES_DIR, save_product_image_variants, scan_product_image_variants
+from app.models.models import ProductImage
+from app.services.image_job_service import ImageJobService, run_image_job, JOB_DONE
+from app.services.import_service import BatchImportService
+
+SMALL_VARIANTS = {"small": {"webp": {"width": 300, "height": 300, "bytes": 1}}}
+
+
+def _jpeg(color=(255, 0, 0)):
+    buffer = io.BytesIO()
+    Image.new("RGB", (640, 480), color).save(buffer, "JPEG")
+    return buffer.getvalue()
+
+
+def _derive_files(tmp_path, product_code, stem="img0"):
+    """在磁盘上生成 make_products 图片（images/<code>/img0.jpg）对应的原图和各尺寸文件"""
+    source = tmp_path / f"{product_code}.jpg"
+    source.write_bytes(_jpeg())
+    return save_product_image_variants(str(source), product_code, stem)
+
+
+def _image(db, product_id):
+    db.expire_all()
+    return db.query(ProductImage).filter(ProductImage.product_id == product_id).one()
+
+
+def _shown(client, product_id):
+    response = client.get(f"/api/products/{product_id}")
+    assert response.status_code == 200, response.text
+    return [image["url"] for image in response.json()["data"]["images"]]
+
+
+def test_upload_job_records_manifest(client, db, make_products):
+    product = make_products(1, images_per_product=0, codes=["MAN1"])[0]
+    response = client.post(f"/api/products/{product.id}/images",
+                           files=[("images", ("a.jpg", _jpeg(), "image/jpeg"))])
+    assert response.status_code == 200, response.text
+    # 暂存时写入空清单，处理完成前不会回退到文件系统检查
+    assert _image(db, product.id).variants == {}
+
+    assert asyncio.run(run_image_job(ImageJobService.claim_next(db))) == JOB_DONE
+    image = _image(db, product.id)
+    assert image.variants["small"]
+    assert image.variants == scan_product_image_variants("MAN1", Path(image.url).stem)
+
+
+def test_import_records_manifest(db, make_products, tmp_path):
+    product = make_products(1, images_per_product=0, codes=["MAN2"])[0]
+    (tmp_path / "MAN2").mkdir()
+    (tmp_path / "MAN2" / "1.jpg").write_bytes(_jpeg())
+
+    assert BatchImportService._process_product_images("MAN2", str(tmp_path), product.id, db) == 1
+    db.commit()
+    image = _image(db, product.id)
+    assert image.variants["small"]
+    assert image.variants == scan_product_image_variants("MAN2", Path(image.url).stem)
+
+
+@pytest.mark.parametrize("variants,files_on_disk,shown", [
+    (SMALL_VARIANTS, False, True),   # 有清单时不访问文件系统
+    ({}, True, False),               # 清单中没有 small：即使文件存在也隐藏
+    (None, True, True),              # 未回填：small 文件存在则显示
+    (None, False, False),            # 未回填且文件缺失：隐藏
+])
+def test_manifest_first_then_filesystem(client, make_products, tmp_path, variants, files_on_disk, shown):
+    code = f"MAN3-{len(str(variants))}-{int(files_on_disk)}"
+    if files_on_disk:
+        _derive_files(tmp_path, code)
+    product = make_products(1, images_per_product=1, codes=[code], image_variants=variants)[0]
+    assert _shown(client, product.id) == ([f"images/{code}/img0.jpg"] if shown else [])
+
+
+def test_scan_skips_missing_and_undecodable_files(tmp_path):
+    manifest = _derive_files(tmp_path, "MAN4")
+    assert scan_product_image_variants("MAN4", "img0") == manifest
+    assert scan_product_image_variants("MAN4", "no-such-image") == {}
+
+    small_dir = os.path.join(IMAGES_DIR, "MAN4", "small")
+    with open(os.path.join(small_dir, "broken.webp"), "wb") as f:
+        f.write(b"not an image")
+    assert scan_product_image_variants("MAN4", "broken") == {}
+
+
+def test_backfill_script(client, db, make_products, tmp_path, capsys):
+    _derive_files(tmp_path, "BF1")
+    on_disk = make_products(1, images_per_product=1, codes=["BF1"])[0].id
+    missing = make_products(1, images_per_product=1, codes=["BF2"])[0].id
+    recorded = make_products(1, images_per_product=1, codes=["BF3"], image_variants=SMALL_VARIANTS)[0].id
+
+    backfill_image_variants.backfill(dry_run=True)
+    assert _image(db, on_disk).variants is None
+
+    backfill_image_variants.backfill()
+    assert "共处理 2 张图片，其中 1 张缺少 small 变体" in capsys.readouterr().out
+    assert _image(db, on_disk).variants == scan_product_image_variants("BF1", "img0")
+    assert _image(db, on_disk).variants["small"]
+    assert _image(db, missing).variants == {}
+    assert _image(db, recorded).variants == SMALL_VARIANTS
+    # 回填前后列表显示结果一致
+    assert _shown(client, on_disk) == ["images/BF1/img0.jpg"]
+    assert _shown(client, missing) == []
+
+    backfill_image_variants.backfill(force=True)
+    assert _image(db, recorded).variants == {}
@@ -0,0 +1,80 @@
+"""
+产品图片变体生成：单次解码、级联缩放、内存编码
+"""
+
+import os
+
+import pytest
+from PIL import Image
+
+from app.core import file_utils
+from app.core.file_utils import (
+    IMAGES_DIR, PRODUCT_IMAGE_FORMATS, PRODUCT_IMAGE_SIZES, fit_size, save_product_image_variants
+)
+
+
+def _source(tmp_path, size=(1200, 900), orientation=None, name="src.jpg"):
+    img = Image.new("RGB", size, (200, 30, 30))
+    img.paste((30, 30, 200), (0, 0, size[0] // 2, size[1]))
+    exif = Image.Exif()
+    if orientation:
+        exif[0x0112] = orientation
+    path = tmp_path / name
+    img.save(path, "JPEG", exif=exif.tobytes())
+    return str(path)
+
+
+@pytest.mark.parametrize("size", [(1200, 900), (900, 1200), (801, 799), (640, 480), (3000, 7), (7, 3000), (150, 150)])
+@pytest.mark.parametrize("box", list(PRODUCT_IMAGE_SIZES.values()))
+def test_fit_size_matches_thumbnail(size, box):
+    img = Image.new("RGB", size)
+    img.thumbnail(box)
+    assert fit_size(size, box) == img.size
+
+
+def test_variants_decode_source_once(tmp_path, monkeypatch):
+    src = _source(tmp_path)
+    opened = []
+    real_open = file_utils.Image.open
+
+    def counting_open(path, *args, **kwargs):
+        opened.append(path)
+        return real_open(path, *args, **kwargs)
+
+    monkeypatch.setattr(file_utils.Image, "open", counting_open)
+    manifest = save_product_image_variants(src, "PIPE1", "img_once")
+    assert opened == [src]
+
+    assert set(manifest) == {"original", *PRODUCT_IMAGE_SIZES}
+    assert manifest["original"]["jpg"]["width"] == 1200
+    for size_name, dims in PRODUCT_IMAGE_SIZES.items():
+        for ext in PRODUCT_IMAGE_FORMATS:
+            path = os.path.join(IMAGES_DIR, "PIPE1", size_name, f"img_once.{ext}")
+            info = manifest[size_name][ext]
+            assert info["bytes"] == os.path.getsize(path)
+            with real_open(path) as written:
+                assert written.size == dims == (info["width"], info["height"])
+
+
+def test_variants_apply_exif_orientation(tmp_path):
+    # 方向 6：顺时针旋转 90°，宽高互换
+    manifest = save_product_image_variants(_source(tmp_path, orientation=6), "PIPE2", "img_rotated")
+    assert (manifest["original"]["webp"]["width"], manifest["original"]["webp"]["height"]) == (900, 1200)
+    with Image.open(os.path.join(IMAGES_DIR, "PIPE2", "large", "img_rotated.jpg")) as large:
+        # 竖图缩放到 600x800 后左右补白
+        assert large.getpixel((50, 400)) == (255, 255, 255)
+        assert large.getpixel((400, 50)) != (255, 255, 255)
+
+
+def test_variants_of_small_source_are_padded_not_upscaled(tmp_path):
+    manifest = save_product_image_variants(_source(tmp_path, size=(200, 100)), "PIPE3", "img_small")
+    assert manifest["large"]["jpg"]["width"] == 800
+    with Image.open(os.path.join(IMAGES_DIR, "PIPE3", "large", "img_small.jpg")) as large:
+        assert large.getpixel((400, 200)) == (255, 255, 255)
+        assert large.getpixel((400, 400)) != (255, 255, 255)
+
+
+def test_undecodable_source_yields_empty_manifest(tmp_path):
+    path = tmp_path / "broken.jpg"
+    path.write_bytes(b"not an image")
+    assert save_product_image_variants(str(path), "PIPE4", "img_broken") == {}
@@ -0,0 +1,62 @@
+"""
+图片处理进程池：不阻塞事件循环、并行处理、有界排队
+"""
+
+import asyncio
+import os
+import time
+
+import pytest
+
+from app.core.image_pool import ImagePoolBusy, ImageProcessPool
+
+
+@pytest.fixture
+def pool():
+    pool = ImageProcessPool(workers=2, queue_size=4, queue_timeout=5)
+    yield pool
+    pool.shutdown()
+
+
+def test_runs_in_worker_process(pool):
+    assert asyncio.run(pool.run(os.getpid)) != os.getpid()
+
+
+def test_event_loop_keeps_running_while_workers_are_busy(pool):
+    asyncio.run(pool.run(os.getpid))  # 启动工作进程
+
+    async def scenario():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        task = asyncio.create_task(ticker())
+        started = time.monotonic()
+        await asyncio.gather(pool.run(time.sleep, 0.5), pool.run(time.sleep, 0.5))
+        elapsed = time.monotonic() - started
+        task.cancel()
+        return elapsed, ticks
+
+    elapsed, ticks = asyncio.run(scenario())
+    assert elapsed < 0.9  # 两个任务在两个进程中同时执行
+    assert ticks >= 20
+
+
+def test_full_queue_reports_busy():
+    pool = ImageProcessPool(workers=0, queue_size=1, queue_timeout=0.1)
+
+    async def scenario():
+        running = asyncio.create_task(pool.run(time.sleep, 0.5))
+        await asyncio.sleep(0.05)
+        with pytest.raises(ImagePoolBusy):
+            await pool.run(time.sleep, 0)
+        await running
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        pool.shutdown()
@@ -0,0 +1,154 @@
+"""
+按需生成的图片变体：尺寸白名单、磁盘缓存命中、LRU 淘汰（刚返回的文件除外）、并发请求合并
+"""
+
+import asyncio
+import io
+import os
+
+import pytest
+from PIL import Image
+
+from app.core import image_cache
+from app.core.file_utils import IMAGES_DIR, delete_file
+from app.core.image_cache import VariantDiskCache, image_variant_cache
+
+
+@pytest.fixture
+def source_image():
+    product_dir = os.path.join(IMAGES_DIR, "VAR1")
+    os.makedirs(product_dir, exist_ok=True)
+    Image.new("RGB", (1000, 800), (200, 30, 30)).save(os.path.join(product_dir, "photo_abc.jpg"), "JPEG")
+    yield "images/VAR1/photo_abc.jpg"
+    delete_file("images/VAR1/photo_abc.jpg")
+
+
+def test_variant_rendered_once_then_served_from_cache(client, source_image):
+    misses, hits = image_variant_cache.misses, image_variant_cache.hits
+
+    response = client.get("/img/VAR1/photo_abc?w=300&fmt=webp")
+    assert response.status_code == 200, response.text
+    assert response.headers["content-type"] == "image/webp"
+    assert "immutable" in response.headers["cache-control"]
+    with Image.open(io.BytesIO(response.content)) as img:
+        assert img.size == (300, 240)
+
+    again = client.get("/img/VAR1/photo_abc?w=300&fmt=webp")
+    assert again.content == response.content
+    assert (image_variant_cache.misses, image_variant_cache.hits) == (misses + 1, hits + 1)
+
+    jpeg = client.get("/img/VAR1/photo_abc?w=150&fmt=jpg")
+    assert jpeg.headers["content-type"] == "image/jpeg"
+    with Image.open(io.BytesIO(jpeg.content)) as img:
+        assert (img.format, img.size) == ("JPEG", (150, 120))
+
+
+def test_small_source_is_not_upscaled(client):
+    product_dir = os.path.join(IMAGES_DIR, "VAR2")
+    os.makedirs(product_dir, exist_ok=True)
+    Image.new("RGB", (200, 100), (0, 0, 0)).save(os.path.join(product_dir, "tiny.jpg"), "JPEG")
+    try:
+        response = client.get("/img/VAR2/tiny?w=800")
+        with Image.open(io.BytesIO(response.content)) as img:
+            assert img.size == (200, 100)
+    finally:
+        delete_file("images/VAR2/tiny.jpg")
+
+
+def test_rejects_unlisted_sizes_and_unknown_images(client, source_image):
+    assert client.get("/img/VAR1/photo_abc?w=301").status_code == 400
+    assert client.get("/img/VAR1/photo_abc?w=300&fmt=gif").status_code == 422
+    assert client.get("/img/VAR1/missing?w=300").status_code == 404
+    assert client.get("/img/.cache/photo_abc?w=300").status_code == 404
+    assert client.get("/img/VAR1/..?w=300").status_code == 404
+
+
+def test_deleting_image_discards_cached_variants(client, source_image):
+    assert client.get("/img/VAR1/photo_abc?w=500").status_code == 200
+    cached = image_variant_cache.path_for("VAR1/photo_abc/w500.webp")
+    assert os.path.exists(cached)
+
+    delete_file(source_image)
+    assert not os.path.exists(cached)
+    assert client.get("/img/VAR1/photo_abc?w=500").status_code == 404
+
+
+def _writer(calls, size=100, delay=0.0):
+    async def render(temp_path):
+        calls.append(temp_path)
+        await asyncio.sleep(delay)
+        with open(temp_path, "wb") as output:
+            output.write(b"x" * size)
+    return render
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    cache = VariantDiskCache(str(tmp_path), max_bytes=250, serve_grace_seconds=0)
+    calls = []
+
+    async def scenario():
+        await cache.get_or_create("a/w1.webp", _writer(calls))
+        await cache.get_or_create("b/w1.webp", _writer(calls))
+        await cache.get_or_create("a/w1.webp", _writer(calls))  # a 变为最近使用
+        await cache.get_or_create("c/w1.webp", _writer(calls))
+
+    asyncio.run(scenario())
+    assert len(calls) == 3
+    assert cache.total_bytes == 200
+    assert cache.get("b/w1.webp") is None
+    assert cache.get("a/w1.webp") and cache.get("c/w1.webp")
+
+    # 重启后从磁盘恢复条目
+    assert VariantDiskCache(str(tmp_path), max_bytes=250).total_bytes == 200
+
+
+def test_recently_served_entries_are_not_evicted(tmp_path, monkeypatch):
+    # 刚返回的路径可能还没被 FileResponse 打开，保护期内即使超出上限也不删除
+    clock = [0.0]
+    monkeypatch.setattr(image_cache.time, "monotonic", lambda: clock[0])
+    cache = VariantDiskCache(str(tmp_path), max_bytes=150, serve_grace_seconds=10)
+    calls = []
+
+    served = asyncio.run(cache.get_or_create("a/w1.webp", _writer(calls)))
+    clock[0] = 5
+    asyncio.run(cache.get_or_create("b/w1.webp", _writer(calls)))
+    assert os.path.exists(served)
+    assert cache.total_bytes == 200
+
+    # 保护期过后按 LRU 淘汰
+    clock[0] = 12
+    asyncio.run(cache.get_or_create("c/w1.webp", _writer(calls)))
+    assert not os.path.exists(served)
+    assert cache.total_bytes == 200
+    clock[0] = 23
+    asyncio.run(cache.get_or_create("d/w1.webp", _writer(calls)))
+    assert cache.total_bytes == 100
+    assert [key for key in "abcd" if cache.get(f"{key}/w1.webp")] == ["d"]
+
+
+def test_concurrent_requests_share_one_render(tmp_path):
+    cache = VariantDiskCache(str(tmp_path))
+    calls = []
+
+    async def scenario():
+        render = _writer(calls, delay=0.1)
+        return await asyncio.gather(*(cache.get_or_create("a/w1.webp", render) for _ in range(5)))
+
+    paths = asyncio.run(scenario())
+    assert len(calls) == 1
+    assert set(paths) == {cache.path_for("a/w1.webp")}
+    assert not [name for name in os.listdir(tmp_path / "a") if name.endswith(".tmp")]
+
+
+def test_failed_render_leaves_no_entry(tmp_path):
+    cache = VariantDiskCache(str(tmp_path))
+
+    async def broken(temp_path):
+        with open(temp_path, "wb") as output:
+            output.write(b"partial")
+        raise ValueError("cannot decode")
+
+    with pytest.raises(ValueError):
+        asyncio.run(cache.get_or_create("a/w1.webp", broken))
+    assert cache.get("a/w1.webp") is None
+    assert os.listdir(tmp_path / "a") == []
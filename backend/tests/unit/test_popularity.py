@@ -0,0 +1,147 @@
+"""
+浏览 / 加购事件：内存缓冲、批量写入、时间衰减热度
+"""
+
+from datetime import timedelta
+
+import pytest
+
+from app.models.models import Product, ProductEventCount
+from app.schemas.schemas import ProductEventType
+from app.services.popularity_service import (
+    PopularityTracker, PopularityService, popularity_tracker, utc_today, HALF_LIFE_DAYS
+)
+
+VIEW, CART = ProductEventType.VIEW, ProductEventType.ADD_TO_CART
+
+
+@pytest.fixture
+def tracker():
+    popularity_tracker.drain()
+    yield popularity_tracker
+    popularity_tracker.drain()
+
+
+def _events(client, *events):
+    response = client.post("/api/products/events", json={
+        "events": [{"product_id": product_id, "type": event_type} for product_id, event_type in events]
+    })
+    assert response.status_code == 200, response.text
+    return response.json()["data"]["accepted"]
+
+
+def test_ingestion_does_not_touch_database(client, make_products, count_queries, tracker):
+    product_id = make_products(1)[0].id
+    with count_queries() as statements:
+        accepted = _events(client, (product_id, "view"), (product_id, "view"), (product_id, "add_to_cart"))
+    assert accepted == 3
+    assert statements == []
+    assert tracker.drain() == {(product_id, utc_today()): [2, 1]}
+
+
+def test_ingestion_rejects_unknown_event_type(client):
+    response = client.post("/api/products/events", json={"events": [{"product_id": "x", "type": "like"}]})
+    assert response.status_code == 422
+
+
+def test_flush_accumulates_and_skips_unknown_products(make_products, db):
+    product = make_products(1)[0]
+    tracker = PopularityTracker()
+    for _ in range(3):
+        tracker.record(product.id, VIEW)
+    tracker.record(product.id, CART)
+    tracker.record("no-such-product", VIEW)
+    assert tracker.flush(db) == 2
+
+    tracker.record(product.id, VIEW)
+    tracker.flush(db)
+    rows = db.query(ProductEventCount).all()
+    assert [(row.product_id, row.views, row.add_to_carts) for row in rows] == [(product.id, 4, 1)]
+    assert tracker.flush(db) == 0
+
+
+def test_buffer_is_bounded():
+    tracker = PopularityTracker(max_pending=2)
+    assert tracker.record("a", VIEW) and tracker.record("b", VIEW) and tracker.record("a", CART)
+    assert not tracker.record("c", VIEW)
+    assert tracker.dropped == 1
+
+
+def test_scores_decay_with_age(make_products, db):
+    fresh, stale, idle = make_products(3)
+    today = utc_today()
+    tracker = PopularityTracker()
+    for _ in range(10):
+        tracker.record(fresh.id, VIEW, today)
+        tracker.record(stale.id, VIEW, today - timedelta(days=int(HALF_LIFE_DAYS)))
+    tracker.record(fresh.id, CART, today)
+    tracker.flush(db)
+
+    changed = PopularityService.recompute_scores(db, today)
+    assert set(changed) == {fresh.id, stale.id}
+    db.expire_all()
+    assert db.get(Product, fresh.id).popularity_score == 15
+    assert db.get(Product, stale.id).popularity_score == 5
+    assert db.get(Product, idle.id).popularity_score == 0
+    # 没有新事件时重算结果不变
+    assert PopularityService.recompute_scores(db, today) == []
+
+
+def test_recompute_without_events_keeps_existing_scores(make_products, db):
+    product = make_products(1)[0]
+    product.popularity_base = product.popularity_score = 50
+    db.commit()
+    assert PopularityService.recompute_scores(db) == []
+    db.refresh(product)
+    assert product.popularity_score == 50
+
+
+def test_recompute_adds_events_to_admin_base(client, make_products, db):
+    payload = {"name": "热门款", "code": "HOT-1", "shape": "圆形", "material": "ABS", "factory_price": 1.0,
+               "dimensions": {}, "popularity_score": 40}
+    response = client.post("/api/products", json=payload)
+    assert response.status_code == 200, response.text
+    manual_id = response.json()["data"]["id"]
+    viewed = make_products(1)[0]
+    tracker = PopularityTracker()
+    for _ in range(4):
+        tracker.record(manual_id, VIEW)
+        tracker.record(viewed.id, VIEW)
+    tracker.flush(db)
+    PopularityService.recompute_scores(db)
+    db.expire_all()
+    assert db.get(Product, manual_id).popularity_score == 44
+    assert db.get(Product, viewed.id).popularity_score == 4
+
+    # 只有其他产品有事件时，后台设置的基础热度也不会被清零
+    db.query(ProductEventCount).filter(ProductEventCount.product_id == manual_id).delete()
+    db.commit()
+    PopularityService.recompute_scores(db)
+    db.expire_all()
+    assert db.get(Product, manual_id).popularity_score == 40
+
+
+def test_admin_update_replaces_base_and_keeps_earned_score(client, make_products, db):
+    product = make_products(1)[0]
+    tracker = PopularityTracker()
+    for _ in range(6):
+        tracker.record(product.id, VIEW)
+    tracker.flush(db)
+    PopularityService.recompute_scores(db)
+
+    response = client.put(f"/api/products/{product.id}", json={"popularity_score": 20})
+    assert response.status_code == 200, response.text
+    data = response.json()["data"]
+    assert (data["popularityBase"], data["popularityScore"]) == (20, 26)
+    assert PopularityService.recompute_scores(db) == []
+
+
+def test_popular_sort_follows_events(client, make_products, db, tracker):
+    products = make_products(3)
+    listing = lambda: [p["id"] for p in client.get("/api/products", params={"sort": "popular"}).json()["data"]["products"]]
+    listing()
+
+    _events(client, *[(products[2].id, "view")] * 3, (products[1].id, "add_to_cart"))
+    tracker.flush(db)
+    PopularityService.recompute_scores(db)
+    assert listing() == [products[1].id, products[2].id, products[0].id]
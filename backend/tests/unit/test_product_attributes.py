@@ -0,0 +1,35 @@
+"""
+属性筛选：按拆分后的属性值精确匹配，不再对原字段做子串匹配
+"""
+
+import pytest
+
+from app.services import catalog_engine
+
+
+@pytest.fixture
+def catalog(make_products):
+    make_products(1, codes=["PC"], material="PC")
+    make_products(1, codes=["PCTG"], material="PCTG")
+    make_products(1, codes=["ABS-PC"], material="ABS/PC")
+    make_products(1, codes=["ABS"], material="ABS、亚克力")
+    make_products(1, codes=["SQUARE"], material="ABS", shape="方形")
+    make_products(1, codes=["LONG-SQUARE"], material="ABS", shape="长方形")
+
+
+def _codes(client, **params):
+    response = client.get("/api/products", params=params)
+    assert response.status_code == 200, response.text
+    return sorted(p["code"] for p in response.json()["data"]["products"])
+
+
+@pytest.mark.parametrize("mode", ["sql", "memory"])
+def test_value_does_not_match_longer_value_containing_it(client, monkeypatch, catalog, mode):
+    monkeypatch.setattr(catalog_engine, "CATALOG_ENGINE_MODE", mode)
+    # “PC” 不命中 “PCTG”，但命中多值字段 “ABS/PC” 拆分出的 PC
+    assert _codes(client, materials="PC") == ["ABS-PC", "PC"]
+    assert _codes(client, materials="PCTG") == ["PCTG"]
+    assert _codes(client, materials="亚克力") == ["ABS"]
+    assert _codes(client, shapes="方形") == ["SQUARE"]
+    assert _codes(client, shapes="方形,长方形") == ["LONG-SQUARE", "SQUARE"]
+    assert _codes(client, materials="P") == []
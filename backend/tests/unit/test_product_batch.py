@@ -0,0 +1,43 @@
+"""
+批量获取产品（购物车 / 对比视图）
+"""
+
+SMALL_VARIANTS = {"small": {"jpg": {"width": 300, "height": 300, "bytes": 1000}}}
+
+
+def _batch(client, **body):
+    response = client.post("/api/products/batch", json=body)
+    assert response.status_code == 200, response.text
+    return response.json()["data"]
+
+
+def test_batch_returns_products_in_requested_order(client, make_products):
+    products = make_products(4, image_variants=SMALL_VARIANTS)
+    keys = [products[2].id, products[0].code, "missing-id", products[3].id, products[2].code]
+
+    data = _batch(client, ids=keys)
+    # 重复的产品（同时按 id 和货号请求）只返回一次
+    assert [p["id"] for p in data["products"]] == [products[2].id, products[0].id, products[3].id]
+    assert data["missing"] == ["missing-id"]
+    assert data["products"][0]["images"] and "description" in data["products"][0]
+
+
+def test_batch_card_view(client, make_products):
+    products = make_products(2, image_variants=SMALL_VARIANTS)
+    data = _batch(client, ids=[p.id for p in products], view="card")
+    assert [set(p) for p in data["products"]] == [{"id", "name", "code", "images", "pricing"}] * 2
+
+
+def test_batch_statement_count_is_constant(client, make_products, count_queries):
+    ids = [p.id for p in make_products(60, images_per_product=3)]
+    _batch(client, ids=ids[:1])
+    with count_queries() as statements:
+        data = _batch(client, ids=ids)
+    assert len(data["products"]) == 60
+    # 产品一次查询 + 图片一次批量加载
+    assert len(statements) == 2
+
+
+def test_batch_rejects_empty_and_oversized_requests(client):
+    assert client.post("/api/products/batch", json={"ids": []}).status_code == 422
+    assert client.post("/api/products/batch", json={"ids": [str(i) for i in range(301)]}).status_code == 422
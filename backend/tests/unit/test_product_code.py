@@ -0,0 +1,160 @@
+"""
+规范化货号：唯一索引列、按货号查询、检索与写入路径使用同一规则
+"""
+
+import asyncio
+import importlib.util
+import io
+import logging
+import os
+
+import pandas as pd
+import pytest
+from alembic.migration import MigrationContext
+from alembic.operations import Operations
+from sqlalchemy import create_engine, event, text
+
+from app.core.product_code import normalize_code
+from app.db.session import engine
+from app.models.models import Product
+from app.services.import_service import BatchImportService
+
+MIGRATION = os.path.join(os.path.dirname(__file__), "..", "..", "alembic", "versions",
+                         "e8a2c4f6b1d3_add_product_code_normalized.py")
+
+
+@pytest.mark.parametrize("code,expected", [
+    ("O01", "o1"), ("O001", "o1"), ("o1", "o1"),
+    ("F-01", "f-1"), ("F_010", "f_10"),
+    ("007", "7"), (" abc ", "abc"), ("B01-A", "b01-a"),
+])
+def test_normalize_code(code, expected):
+    assert normalize_code(code) == expected
+
+
+def test_column_follows_code(make_products, db):
+    product = make_products(1, codes=["O010"])[0]
+    assert product.code_normalized == "o10"
+    product.code = "F-001"
+    assert product.code_normalized == "f-1"
+
+
+def test_get_product_by_code(client, make_products):
+    product = make_products(1, codes=["O01"])[0]
+    for code in ("O01", "O1", "o001"):
+        response = client.get(f"/api/products/by-code/{code}")
+        assert response.status_code == 200, response.text
+        assert response.json()["data"]["id"] == product.id
+
+    card = client.get("/api/products/by-code/O1", params={"view": "card"}).json()["data"]
+    assert set(card) == {"id", "name", "code", "images", "pricing"}
+    assert client.get("/api/products/by-code/O2").status_code == 404
+
+
+def test_get_product_by_code_is_one_index_probe(client, make_products):
+    make_products(3, codes=["A1", "A2", "A3"])
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if "code_normalized" in statement:
+            statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        assert client.get("/api/products/by-code/A02").status_code == 200
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+    assert len(statements) == 1
+    with engine.connect() as connection:
+        plan = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statements[0][0]}", statements[0][1]).fetchall()
+    assert any("USING INDEX ix_products_code_normalized" in row[3] for row in plan), plan
+
+
+@pytest.mark.parametrize("search", ["O1", "o0001", "O-1x"])
+def test_search_matches_normalized_code(client, make_products, search):
+    make_products(2, codes=["O01", "O77"], name="口红管")
+    codes = [p["code"] for p in client.get("/api/products", params={"search": search}).json()["data"]["products"]]
+    assert codes == ([] if search == "O-1x" else ["O01"])
+
+
+def test_search_ranks_exact_code_first(client, make_products):
+    # "F-001" 走全文索引；规范化货号精确命中的产品排在最前，即使它的名称 / 描述不含检索词
+    make_products(1, codes=["F-1"], name="圆形粉盒")
+    make_products(1, codes=["X5"], name="F-001 同款升级")
+    response = client.get("/api/products", params={"search": "F-001", "sort": "relevance"})
+    assert [p["code"] for p in response.json()["data"]["products"]] == ["F-1", "X5"]
+
+
+def test_admin_rejects_codes_equal_after_normalization(client, make_products):
+    existing, other = make_products(2, codes=["O01", "B7"])
+    payload = {"name": "新产品", "code": "O001", "shape": "圆形", "material": "ABS", "factory_price": 1.0,
+               "dimensions": {}}
+    response = client.post("/api/products", json=payload)
+    assert response.status_code == 400
+
+    assert client.put(f"/api/products/{other.id}", json={"code": "o1"}).status_code == 400
+    # 同一产品改写前导零不算冲突
+    response = client.put(f"/api/products/{existing.id}", json={"code": "O1"})
+    assert response.status_code == 200, response.text
+    assert client.get("/api/products/by-code/O001").json()["data"]["code"] == "O1"
+
+
+@pytest.fixture
+def legacy_collision(make_products, db):
+    """迁移回填时与 O1 冲突、code_normalized 留空的历史货号 O01"""
+    kept, legacy = make_products(2, codes=["O1", "X9"])
+    db.execute(text("UPDATE products SET code = 'O01', code_normalized = NULL WHERE id = :id"), {"id": legacy.id})
+    db.commit()
+    return kept.id, legacy.id
+
+
+def test_saving_legacy_colliding_code_keeps_it(client, db, legacy_collision):
+    kept_id, legacy_id = legacy_collision
+    response = client.put(f"/api/products/{legacy_id}", json={"code": "O01", "name": "旧货号产品"})
+    assert response.status_code == 200, response.text
+    assert response.json()["data"]["name"] == "旧货号产品"
+
+    response = client.put(f"/api/products/{legacy_id}", json={"code": "O001"})
+    assert response.status_code == 400
+    assert "O1" in response.json()["message"]
+    response = client.put(f"/api/products/{legacy_id}", json={"code": "O02"})
+    assert response.status_code == 200, response.text
+    assert client.get("/api/products/by-code/O2").json()["data"]["id"] == legacy_id
+
+
+def test_import_matches_legacy_colliding_code_exactly(db, legacy_collision):
+    kept_id, legacy_id = legacy_collision
+    excel = io.BytesIO()
+    pd.DataFrame([{"货号": "O01", "产品名称": "导入更新"}, {"货号": "O001", "产品名称": "规范化匹配"}]).to_excel(
+        excel, index=False)
+    result = asyncio.run(BatchImportService.process_import(db, excel.getvalue()))
+    assert result["success"], result
+
+    db.expire_all()
+    assert db.get(Product, legacy_id).name == "导入更新"
+    assert db.get(Product, kept_id).name == "规范化匹配"
+    assert db.query(Product).count() == 2
+
+
+def test_migration_reports_colliding_codes(tmp_path, caplog):
+    spec = importlib.util.spec_from_file_location("code_normalized_migration", MIGRATION)
+    migration = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(migration)
+
+    legacy = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    with legacy.begin() as connection:
+        connection.execute(text("CREATE TABLE products (id VARCHAR PRIMARY KEY, code VARCHAR, created_at DATETIME)"))
+        connection.execute(text(
+            "INSERT INTO products (id, code, created_at) VALUES "
+            "('a', 'O1', '2024-01-01'), ('b', 'O01', '2024-02-01'), ('c', 'o001', '2024-03-01'), ('d', 'X2', '2024-01-01')"
+        ))
+        with caplog.at_level(logging.WARNING, logger="alembic.runtime.migration"):
+            with Operations.context(MigrationContext.configure(connection)):
+                migration.upgrade()
+        rows = dict(connection.execute(text("SELECT id, code_normalized FROM products")).all())
+
+    assert rows == {"a": "o1", "b": None, "c": None, "d": "x2"}
+    report = caplog.text
+    assert "2 product codes collide" in report
+    assert "o1: kept O1 (id a); no normalized code: O01 (id b), o001 (id c)" in report
@@ -0,0 +1,42 @@
+"""
+列表接口的分面计数
+"""
+
+
+def _facets(client, **params):
+    response = client.get("/api/products", params={**params, "include_facets": "true"})
+    assert response.status_code == 200, response.text
+    return response.json()["data"]["facets"]
+
+
+def test_facet_counts_for_whole_catalog(client, make_products):
+    make_products(3, material="ABS", shape="圆形")
+    make_products(2, material="ABS/PC", shape="方形")
+
+    facets = _facets(client)
+    assert facets["materials"] == {"ABS": 5, "PC": 2}
+    assert facets["shapes"] == {"圆形": 3, "方形": 2}
+
+
+def test_facet_counts_ignore_own_selection(client, make_products):
+    make_products(3, material="ABS", shape="圆形")
+    make_products(2, material="PC", shape="方形")
+    make_products(1, material="PC", shape="圆形")
+
+    facets = _facets(client, materials="PC")
+    # 材质分面不受自身选择影响，形状分面只统计 PC 产品
+    assert facets["materials"] == {"ABS": 3, "PC": 3}
+    assert facets["shapes"] == {"圆形": 1, "方形": 2}
+
+
+def test_facet_counts_respect_search_and_ranges(client, make_products):
+    make_products(2, material="ABS", name="磁吸口红管")
+    make_products(2, material="PC", name="粉饼盒")
+
+    assert _facets(client, search="口红管")["materials"] == {"ABS": 2, "PC": 0}
+    assert _facets(client, price_min=2)["materials"] == {"ABS": 1, "PC": 1}
+
+
+def test_facets_are_omitted_by_default(client, make_products):
+    make_products(1)
+    assert "facets" not in client.get("/api/products").json()["data"]
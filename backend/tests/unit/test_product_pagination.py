@@ -0,0 +1,56 @@
+"""
+游标分页：沿 nextCursor 翻页覆盖全部产品且每个只出现一次，排序键为 NULL 的产品排在最后
+"""
+
+import pytest
+
+from app.models.models import Product
+from app.services import catalog_engine
+
+SORTS = ["newest", "popular", "price_low", "price_high", "capacity_low", "capacity_high",
+         "compartments_low", "compartments_high"]
+
+
+@pytest.fixture
+def catalog(db, make_products):
+    products = make_products(7, dimensions={"capacity": {"min": 2, "max": 5}})
+    for i, product in enumerate(products):
+        product.popularity_score = i % 3
+    # 历史数据中有热度、created_at 为空的产品（两列都可为 NULL）
+    for product in products[1:4]:
+        product.popularity_score = None
+    for product in products[2:5]:
+        product.created_at = None
+    db.commit()
+    return [product.code for product in products]
+
+
+def _walk(client, sort, limit):
+    codes, cursor = [], ""
+    while cursor is not None:
+        response = client.get("/api/products", params={"sort": sort, "limit": limit, "cursor": cursor})
+        assert response.status_code == 200, response.text
+        data = response.json()["data"]
+        codes += [product["code"] for product in data["products"]]
+        cursor = data["nextCursor"]
+    return codes
+
+
+@pytest.mark.parametrize("mode", ["sql", "memory"])
+@pytest.mark.parametrize("sort", SORTS)
+@pytest.mark.parametrize("limit", [1, 2, 3])
+def test_cursor_walk_returns_every_product_once(client, monkeypatch, catalog, mode, sort, limit):
+    monkeypatch.setattr(catalog_engine, "CATALOG_ENGINE_MODE", mode)
+    codes = _walk(client, sort, limit)
+    assert sorted(codes) == sorted(catalog)
+    # 与一次取完的顺序一致
+    assert codes == _walk(client, sort, 100)
+
+
+@pytest.mark.parametrize("mode", ["sql", "memory"])
+def test_null_sort_keys_come_last(client, db, monkeypatch, catalog, mode):
+    monkeypatch.setattr(catalog_engine, "CATALOG_ENGINE_MODE", mode)
+    missing_created = {code for (code,) in db.query(Product.code).filter(Product.created_at.is_(None))}
+    missing_popularity = {code for (code,) in db.query(Product.code).filter(Product.popularity_score.is_(None))}
+    assert set(_walk(client, "newest", 2)[-3:]) == missing_created
+    assert set(_walk(client, "popular", 2)[-3:]) == missing_popularity
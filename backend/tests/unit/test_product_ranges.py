@@ -0,0 +1,39 @@
+"""
+容量、分隔数、价格区间筛选与排序
+"""
+
+
+def _codes(response):
+    assert response.status_code == 200, response.text
+    return [p["code"] for p in response.json()["data"]["products"]]
+
+
+def test_capacity_filter_matches_overlapping_ranges(client, make_products):
+    small = make_products(1, dimensions={"capacity": {"min": 2, "max": 5}})[0]
+    medium = make_products(1, dimensions={"capacity": {"min": 8, "max": 15}})[0]
+    single = make_products(1, dimensions={"capacity": {"max": 30}})[0]
+    make_products(1, dimensions={})
+
+    assert set(_codes(client.get("/api/products", params={"capacity_min": 4, "capacity_max": 10}))) == {small.code, medium.code}
+    assert _codes(client.get("/api/products", params={"capacity_min": 20})) == [single.code]
+
+
+def test_compartment_and_price_filters(client, make_products):
+    products = make_products(4, dimensions={"compartments": 3})
+    make_products(1, dimensions={"compartments": 6})
+
+    codes = _codes(client.get("/api/products", params={"compartments_max": 4, "price_min": 2, "price_max": 3}))
+    assert set(codes) == {products[1].code, products[2].code}
+
+
+def test_capacity_sort_puts_missing_values_last(client, make_products):
+    low = make_products(1, dimensions={"capacity": {"min": 1, "max": 2}})[0]
+    missing = make_products(1, dimensions={})[0]
+    high = make_products(1, dimensions={"capacity": {"min": 50, "max": 80}})[0]
+
+    assert _codes(client.get("/api/products", params={"sort": "capacity_low"})) == [low.code, high.code, missing.code]
+    assert _codes(client.get("/api/products", params={"sort": "capacity_high"})) == [high.code, low.code, missing.code]
+
+    first = client.get("/api/products", params={"sort": "capacity_low", "limit": 2}).json()["data"]
+    rest = client.get("/api/products", params={"sort": "capacity_low", "limit": 2, "cursor": first["nextCursor"]})
+    assert _codes(rest) == [missing.code]
@@ -0,0 +1,65 @@
+"""
+全文检索：FTS5 索引经 id 映射表关联，与 products 的 rowid 无关；1～2 个字符的检索词走二字组索引；bm25 相关度按字段加权
+"""
+
+from sqlalchemy import text
+
+from app.core.catalog import bump_catalog_version
+from app.models.models import Product
+
+
+def _search(client, search, **params):
+    response = client.get("/api/products", params={"search": search, **params})
+    assert response.status_code == 200, response.text
+    return [p["code"] for p in response.json()["data"]["products"]]
+
+
+def test_search_survives_renumbered_rowids(client, db, make_products):
+    make_products(2, codes=["V1", "V2"], name="普通粉盒")
+    make_products(1, codes=["V3"], name="磁吸口红管")
+
+    # 模拟 VACUUM / 导出导入后 rowid 重新编号（不触发同步触发器）
+    db.execute(text("UPDATE products SET rowid = 1000 - rowid"))
+    db.commit()
+
+    assert _search(client, "口红管") == ["V3"]
+    assert sorted(_search(client, "普通粉盒")) == ["V1", "V2"]
+
+
+def test_name_and_code_hits_rank_above_description_hits(client, db, make_products):
+    # 描述中重复出现检索词的产品，相关度仍低于名称 / 货号命中的产品（RANK_WEIGHTS 名称、货号 10，描述 1）
+    described = make_products(2, codes=["D1", "D2"], name="替换芯")
+    for product in described:
+        product.description = "适配 LX88 LX88 LX88 的替换芯"
+    make_products(1, codes=["N1"], name="LX88 方管")
+    make_products(1, codes=["LX88-B"], name="方管")
+    make_products(1, codes=["Z1"], name="无关产品")
+    db.commit()
+    bump_catalog_version()
+
+    codes = _search(client, "LX88", sort="relevance")
+    assert sorted(codes[:2]) == ["LX88-B", "N1"]
+    assert sorted(codes[2:]) == ["D1", "D2"]
+
+
+def test_short_terms_match_substrings(client, db, make_products):
+    make_products(1, codes=["S1"], name="磁吸口红管")
+    make_products(1, codes=["S2"], name="圆形粉盒")
+    make_products(1, codes=["S3"], name="眼影盘")
+
+    assert _search(client, "口红") == ["S1"]
+    assert _search(client, "粉盒") == ["S2"]
+    assert _search(client, "管") == ["S1"]  # 末尾单字
+    assert _search(client, "形") == ["S2"]
+    assert sorted(_search(client, "s")) == ["S1", "S2", "S3"]
+    assert _search(client, "红管盘") == []
+
+    # 改名 / 删除后索引同步更新
+    product = db.query(Product).filter(Product.code == "S3").one()
+    product.name = "口红收纳盒"
+    db.query(Product).filter(Product.code == "S2").delete()
+    db.commit()
+    bump_catalog_version()
+    assert sorted(_search(client, "口红")) == ["S1", "S3"]
+    assert _search(client, "眼影") == []
+    assert _search(client, "粉盒") == []
@@ -0,0 +1,57 @@
+"""
+货号 / 名称前缀联想
+"""
+
+import time
+import uuid
+
+from app.services.suggest_service import SuggestIndex
+
+
+def _suggest(client, q, **params):
+    response = client.get("/api/products/suggest", params={"q": q, **params})
+    assert response.status_code == 200, response.text
+    return [item["code"] for item in response.json()["data"]]
+
+
+def test_leading_zero_equivalence(client, make_products):
+    make_products(5, codes=["O01", "O010", "O2", "F-12", "X9"])
+    # O1 与 O01 等价，完全相同的排在前缀命中之前
+    assert _suggest(client, "O1") == ["O01", "O010"]
+    assert _suggest(client, "o001") == ["O01", "O010"]
+    assert _suggest(client, "O0") == ["O01", "O010"]
+    assert _suggest(client, "f-012") == ["F-12"]
+    assert _suggest(client, "O", limit=2) == ["O01", "O010"]
+
+
+def test_codes_rank_before_names(client, make_products):
+    make_products(1, codes=["MX1"], name="方形口红管")
+    make_products(1, codes=["A7"], name="mx 系列 磁吸管")
+    assert _suggest(client, "mx") == ["MX1", "A7"]
+    assert _suggest(client, "方形") == ["MX1"]
+    # 名称中的单词也可作为前缀
+    assert _suggest(client, "磁吸") == ["A7"]
+    assert _suggest(client, "zz") == []
+
+
+def test_index_rebuilt_after_admin_write(client, make_products):
+    product = make_products(1, codes=["B5"])[0]
+    assert _suggest(client, "B") == ["B5"]
+
+    response = client.put(f"/api/products/{product.id}", json={"code": "C05"})
+    assert response.status_code == 200, response.text
+    assert _suggest(client, "B") == []
+    assert _suggest(client, "C5") == ["C05"]
+
+
+def test_suggest_is_sub_millisecond():
+    entries = [(str(uuid.uuid4()), f"{prefix}{i:03d}", f"产品 {prefix}{i}")
+               for prefix in ("O", "F-", "AB", "X") for i in range(2500)]
+    index = SuggestIndex(entries)
+    queries = ["O1", "f-01", "ab2", "x", "产品 o", "O0999", "zz"] * 100
+
+    started = time.perf_counter()
+    for query in queries:
+        index.suggest(query, 10)
+    average_ms = (time.perf_counter() - started) / len(queries) * 1000
+    assert average_ms < 1, f"{average_ms:.3f}ms per lookup"
@@ -0,0 +1,67 @@
+"""
+列表 / 推荐 / 详情接口的 card 视图
+"""
+
+import json
+
+import pytest
+from sqlalchemy import event
+
+from app.db.session import engine
+
+CARD_KEYS = {"id", "name", "code", "images", "pricing"}
+SMALL_VARIANTS = {"small": {"jpg": {"width": 300, "height": 300, "bytes": 1000}}}
+
+
+@pytest.fixture
+def products(make_products):
+    return make_products(3, images_per_product=3, is_featured=True, image_variants=SMALL_VARIANTS,
+                         dimensions={"capacity": {"min": 2, "max": 5}})
+
+
+def _data(client, path, **params):
+    response = client.get(path, params=params)
+    assert response.status_code == 200, response.text
+    return response.json()["data"]
+
+
+def test_listing_card_view_returns_main_image_and_price_only(client, products):
+    full = _data(client, "/api/products")["products"]
+    card = _data(client, "/api/products", view="card")["products"]
+
+    assert [p["id"] for p in card] == [p["id"] for p in full]
+    for card_product, full_product in zip(card, full):
+        assert set(card_product) == CARD_KEYS
+        assert card_product["images"] == full_product["images"][:1]
+        assert card_product["pricing"] == {"factoryPrice": full_product["pricing"]["factoryPrice"]}
+    assert len(json.dumps(card)) * 3 < len(json.dumps(full))
+
+
+def test_featured_and_detail_card_view(client, products):
+    featured = _data(client, "/api/products/featured", view="card")
+    assert featured and all(set(p) == CARD_KEYS for p in featured)
+
+    detail = _data(client, f"/api/products/{products[0].id}", view="card")
+    assert set(detail) == CARD_KEYS and len(detail["images"]) == 1
+    assert "description" in _data(client, f"/api/products/{products[0].id}")
+
+
+def test_card_view_loads_only_needed_columns(client, products):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        _data(client, "/api/products", view="card", sort="price_low")
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+    sql = "\n".join(statements)
+    for column in ("products.description", "products.dimensions", "products.cost_price", "products.box_dimensions"):
+        assert column not in sql
+
+
+def test_unknown_view_is_rejected(client):
+    assert client.get("/api/products", params={"view": "compact"}).status_code == 422
@@ -0,0 +1,53 @@
+"""
+列表接口 SQL 语句数守卫
+列表接口执行的语句数必须与返回的产品数量无关，防止序列化时出现 N+1 懒加载
+"""
+
+import pytest
+
+from app.models.models import FeaturedProduct
+
+# 单次请求允许的最大语句数（count + 主查询 + 图片批量加载，外加少量余量）
+LISTING_STATEMENT_BUDGET = 5
+
+
+def _statements_for(client, count_queries, path, **params):
+    # 预热一次，排除进程级缓存（如全文索引可用性检查）的一次性查询
+    client.get(path, params=params)
+    with count_queries() as statements:
+        response = client.get(path, params=params)
+    assert response.status_code == 200, response.text
+    return len(statements)
+
+
+@pytest.mark.parametrize("path,params", [
+    ("/api/products", {"limit": 100}),
+    ("/api/products", {"limit": 100, "sort": "price_low", "materials": "ABS"}),
+    ("/api/products", {"limit": 100, "search": "测试产品"}),
+    ("/api/products/featured", {"limit": 100}),
+])
+def test_public_listing_statement_count_is_constant(client, make_products, count_queries, path, params):
+    make_products(3, is_featured=True)
+    small = _statements_for(client, count_queries, path, **params)
+
+    make_products(40, images_per_product=3, is_featured=True)
+    large = _statements_for(client, count_queries, path, **params)
+
+    assert large == small
+    assert large <= LISTING_STATEMENT_BUDGET
+
+
+def test_admin_featured_listing_statement_count_is_constant(client, db, make_products, count_queries):
+    def feature(products):
+        for i, product in enumerate(products):
+            db.add(FeaturedProduct(product_id=product.id, sort_order=i))
+        db.commit()
+
+    feature(make_products(3))
+    small = _statements_for(client, count_queries, "/api/featured-products")
+
+    feature(make_products(40, images_per_product=3))
+    large = _statements_for(client, count_queries, "/api/featured-products")
+
+    assert large == small
+    assert large <= LISTING_STATEMENT_BUDGET
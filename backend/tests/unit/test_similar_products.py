@@ -0,0 +1,125 @@
+"""
+相似产品：属性向量、top-k 预计算、增量刷新与按主键读取
+"""
+
+import numpy as np
+import pytest
+from sqlalchemy import event
+
+from app.db.session import engine
+from app.models.models import ProductSimilarity
+from app.services import similarity_service
+from app.services.similarity_service import ProductVectors, SimilarityService, SIMILAR_TOP_K, block_rows
+
+
+def _similar_codes(client, product_id, **params):
+    response = client.get(f"/api/products/{product_id}/similar", params=params)
+    assert response.status_code == 200, response.text
+    return [p["code"] for p in response.json()["data"]]
+
+
+def _lists(db):
+    lists = {}
+    for row in db.query(ProductSimilarity).order_by(ProductSimilarity.product_id, ProductSimilarity.rank):
+        lists.setdefault(row.product_id, []).append(row.similar_product_id)
+    return lists
+
+
+def test_similar_products_rank_by_attributes(client, make_products, db):
+    base = make_products(1, codes=["A1"], factory_price=10.0)[0]
+    make_products(1, codes=["A2"], factory_price=11.0)
+    make_products(1, codes=["B1"], shape="方形", material="PET", tube_type="粉底液瓶", factory_price=10.0)
+    make_products(1, codes=["C1"], shape="方形", material="PET", tube_type="粉底液瓶", factory_price=300.0)
+    assert SimilarityService.rebuild(db) == 4
+
+    assert _similar_codes(client, base.id)[:2] == ["A2", "B1"]
+    assert _similar_codes(client, base.id, limit=1) == ["A2"]
+    card = client.get(f"/api/products/{base.id}/similar").json()["data"][0]
+    assert set(card) == {"id", "name", "code", "images", "pricing"}
+
+
+@pytest.mark.parametrize("memory_budget", [None, 1, 16 * 40 * 7])
+def test_top_k_matches_brute_force(make_products, db, monkeypatch, memory_budget):
+    # 预算很小时每块 1 行 / 7 行，结果与一次算完相同
+    if memory_budget is not None:
+        monkeypatch.setattr(similarity_service, "BLOCK_MEMORY_BYTES", memory_budget)
+    rng = np.random.default_rng(7)
+    shapes, materials = ["圆形", "方形", "椭圆"], ["ABS", "PET", "AS"]
+    for i in range(40):
+        make_products(1, images_per_product=0, shape=shapes[i % 3], material=materials[i % 5 % 3],
+                      factory_price=float(rng.uniform(1, 50)), dimensions={"height": float(rng.uniform(20, 90))})
+    vectors = ProductVectors.build(db)
+    scores = vectors.matrix @ vectors.matrix.T
+    np.fill_diagonal(scores, -np.inf)
+
+    for row, neighbours, neighbour_scores in vectors.top_k(np.arange(len(vectors.ids))):
+        assert row not in neighbours
+        assert len(neighbours) <= SIMILAR_TOP_K
+        assert np.all(np.diff(neighbour_scores) <= 1e-6)
+        expected = np.sort(scores[row])[::-1][:len(neighbours)]
+        np.testing.assert_allclose(neighbour_scores, expected, rtol=1e-5, atol=1e-6)
+
+
+def test_block_rows_follow_memory_budget():
+    # 10 万个 SKU 时每块的相似度矩阵与下标矩阵合计不超过预算
+    rows = block_rows(100_000)
+    assert rows * 100_000 * 16 <= similarity_service.BLOCK_MEMORY_BYTES
+    assert block_rows(10 ** 9) == 1
+    assert block_rows(0) >= 1
+
+
+def test_admin_update_refreshes_incrementally(client, make_products, db):
+    base = make_products(1, codes=["A1"], factory_price=10.0)[0]
+    make_products(1, codes=["A2"], factory_price=12.0)
+    other = make_products(1, codes=["B1"], shape="方形", material="PET", tube_type="粉底液瓶", factory_price=200.0)[0]
+    base_id, other_id = base.id, other.id
+    SimilarityService.rebuild(db)
+    assert _similar_codes(client, base_id)[0] == "A2"
+
+    # B1 改为与 A1 完全相同的属性后，刷新在响应返回前作为后台任务完成
+    response = client.put(f"/api/products/{other_id}", json={
+        "shape": "圆形", "material": "ABS", "tube_type": "口红管", "factory_price": 10.0
+    })
+    assert response.status_code == 200, response.text
+    assert _similar_codes(client, base_id)[0] == "B1"
+
+
+def test_refresh_drops_deleted_products(client, make_products, db):
+    products = make_products(5)
+    deleted_id = products[2].id
+    SimilarityService.rebuild(db)
+    assert any(deleted_id in neighbours for neighbours in _lists(db).values())
+
+    assert client.delete(f"/api/products/{deleted_id}").status_code == 200
+    db.expire_all()
+    lists = _lists(db)
+    assert deleted_id not in lists
+    assert all(deleted_id not in neighbours for neighbours in lists.values())
+    assert all(len(neighbours) == 3 for neighbours in lists.values())
+
+
+def test_similar_products_is_one_primary_key_read(client, make_products, db):
+    product_id = make_products(3, images_per_product=0)[0].id
+    SimilarityService.rebuild(db)
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if "product_similarities" in statement:
+            statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        assert client.get(f"/api/products/{product_id}/similar").status_code == 200
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+    assert len(statements) == 1
+    with engine.connect() as connection:
+        plan = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statements[0][0]}", statements[0][1]).fetchall()
+    assert any("sqlite_autoindex_product_similarities_1" in row[3] for row in plan), plan
+
+
+def test_similar_products_missing_product(client, make_products):
+    assert client.get("/api/products/no-such-product/similar").status_code == 404
+    product_id = make_products(1)[0].id
+    assert _similar_codes(client, product_id) == []
@@ -1,6 +1,7 @@
 
 import { useState, useEffect } from "react";
 import { CosmeticProduct, CartItem } from "@/types/cosmetics";
+import { productService } from "@/services/productService";
 
 const CART_STORAGE_KEY = 'glam-cart-items';
 
@@ -40,6 +41,7 @@ export function useCart() {
   
   // Handle adding products to cart
   const handleAddToCart = (product: CosmeticProduct) => {
+    productService.trackEvent(product.id, 'add_to_cart');
     setCartItems((prevItems) => {
       const existingItem = prevItems.find(
         (item) => item.product.id === product.id
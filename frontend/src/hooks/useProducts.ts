@@ -194,14 +194,22 @@ export const useUploadProductImages = () => {
   return useMutation({
     mutationFn: ({ productId, files }: { productId: string; files: File[] }) =>
       adminProductService.uploadProductImages(productId, files),
-    onSuccess: (result, { productId }) => {
-      // Invalidate the specific product to refetch with new images
-      queryClient.invalidateQueries({ queryKey: PRODUCT_QUERY_KEYS.detail(productId) });
-      
+    onSuccess: async (result, { productId }) => {
       toast({
         title: "图片上传成功",
-        description: `已成功上传 ${result.images.length} 张图片`,
+        description: `已上传 ${result.images.length} 张图片，正在后台生成各尺寸`,
       });
+
+      // Images appear on the product once the background job has derived their sizes
+      const job = await adminProductService.waitForImageJob(result.jobId);
+      queryClient.invalidateQueries({ queryKey: PRODUCT_QUERY_KEYS.detail(productId) });
+      if (job.failed > 0) {
+        toast({
+          title: "部分图片处理失败",
+          description: `${job.failed} / ${job.total} 张图片无法处理，请检查文件格式后重新上传`,
+          variant: "destructive",
+        });
+      }
     },
     onError: (error: Error) => {
       toast({
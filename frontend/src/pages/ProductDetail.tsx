@@ -16,6 +16,7 @@ import { useToast } from "@/hooks/use-toast";
 import { useLanguage } from "@/contexts/LanguageContext";
 import { useProduct } from "@/hooks/useProducts";
 import { useCart } from "@/hooks/use-cart";
+import { productService } from "@/services/productService";
 import {
   Table,
   TableBody,
@@ -61,6 +62,13 @@ const ProductDetail = () => {
     }
   }, [product, allImagesInfo.length]);
 
+  // Count a product view for the popularity ranking
+  React.useEffect(() => {
+    if (product?.id) {
+      productService.trackEvent(product.id, 'view');
+    }
+  }, [product?.id]);
+
   // Show error toast if API call fails
   React.useEffect(() => {
     if (error) {
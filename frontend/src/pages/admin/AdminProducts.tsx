@@ -744,7 +744,7 @@ const AdminProducts = () => {
         boxDimensions: "",
         boxQuantity: 0,
         inStock: selectedProduct.inStock,
-        popularityScore: selectedProduct.popularityScore,
+        popularityScore: selectedProduct.popularityBase ?? 0,
         dimensions: {
           weight: selectedProduct.dimensions?.weight || 0,
           length: selectedProduct.dimensions?.length || 0,
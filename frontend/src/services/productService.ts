@@ -44,6 +44,18 @@ const ENDPOINTS = {
 };
 
 // Public Product APIs (No Authentication Required)
+export interface ImageJobStatus {
+  id: string;
+  productId: string;
+  status: 'pending' | 'running' | 'done' | 'failed';
+  total: number;
+  processed: number;
+  failed: number;
+  images: Array<{ imageId: string; status: 'pending' | 'done' | 'failed'; error: string | null }>;
+  createdAt: string | null;
+  updatedAt: string | null;
+}
+
 export const productService = {
   // Get all products with optional filtering and sorting
   async getProducts(params?: {
@@ -120,6 +132,87 @@ export const productService = {
     }
   },
 
+  // Get single product by code (leading zeros are ignored: O1 finds O01)
+  async getProductByCode(code: string): Promise<CosmeticProduct> {
+    try {
+      const response = await apiClient.get<ApiResponse<CosmeticProduct>>(
+        `${ENDPOINTS.PRODUCTS}/by-code/${encodeURIComponent(code)}`
+      );
+
+      return {
+        ...response.data.data,
+        images: response.data.data.images.map(img => ({
+          ...img,
+          url: createImageUrl(img.url),
+        })),
+      };
+    } catch (error) {
+      const apiError = handleApiError(error);
+      throw new Error(apiError.message);
+    }
+  },
+
+  // Get many products by ID or code in one request (cart, comparison); unknown keys come back in `missing`
+  async getProductsByIds(ids: string[]): Promise<{ products: CosmeticProduct[]; missing: string[] }> {
+    try {
+      const response = await apiClient.post<ApiResponse<{ products: CosmeticProduct[]; missing: string[] }>>(
+        `${ENDPOINTS.PRODUCTS}/batch`,
+        { ids }
+      );
+
+      const { products, missing } = response.data.data;
+      return {
+        products: products.map(product => ({
+          ...product,
+          images: (product.images || []).map(img => ({
+            ...img,
+            url: createImageUrl(img.url),
+          })),
+        })),
+        missing,
+      };
+    } catch (error) {
+      const apiError = handleApiError(error);
+      throw new Error(apiError.message);
+    }
+  },
+
+  // Precomputed similar products (card view: id, name, code, main image and price), best match first
+  async getSimilarProducts(productId: string, limit: number = 8): Promise<CosmeticProduct[]> {
+    try {
+      const response = await apiClient.get<ApiResponse<CosmeticProduct[]>>(
+        `${ENDPOINTS.PRODUCTS}/${encodeURIComponent(productId)}/similar`,
+        { params: { limit, view: 'card' } }
+      );
+
+      return response.data.data.map(product => ({
+        ...product,
+        images: (product.images || []).map(img => ({
+          ...img,
+          url: createImageUrl(img.url),
+        })),
+      }));
+    } catch (error) {
+      const apiError = handleApiError(error);
+      throw new Error(apiError.message);
+    }
+  },
+
+  // Prefix autocomplete over codes and names (O1 also matches O01)
+  async suggestProducts(q: string, limit: number = 10): Promise<Array<{ id: string; code: string; name: string }>> {
+    try {
+      const response = await apiClient.get<ApiResponse<Array<{ id: string; code: string; name: string }>>>(
+        `${ENDPOINTS.PRODUCTS}/suggest`,
+        { params: { q, limit } }
+      );
+
+      return response.data.data || [];
+    } catch (error) {
+      const apiError = handleApiError(error);
+      throw new Error(apiError.message);
+    }
+  },
+
   // Get featured products
   async getFeaturedProducts(limit: number = 8): Promise<CosmeticProduct[]> {
     try {
@@ -145,6 +238,15 @@ export const productService = {
     }
   },
 
+  // Report a product view / add-to-cart for the popularity ranking (fire-and-forget, never throws)
+  async trackEvent(productId: string, type: 'view' | 'add_to_cart'): Promise<void> {
+    try {
+      await apiClient.post(`${ENDPOINTS.PRODUCTS}/events`, { events: [{ product_id: productId, type }] });
+    } catch (error) {
+      console.warn('Failed to track product event:', error);
+    }
+  },
+
   // Get filter options (for dynamic filter generation)
   async getFilterOptions(): Promise<FilterOptionsResponse> {
     try {
@@ -220,6 +322,8 @@ export const adminProductService = {
 
   // Upload product images
   async uploadProductImages(productId: string, files: File[]): Promise<{
+    jobId: string;
+    status: ImageJobStatus['status'];
     images: Array<{
       id: string;
       url: string;
@@ -234,6 +338,8 @@ export const adminProductService = {
       });
 
       const response = await apiClient.post<ApiResponse<{
+        jobId: string;
+        status: ImageJobStatus['status'];
         images: Array<{
           id: string;
           url: string;
@@ -257,6 +363,8 @@ export const adminProductService = {
       }));
 
       return {
+        jobId: response.data.data.jobId,
+        status: response.data.data.status,
         images: processedImages,
       };
     } catch (error) {
@@ -265,6 +373,31 @@ export const adminProductService = {
     }
   },
 
+  // Progress of the background job that derives the sizes of uploaded images
+  async getImageJob(jobId: string): Promise<ImageJobStatus> {
+    try {
+      const response = await apiClient.get<ApiResponse<ImageJobStatus>>(
+        `${ENDPOINTS.PRODUCTS}/image-jobs/${encodeURIComponent(jobId)}`
+      );
+      return response.data.data;
+    } catch (error) {
+      const apiError = handleApiError(error);
+      throw new Error(apiError.message);
+    }
+  },
+
+  // Poll an image job until it finishes (uploaded images appear on the product once their sizes are ready)
+  async waitForImageJob(jobId: string, intervalMs: number = 1000, timeoutMs: number = 300000): Promise<ImageJobStatus> {
+    const deadline = Date.now() + timeoutMs;
+    for (;;) {
+      const job = await this.getImageJob(jobId);
+      if (job.status === 'done' || job.status === 'failed' || Date.now() >= deadline) {
+        return job;
+      }
+      await new Promise(resolve => setTimeout(resolve, intervalMs));
+    }
+  },
+
   // Delete product image
   async deleteProductImage(productId: string, imageId: string): Promise<void> {
     try {
@@ -352,6 +485,23 @@ export const adminProductService = {
     }
   },
 
+  // Export the whole catalog (streamed by the backend) as NDJSON or CSV
+  async exportProducts(format: 'ndjson' | 'csv', options?: { includeImages?: boolean; includeVariants?: boolean }): Promise<Blob> {
+    try {
+      const response = await apiClient.get(
+        `/api/products/export/${format}`,
+        {
+          params: { include_images: options?.includeImages, include_variants: options?.includeVariants },
+          responseType: 'blob',
+        }
+      );
+      return response.data;
+    } catch (error) {
+      const apiError = handleApiError(error);
+      throw new Error(apiError.message);
+    }
+  },
+
   // Download Template
   async getImportTemplate(): Promise<Blob> {
     try {
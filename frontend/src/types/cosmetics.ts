@@ -66,6 +66,7 @@ export interface CosmeticProduct {
   pricing: ProductPricing;
   inStock: boolean;
   popularityScore: number;
+  popularityBase?: number; // manual part of popularityScore, edited in admin
   isFeatured: boolean;
   createdAt: string;
   updatedAt: string;
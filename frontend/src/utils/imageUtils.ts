@@ -135,6 +135,20 @@ export const buildSrcSet = (
     .join(', ');
 };
 
+// 按需生成的变体（后端 /img 接口，首次请求时从原图生成并缓存）；width 必须在后端 IMAGE_VARIANT_WIDTHS 中
+export const VARIANT_WIDTHS = [150, 300, 500, 800, 1200] as const;
+
+export const buildVariantUrl = (
+  productCode: string,
+  imageName: string,
+  width: typeof VARIANT_WIDTHS[number],
+  baseUrl: string = ''
+): string => {
+  const format: ImageFormat = supportsWebP() ? 'webp' : 'jpg';
+  const baseName = imageName.replace(/\.[^/.]+$/, '');
+  return `${baseUrl}/img/${encodeURIComponent(productCode)}/${encodeURIComponent(baseName)}?w=${width}&fmt=${format}`;
+};
+
 // 构建 sizes 属性
 export const buildSizes = (usage: ImageUsage): string => {
   const sizesMap: Record<ImageUsage, string> = {